@@ -0,0 +1,17 @@
+from importlib.util import find_spec
+
+
+def find_app_module_spec(app=None, module_name=None):
+    """Returns the module spec of an app's module, e.g. its
+    visit_schedules module, or None, without importing the module.
+
+    The app package is imported if it exists, as Django already
+    does for installed apps.
+    """
+    try:
+        if find_spec(app) is None:
+            return None
+        return find_spec(f'{app}.{module_name}')
+    except (ImportError, ValueError):
+        # a parent package of a dotted app name does not exist
+        return None
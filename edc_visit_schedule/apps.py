@@ -19,9 +19,12 @@ class AppConfig(DjangoAppConfig):
     validate_models = True
 
     def ready(self):
-        from .signals import offschedule_model_on_post_save, onschedule_model_on_post_save
         sys.stdout.write(f'Loading {self.verbose_name} ...\n')
-        site_visit_schedules.autodiscover()
+        artifact = getattr(settings, 'EDC_VISIT_SCHEDULE_REGISTRY_ARTIFACT', None)
+        if not artifact or not site_visit_schedules.load_artifact(artifact):
+            site_visit_schedules.autodiscover()
+        site_visit_schedules.connect_signals()
+        site_visit_schedules.freeze()
         sys.stdout.write(f' Done loading {self.verbose_name}.\n')
         register(visit_schedule_check)
 
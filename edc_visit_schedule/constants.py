@@ -5,3 +5,6 @@ MONTHS = 'months'
 YEARS = 'years'
 ON_SCHEDULE = 'onschedule'
 OFF_SCHEDULE = 'offschedule'
+SCHEDULED = 'scheduled'
+UNSCHEDULED = 'unscheduled'
+PRN = 'prn'
@@ -0,0 +1,12 @@
+import hashlib
+
+
+def get_fingerprint(*values):
+    """Returns the sha256 hex digest of values.
+
+    Values are hashed by their repr so must have a repr that does
+    not change between processes, e.g. strings, numbers, None,
+    relativedeltas, classes and tuples of these. Pass the
+    fingerprints of contained objects rather than the objects.
+    """
+    return hashlib.sha256(repr(values).encode()).hexdigest()
@@ -0,0 +1,27 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from ...site_visit_schedules import site_visit_schedules
+
+
+class Command(BaseCommand):
+
+    help = ('Writes the registered visit schedules to the registry artifact '
+            'loaded on startup instead of autodiscovering visit schedules.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--path',
+            dest='path',
+            default=getattr(settings, 'EDC_VISIT_SCHEDULE_REGISTRY_ARTIFACT', None),
+            help='Artifact file. Default: settings.EDC_VISIT_SCHEDULE_REGISTRY_ARTIFACT')
+
+    def handle(self, *args, **options):
+        path = options.get('path')
+        if not path:
+            raise CommandError(
+                'No artifact file. Use --path or set '
+                'settings.EDC_VISIT_SCHEDULE_REGISTRY_ARTIFACT.')
+        site_visit_schedules.export_artifact(path)
+        self.stdout.write(self.style.SUCCESS(
+            f'Exported {len(site_visit_schedules.registry)} visit schedules to {path}.'))
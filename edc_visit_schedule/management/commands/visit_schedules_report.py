@@ -0,0 +1,40 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from ...site_visit_schedules import site_visit_schedules
+
+
+class Command(BaseCommand):
+
+    help = ('Shows the time taken to import the visit_schedules module of '
+            'each app and the visit schedules, schedules, visits and forms '
+            'registered, slowest first.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--json',
+            action='store_true',
+            dest='json',
+            default=False,
+            help='Output JSON')
+
+    def handle(self, *args, **options):
+        report = sorted(
+            site_visit_schedules.autodiscover_report,
+            key=lambda timing: timing.seconds, reverse=True)
+        if options.get('json'):
+            self.stdout.write(json.dumps([timing._asdict() for timing in report], indent=2))
+        elif not report:
+            self.stdout.write(
+                'No visit_schedules modules were imported. Was the registry loaded '
+                'from an artifact?')
+        else:
+            for timing in report:
+                self.stdout.write(
+                    f'{timing.module}: {timing.seconds * 1000:.1f}ms, '
+                    f'visit schedules {", ".join(timing.visit_schedules) or "-"}, '
+                    f'{timing.schedules} schedules, {timing.visits} visits, '
+                    f'{timing.forms} forms')
+            self.stdout.write(
+                f'Total: {sum(timing.seconds for timing in report) * 1000:.1f}ms')
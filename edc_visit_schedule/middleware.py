@@ -0,0 +1,19 @@
+from .subject_schedule_history_cache import subject_schedule_history_cache
+
+
+class SubjectScheduleHistoryCacheMiddleware:
+
+    """Activates the SubjectScheduleHistory cache for the
+    duration of each request.
+
+    Add to settings.MIDDLEWARE:
+
+        'edc_visit_schedule.middleware.SubjectScheduleHistoryCacheMiddleware'
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with subject_schedule_history_cache:
+            return self.get_response(request)
@@ -0,0 +1,25 @@
+# Generated by Django 2.0 on 2026-10-18 12:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('edc_visit_schedule', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='subjectschedulehistory',
+            index=models.Index(fields=['subject_identifier', 'onschedule_datetime', 'offschedule_datetime'], name='ssh_subject_dates_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='subjectschedulehistory',
+            index=models.Index(fields=['schedule_status', 'onschedule_datetime'], name='ssh_status_onschedule_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='subjectschedulehistory',
+            index=models.Index(fields=['schedule_status', 'offschedule_datetime'], name='ssh_status_offschedule_idx'),
+        ),
+    ]
@@ -0,0 +1,30 @@
+from django.apps import apps as django_apps
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+_model_classes = {}
+
+
+def get_model_cls(model=None):
+    """Returns the model class for a model label.
+
+    Once the app registry is ready, model classes are cached by
+    label. Lookup errors are not cached.
+    """
+    try:
+        return _model_classes[model]
+    except KeyError:
+        model_cls = django_apps.get_model(model)
+        if django_apps.ready:
+            _model_classes[model] = model_cls
+        return model_cls
+
+
+def clear_model_cls_cache():
+    _model_classes.clear()
+
+
+@receiver(setting_changed, weak=False, dispatch_uid='clear_model_cls_cache_on_setting_changed')
+def clear_model_cls_cache_on_setting_changed(setting, **kwargs):
+    if setting == 'INSTALLED_APPS':
+        clear_model_cls_cache()
@@ -1,4 +1,4 @@
-from django.apps import apps as django_apps
+from collections import OrderedDict
 from django.db import models
 from django.db.models import Q
 from edc_base import get_utcnow
@@ -8,6 +8,7 @@ from edc_identifier.model_mixins import NonUniqueSubjectIdentifierFieldMixin
 from edc_protocol.validators import datetime_not_before_study_start
 
 from ..choices import SCHEDULE_STATUS
+from ..model_cls_cache import get_model_cls
 from ..model_mixins import VisitScheduleFieldsModelMixin
 
 
@@ -28,17 +29,65 @@ class SubjectScheduleModelManager(models.Manager):
         subject where the schedule_status would be ON_SCHEDULE
         relative to the report_datetime.
         """
-        onschedules = []
+        return self.onschedules_for_subjects(
+            subject_identifiers=[subject_identifier],
+            report_datetime=report_datetime)[subject_identifier]
+
+    def onschedule_history_for_subjects(self, subject_identifiers=None,
+                                        report_datetime=None):
+        """Returns a queryset of history model instances for these
+        subjects where the schedule_status would be ON_SCHEDULE
+        relative to the report_datetime.
+        """
         report_datetime = report_datetime or get_utcnow()
-        qs = self.filter(
-            Q(subject_identifier=subject_identifier),
+        return self.filter(
+            Q(subject_identifier__in=subject_identifiers),
             Q(onschedule_datetime__lte=report_datetime),
             (Q(offschedule_datetime__gte=report_datetime) |
              Q(offschedule_datetime__isnull=True)))
-        for obj in qs:
-            onschedule_model_cls = django_apps.get_model(obj.onschedule_model)
-            onschedules.append(onschedule_model_cls.objects.get(
-                subject_identifier=subject_identifier))
+
+    def onschedules_for_subjects(self, subject_identifiers=None, report_datetime=None):
+        """Returns an ordered dictionary of {subject_identifier: [onschedule
+        model instances]} where the schedule_status would be ON_SCHEDULE
+        relative to the report_datetime.
+
+        Queries once for the history and once per onschedule model.
+        An onschedule model instance is matched to its history on
+        subject_identifier and schedule_name, or on subject_identifier
+        only if the instance's schedule_name is not set.
+
+        Raises the onschedule model's DoesNotExist if the onschedule
+        model instance of a history instance does not exist.
+        """
+        onschedules = OrderedDict(
+            (subject_identifier, []) for subject_identifier in subject_identifiers)
+        history_objs = list(self.onschedule_history_for_subjects(
+            subject_identifiers=list(onschedules), report_datetime=report_datetime))
+        subject_identifiers_by_model = {}
+        for obj in history_objs:
+            subject_identifiers_by_model.setdefault(
+                obj.onschedule_model, set()).add(obj.subject_identifier)
+        instances = {}
+        for onschedule_model, model_subject_identifiers in (
+                subject_identifiers_by_model.items()):
+            onschedule_model_cls = get_model_cls(onschedule_model)
+            for instance in onschedule_model_cls.objects.filter(
+                    subject_identifier__in=model_subject_identifiers):
+                instances.update({
+                    (onschedule_model, instance.subject_identifier,
+                     instance.schedule_name): instance})
+        for obj in history_objs:
+            instance = (
+                instances.get((obj.onschedule_model, obj.subject_identifier,
+                               obj.schedule_name))
+                or instances.get((obj.onschedule_model, obj.subject_identifier, None)))
+            if not instance:
+                onschedule_model_cls = get_model_cls(obj.onschedule_model)
+                raise onschedule_model_cls.DoesNotExist(
+                    f'{onschedule_model_cls._meta.object_name} matching query does not '
+                    f'exist. Got subject_identifier={obj.subject_identifier}, '
+                    f'schedule_name={obj.schedule_name}.')
+            onschedules[obj.subject_identifier].append(instance)
         return onschedules
 
 
@@ -75,3 +124,17 @@ class SubjectScheduleHistory(NonUniqueSubjectIdentifierFieldMixin,
     class Meta:
         unique_together = (
             'subject_identifier', 'visit_schedule_name', 'schedule_name')
+        indexes = [
+            # onschedules(): subject_identifier and date range
+            models.Index(
+                fields=['subject_identifier', 'onschedule_datetime',
+                        'offschedule_datetime'],
+                name='ssh_subject_dates_idx'),
+            # admin: schedule_status and date filters
+            models.Index(
+                fields=['schedule_status', 'onschedule_datetime'],
+                name='ssh_status_onschedule_idx'),
+            models.Index(
+                fields=['schedule_status', 'offschedule_datetime'],
+                name='ssh_status_offschedule_idx'),
+        ]
@@ -1,60 +1,159 @@
-import itertools
-
+from bisect import bisect_right
 from collections import OrderedDict
 
 
+class FrozenCollectionError(Exception):
+    pass
+
+
 class OrderedCollection(OrderedDict):
 
+    """An ordered dictionary kept sorted on `ordering_attr` of
+    its values.
+
+    Items are inserted by bisection. A list of keys in order and a
+    key to position map are kept alongside the dictionary so that
+    `first`, `last`, `next` and `previous` do not scan.
+
+    `version` changes each time items are added or removed.
+
+    Once frozen (see `freeze`), items cannot be added or removed.
+    """
+
     key = None  # key name in dictionary key/value pair
     ordering_attr = None  # value.attrname to order dictionary on.
+    index_attrs = ['_keys', '_ordering', '_positions']
+    _frozen = None
+    _version = 0
 
-    def update(self, *args, **kwargs):
-        """Updates and reorders.
+    def __init__(self, *args, **kwargs):
+        self._keys = []
+        self._ordering = []
+        self._positions = {}
+        super().__init__(*args, **kwargs)
+
+    def __setitem__(self, key, value):
+        self._raise_if_frozen()
+        if key in self:
+            del self[key]
+        ordering = getattr(value, self.ordering_attr)
+        position = bisect_right(self._ordering, ordering)
+        super().__setitem__(key, value)
+        self._keys.insert(position, key)
+        self._ordering.insert(position, ordering)
+        # move keys after the new key to the end to keep dictionary order
+        for k in self._keys[position + 1:]:
+            self.move_to_end(k)
+        self._update_positions(position)
+        self._version += 1
+
+    def __delitem__(self, key):
+        self._raise_if_frozen()
+        super().__delitem__(key)
+        position = self._positions.pop(key)
+        del self._keys[position]
+        del self._ordering[position]
+        self._update_positions(position)
+        self._version += 1
+
+    def pop(self, key, *args):
+        if key in self:
+            value = self[key]
+            del self[key]
+            return value
+        return super().pop(key, *args)
+
+    def popitem(self, last=True):
+        if not self._keys:
+            raise KeyError('dictionary is empty')
+        key = self._keys[-1] if last else self._keys[0]
+        value = self[key]
+        del self[key]
+        return key, value
+
+    def _update_positions(self, start):
+        for position in range(start, len(self._keys)):
+            self._positions[self._keys[position]] = position
+
+    def __reduce__(self):
+        """Excludes the index from the state so copies and
+        unpickled instances build their own.
+
+        Copies are not frozen.
+        """
+        state = {k: v for k, v in vars(self).items()
+                 if k not in self.index_attrs and k not in ['_frozen', '_version']}
+        return self.__class__, (), state or None, None, iter(super().items())
+
+    def clear(self):
+        self._raise_if_frozen()
+        super().clear()
+        self._keys.clear()
+        self._ordering.clear()
+        self._positions.clear()
+        self._version += 1
+
+    @property
+    def version(self):
+        return self._version
+
+    @property
+    def frozen(self):
+        return bool(self._frozen and self._frozen())
+
+    def freeze(self, frozen=None):
+        """Prevents adding or removing items.
+
+        If given, `frozen` is a callable and the collection stays
+        frozen only while it returns True.
         """
-        def key_order(v):
-            return getattr(v, self.ordering_attr)
+        self._frozen = frozen or (lambda: True)
 
-        super().update(*args, **kwargs)
-        od = self.copy()
-        self.clear()
-        super().update(
-            **{getattr(v, self.key): v for v in sorted(od.values(), key=key_order)})
+    def _raise_if_frozen(self):
+        if self.frozen:
+            raise FrozenCollectionError(
+                f'{self.__class__.__name__} is frozen and cannot be changed.')
+
+    def update(self, *args, **kwargs):
+        """Updates, keyed on value.`key`, and keeps order.
+
+        More than one item is merged with the existing items
+        and ordered once.
+        """
+        items = OrderedDict(
+            (getattr(v, self.key), v) for v in dict(*args, **kwargs).values())
+        if len(items) > 1:
+            values = [v for k, v in super().items() if k not in items] + list(items.values())
+            values.sort(key=lambda v: getattr(v, self.ordering_attr))
+            self.clear()
+            items = OrderedDict((getattr(v, self.key), v) for v in values)
+        for k, v in items.items():
+            self[k] = v
 
     @property
     def first(self):
         """Returns the first item.
         """
-        return next(iter(self.values()))
+        return self[next(iter(self))]
 
     @property
     def last(self):
         """Returns the last item.
         """
-        return next(reversed(self.values()))
+        return self[next(reversed(self))]
 
     def previous(self, key):
         """Returns the previous item or None.
         """
-        return self.get(self._iter_keys(key=key, reverse=True))
+        position = self._positions.get(key)
+        if not position:
+            return None
+        return self[self._keys[position - 1]]
 
     def next(self, key):
         """Returns the next item or None.
         """
-        return self.get(self._iter_keys(key=key))
-
-    def _iter_keys(self, key=None, reverse=None):
-        if reverse:
-            seq = reversed(self.keys())
-        else:
-            seq = iter(self.keys())
-        keys = itertools.dropwhile(lambda k: k != key, seq)
-        try:
-            k = next(keys)
-        except StopIteration:
-            pass
-        else:
-            assert k == key
-        try:
-            return next(keys)
-        except StopIteration:
+        position = self._positions.get(key)
+        if position is None or position + 1 >= len(self._keys):
             return None
+        return self[self._keys[position + 1]]
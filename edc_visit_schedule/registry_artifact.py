@@ -0,0 +1,185 @@
+import ast
+import hashlib
+import json
+import os
+import pickle
+import sys
+
+from importlib.util import find_spec
+
+from .app_module_spec import find_app_module_spec
+
+ARTIFACT_VERSION = 2
+
+
+class RegistryArtifactError(Exception):
+    pass
+
+
+def get_source_files(module_name=None, apps=None):
+    """Returns a dictionary of {module: [filename, ...]} of the
+    visit schedule modules of apps, without importing them.
+
+    If the module is a package, all of its python files are included.
+    """
+    source_files = {}
+    for app in apps:
+        name = f'{app}.{module_name}'
+        spec = find_app_module_spec(app=app, module_name=module_name)
+        if not spec or not spec.origin or not os.path.isfile(spec.origin):
+            continue
+        if spec.submodule_search_locations:
+            filenames = []
+            for location in spec.submodule_search_locations:
+                for path, _, files in os.walk(location):
+                    filenames.extend(
+                        os.path.join(path, f) for f in files if f.endswith('.py'))
+            source_files[name] = sorted(filenames)
+        else:
+            source_files[name] = [spec.origin]
+    return source_files
+
+
+def get_imports(filename=None):
+    """Returns a list of (level, name) of the modules a python file
+    imports, without importing them.
+
+    For `from module import name`, `module.name` is included in case
+    `name` is a submodule.
+    """
+    with open(filename, 'rb') as f:
+        tree = ast.parse(f.read(), filename)
+    imports = []
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            imports.extend((0, alias.name) for alias in node.names)
+        elif isinstance(node, ast.ImportFrom):
+            module = node.module or ''
+            imports.append((node.level, module))
+            imports.extend(
+                (node.level, f'{module}.{alias.name}'.strip('.'))
+                for alias in node.names if alias.name != '*')
+    return imports
+
+
+def find_module_file(name=None):
+    """Returns the python file of a module or None.
+    """
+    try:
+        spec = find_spec(name)
+    except (ImportError, ValueError, AttributeError):
+        # a parent is not a package, e.g. `from module import name`
+        return None
+    if spec and spec.origin and spec.origin.endswith('.py') and os.path.isfile(spec.origin):
+        return os.path.abspath(spec.origin)
+    return None
+
+
+def find_relative_file(filename=None, level=None, name=None):
+    """Returns the python file of a relative import in `filename`
+    or None.
+    """
+    path = os.path.dirname(os.path.abspath(filename))
+    for _ in range(1, level):
+        path = os.path.dirname(path)
+    if name:
+        path = os.path.join(path, *name.split('.'))
+    for candidate in [f'{path}.py', os.path.join(path, '__init__.py')]:
+        if os.path.isfile(candidate):
+            return candidate
+    return None
+
+
+def get_dependencies(filenames=None, packages=None):
+    """Returns a sorted list of the given python files and of the
+    files of `packages` they import, directly or indirectly.
+
+    Relative imports are always followed. Imports are found
+    statically, so modules imported by name at runtime, e.g. with
+    `import_module`, are not included.
+    """
+    pending = [os.path.abspath(filename) for filename in filenames]
+    dependencies = set()
+    while pending:
+        filename = pending.pop()
+        if filename in dependencies:
+            continue
+        dependencies.add(filename)
+        for level, name in get_imports(filename):
+            if level:
+                dependency = find_relative_file(filename=filename, level=level, name=name)
+            elif [p for p in packages if name == p or name.startswith(f'{p}.')]:
+                dependency = find_module_file(name)
+            else:
+                dependency = None
+            if dependency:
+                pending.append(dependency)
+    return sorted(dependencies)
+
+
+def get_source_hashes(filenames=None):
+    """Returns a dictionary of {filename: sha256} of python files.
+    """
+    source_hashes = {}
+    for filename in filenames:
+        with open(filename, 'rb') as f:
+            source_hashes[filename] = hashlib.sha256(f.read()).hexdigest()
+    return source_hashes
+
+
+def get_header(source_files=None, source_hashes=None, checksum=None):
+    return dict(
+        version=ARTIFACT_VERSION,
+        python=list(sys.version_info[:2]),
+        pickle_protocol=pickle.HIGHEST_PROTOCOL,
+        source_files=source_files,
+        source_hashes=source_hashes,
+        checksum=checksum)
+
+
+def dump_registry(path=None, registry=None, source_files=None, source_hashes=None):
+    """Writes the registry to an artifact file.
+
+    The file is a one line JSON header, with the artifact version,
+    the visit schedule modules, the hashes of the python files they
+    depend on and the sha256 checksum of the payload, followed by
+    the pickled registry. The file is replaced atomically.
+    """
+    payload = pickle.dumps(dict(registry), protocol=pickle.HIGHEST_PROTOCOL)
+    header = get_header(
+        source_files=source_files, source_hashes=source_hashes,
+        checksum=hashlib.sha256(payload).hexdigest())
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(json.dumps(header, sort_keys=True).encode() + b'\n')
+        f.write(payload)
+    os.replace(tmp_path, path)
+
+
+def load_registry(path=None, source_files=None):
+    """Returns the registry from an artifact file or None if the
+    file does not exist or is stale.
+
+    The artifact is stale if the artifact version, python version
+    or visit schedule modules differ or if any python file hashed
+    in the header changed or no longer exists. Raises if the
+    payload does not match the checksum.
+    """
+    try:
+        with open(path, 'rb') as f:
+            header = json.loads(f.readline().decode())
+            source_hashes = header.get('source_hashes')
+            if header != get_header(
+                    source_files=source_files, source_hashes=source_hashes,
+                    checksum=header.get('checksum')):
+                return None
+            if get_source_hashes(filenames=source_hashes) != source_hashes:
+                return None
+            payload = f.read()
+    except FileNotFoundError:
+        return None
+    except (ValueError, AttributeError, TypeError) as e:
+        raise RegistryArtifactError(f'Invalid registry artifact. Got {e}. See {path}.')
+    if hashlib.sha256(payload).hexdigest() != header['checksum']:
+        raise RegistryArtifactError(f'Registry artifact checksum mismatch. See {path}.')
+    return pickle.loads(payload)
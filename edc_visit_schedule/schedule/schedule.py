@@ -2,10 +2,11 @@ import re
 
 from django.core.management.color import color_style
 
+from ..fingerprint import get_fingerprint
 from ..site_visit_schedules import site_visit_schedules, SiteVisitScheduleError
 from ..subject_schedule import NotOnScheduleForDateError, NotOnScheduleError
 from ..subject_schedule import SubjectSchedule, SubjectScheduleError
-from ..visit import Visit
+from ..visit import PeriodicVisits, Visit
 from .visit_collection import VisitCollection
 
 style = color_style()
@@ -34,6 +35,7 @@ class Schedule:
     """
     name_regex = r'[a-z0-9\_\-]+$'
     visit_cls = Visit
+    periodic_visits_cls = PeriodicVisits
     visit_collection_cls = VisitCollection
     subject_schedule_cls = SubjectSchedule
 
@@ -67,6 +69,12 @@ class Schedule:
     def __repr__(self):
         return f'Schedule({self.name})'
 
+    def __getstate__(self):
+        """Excludes the SubjectSchedule instance, rebuilt when
+        first accessed.
+        """
+        return dict(self.__dict__, _subject=None)
+
     def __str__(self):
         return self.name
 
@@ -74,13 +82,58 @@ class Schedule:
         """Adds a unique visit to the schedule.
         """
         visit = visit or self.visit_cls(**kwargs)
-        for attr in ['code', 'title', 'timepoint', 'rbase']:
-            if getattr(visit, attr) in [getattr(v, attr) for v in self.visits.values()]:
+        self.add_visits([visit])
+        return visit
+
+    def add_visits(self, visits=None):
+        """Adds unique visits to the schedule and returns them
+        as a list.
+
+        All visits are validated before any are added and the
+        schedule's visits are ordered once.
+        """
+        visits = list(visits)
+        batch_values = {attr: set() for attr in self.visits.unique_attrs}
+        for visit in visits:
+            attr = self.visits.get_duplicate_attr(visit)
+            for unique_attr, values in batch_values.items():
+                if attr:
+                    break
+                value = getattr(visit, unique_attr)
+                if value in values:
+                    attr = unique_attr
+                values.add(value)
+            if attr:
                 raise AlreadyRegisteredVisit(
                     f'Visit already registered. Got visit={visit} ({attr}). '
                     f'See schedule \'{self}\'')
-        self.visits.update({visit.code: visit})
-        return visit
+        self.visits.update({visit.code: visit for visit in visits})
+        return visits
+
+    def add_periodic_visits(self, periodic_visits=None, **kwargs):
+        """Adds visits at a regular interval to the schedule and
+        returns the PeriodicVisits instance.
+
+        The visits are created when first accessed, see PeriodicVisits.
+        """
+        periodic_visits = periodic_visits or self.periodic_visits_cls(**kwargs)
+        attr = self.visits.get_periodic_duplicate_attr(periodic_visits)
+        if attr:
+            raise AlreadyRegisteredVisit(
+                f'Visit already registered. Got periodic visits={repr(periodic_visits)} '
+                f'({attr}). See schedule \'{self}\'')
+        self.visits.add_periodic_visits(periodic_visits)
+        return periodic_visits
+
+    @property
+    def fingerprint(self):
+        """Returns a hash of the definition of this schedule, its
+        models and visits.
+        """
+        return get_fingerprint(
+            self.__class__, self.name, self.verbose_name, self.sequence,
+            self.onschedule_model, self.offschedule_model, self.appointment_model,
+            self.consent_model, self.visits.fingerprint)
 
     @property
     def field_value(self):
@@ -116,6 +169,14 @@ class Schedule:
             base_appt_datetime=base_appt_datetime,
             schedule_name=schedule_name)
 
+    def bulk_put_on_schedule(self, subjects=None, schedule_name=None, bulk_create=None):
+        """Wrapper method to put many subjects onto this schedule.
+
+        See SubjectSchedule.bulk_put_on_schedule.
+        """
+        return self.subject.bulk_put_on_schedule(
+            subjects=subjects, schedule_name=schedule_name, bulk_create=bulk_create)
+
     def refresh_schedule(self, subject_identifier=None, schedule_name=None):
         """Resaves the onschedule model to, for example, refresh
         appointments.
@@ -131,6 +192,14 @@ class Schedule:
             offschedule_datetime=offschedule_datetime,
             schedule_name=schedule_name)
 
+    def bulk_take_off_schedule(self, subjects=None, schedule_name=None, bulk_create=None):
+        """Wrapper method to take many subjects off this schedule.
+
+        See SubjectSchedule.bulk_take_off_schedule.
+        """
+        return self.subject.bulk_take_off_schedule(
+            subjects=subjects, schedule_name=schedule_name, bulk_create=bulk_create)
+
     def is_onschedule(self, subject_identifier=None, report_datetime=None):
         try:
             self.subject.onschedule_or_raise(
@@ -140,6 +209,15 @@ class Schedule:
             return False
         return True
 
+    def bulk_is_onschedule(self, subjects=None, compare_as_datetimes=None):
+        """Returns an ordered dictionary of
+        {(subject_identifier, report_datetime): True/False}.
+
+        See SubjectSchedule.bulk_is_onschedule.
+        """
+        return self.subject.bulk_is_onschedule(
+            subjects=subjects, compare_as_datetimes=compare_as_datetimes)
+
     @property
     def onschedule_model_cls(self):
         return self.subject.onschedule_model_cls
@@ -1,22 +1,301 @@
-from collections import OrderedDict
+import threading
+import warnings
 
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict, namedtuple
+from collections.abc import ItemsView, KeysView, ValuesView
+from datetime import timedelta
+from heapq import merge
+from operator import itemgetter
+from types import MappingProxyType
+
+from ..fingerprint import get_fingerprint
 from ..ordered_collection import OrderedCollection
+from ..visit.window_period import get_offset
+from .visit_date_projection import project_visit_dates
+from .window_index import WindowIndex
 
 
 class VisitCollectionError(Exception):
     pass
 
 
+CacheInfo = namedtuple('CacheInfo', ['hits', 'misses', 'maxsize', 'currsize'])
+
+
 class VisitCollection(OrderedCollection):
 
+    """An ordered collection of visits keyed on visit code.
+
+    Besides visits added as instances, may contain periodic visits
+    (see PeriodicVisits) that are created when first accessed.
+    Iteration, lookups, `next` and `previous` cover both.
+    """
+
     key = 'code'
     ordering_attr = 'timepoint'
+    unique_attrs = ['code', 'title', 'timepoint', 'rbase']
+    index_attrs = OrderedCollection.index_attrs + [
+        '_unique_values', '_window_index', '_visit_dates_cache', '_visit_dates_lock',
+        '_fingerprint']
+    visit_dates_cache_size = 128
+
+    def __init__(self, *args, **kwargs):
+        self._unique_values = {attr: set() for attr in self.unique_attrs}
+        self._window_index = None
+        self._fingerprint = None
+        self._visit_dates_cache = OrderedDict()
+        self._visit_dates_lock = threading.Lock()
+        self.visit_dates_cache_hits = 0
+        self.visit_dates_cache_misses = 0
+        self.periodic_visits = []
+        super().__init__(*args, **kwargs)
+
+    def __setitem__(self, key, value):
+        for periodic_visits in self.periodic_visits:
+            if key in periodic_visits:
+                raise VisitCollectionError(
+                    f'Visit code is used by periodic visits. Got {key}. '
+                    f'See {repr(periodic_visits)}.')
+        super().__setitem__(key, value)
+        self._visits_changed()
+        for attr, values in self._unique_values.items():
+            values.add(getattr(value, attr))
+
+    def __delitem__(self, key):
+        value = self[key]
+        super().__delitem__(key)
+        self._visits_changed()
+        for attr, values in self._unique_values.items():
+            values.discard(getattr(value, attr))
+
+    def __getitem__(self, key):
+        try:
+            return super().__getitem__(key)
+        except KeyError:
+            for periodic_visits in self.periodic_visits:
+                if key in periodic_visits:
+                    return periodic_visits[key]
+            raise
+
+    def __contains__(self, key):
+        return super().__contains__(key) or any(
+            key in periodic_visits for periodic_visits in self.periodic_visits)
+
+    def __len__(self):
+        return super().__len__() + sum(
+            len(periodic_visits) for periodic_visits in self.periodic_visits)
+
+    def __iter__(self):
+        if not self.periodic_visits:
+            return super().__iter__()
+        return self._merged_keys()
+
+    def __reversed__(self):
+        if not self.periodic_visits:
+            return super().__reversed__()
+        return self._merged_keys(reverse=True)
+
+    def _merged_keys(self, reverse=None):
+        """Yields the codes of all visits ordered on timepoint.
+        """
+        items = zip(self._ordering, self._keys)
+        iterables = [reversed(list(items)) if reverse else items]
+        for periodic_visits in self.periodic_visits:
+            iterables.append(periodic_visits.timepoint_codes(reverse=reverse))
+        for _, key in merge(*iterables, key=itemgetter(0), reverse=bool(reverse)):
+            yield key
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def keys(self):
+        if not self.periodic_visits:
+            return super().keys()
+        return KeysView(self)
+
+    def values(self):
+        if not self.periodic_visits:
+            return super().values()
+        return ValuesView(self)
+
+    def items(self):
+        if not self.periodic_visits:
+            return super().items()
+        return ItemsView(self)
+
+    def clear(self):
+        super().clear()
+        self._visits_changed()
+        for values in self._unique_values.values():
+            values.clear()
+
+    def _visits_changed(self):
+        """Drops the window index, fingerprint and cached visit dates.
+        """
+        self._version += 1
+        self._window_index = None
+        self._fingerprint = None
+        with self._visit_dates_lock:
+            self._visit_dates_cache.clear()
+
+    @property
+    def fingerprint(self):
+        """Returns a hash of the definitions of the visits and
+        periodic visits in order.
+        """
+        if self._fingerprint is None:
+            self._fingerprint = get_fingerprint(
+                *[visit.fingerprint for visit in super().values()],
+                *[periodic_visits.fingerprint for periodic_visits in self.periodic_visits])
+        return self._fingerprint
+
+    def add_periodic_visits(self, periodic_visits=None):
+        """Adds a PeriodicVisits instance.
+        """
+        self._raise_if_frozen()
+        self.periodic_visits.append(periodic_visits)
+        self.periodic_visits.sort(key=lambda p: p.first_timepoint)
+        self._visits_changed()
+
+    def get_duplicate_attr(self, visit=None):
+        """Returns the name of the first of `unique_attrs` where the
+        visit's value is already used in the collection, or None.
+        """
+        for attr, values in self._unique_values.items():
+            if getattr(visit, attr) in values:
+                return attr
+        for periodic_visits in self.periodic_visits:
+            attr = periodic_visits.get_duplicate_attr(visit)
+            if attr:
+                return attr
+        return None
+
+    def get_periodic_duplicate_attr(self, periodic_visits=None):
+        """Returns the name of the first attr where a value of the
+        periodic visits is already used in the collection, or None.
+        """
+        for visit in super().values():
+            attr = periodic_visits.get_duplicate_attr(visit)
+            if attr:
+                return attr
+        for other in self.periodic_visits:
+            if other.overlaps(periodic_visits):
+                return 'timepoint'
+        return None
+
+    def visit_definitions(self):
+        """Returns a list of the visits added as instances and the
+        first visit of each periodic visits.
+
+        Periodic visits share their forms so, for example, system
+        checks need only inspect one.
+        """
+        return list(super().values()) + [
+            periodic_visits.get_visit(0) for periodic_visits in self.periodic_visits]
+
+    def _get_timepoint(self, key=None):
+        try:
+            return super().__getitem__(key).timepoint
+        except KeyError:
+            for periodic_visits in self.periodic_visits:
+                index = periodic_visits.get_index(key)
+                if index is not None:
+                    return periodic_visits.get_timepoint(index)
+        return None
+
+    def next(self, key):
+        """Returns the next visit or None.
+        """
+        if not self.periodic_visits:
+            return super().next(key)
+        timepoint = self._get_timepoint(key)
+        if timepoint is None:
+            return None
+        candidates = []
+        position = bisect_right(self._ordering, timepoint)
+        if position < len(self._keys):
+            candidates.append((self._ordering[position], self._keys[position]))
+        for periodic_visits in self.periodic_visits:
+            index = periodic_visits.index_after(timepoint)
+            if index is not None:
+                candidates.append((periodic_visits.get_timepoint(index),
+                                   periodic_visits.get_code(index)))
+        if not candidates:
+            return None
+        return self[min(candidates, key=itemgetter(0))[1]]
+
+    def previous(self, key):
+        """Returns the previous visit or None.
+        """
+        if not self.periodic_visits:
+            return super().previous(key)
+        timepoint = self._get_timepoint(key)
+        if timepoint is None:
+            return None
+        candidates = []
+        position = bisect_left(self._ordering, timepoint)
+        if position > 0:
+            candidates.append((self._ordering[position - 1], self._keys[position - 1]))
+        for periodic_visits in self.periodic_visits:
+            index = periodic_visits.index_before(timepoint)
+            if index is not None:
+                candidates.append((periodic_visits.get_timepoint(index),
+                                   periodic_visits.get_code(index)))
+        if not candidates:
+            return None
+        return self[max(candidates, key=itemgetter(0))[1]]
 
     def timepoint_dates(self, dt=None):
         """Returns an ordered dictionary of visit dates calculated
         relative to the first visit.
+
+        Also sets visit.timepoint_datetime for the current thread.
+
+        Deprecated, use `visit_dates`.
         """
+        warnings.warn(
+            'VisitCollection.timepoint_dates is deprecated, use visit_dates.',
+            DeprecationWarning, stacklevel=2)
         timepoint_dates = OrderedDict()
+        for visit, visit_dates in self.visit_dates(dt=dt).items():
+            visit.timepoint_datetime = visit_dates.base
+            timepoint_dates.update({visit: visit_dates.base})
+        return timepoint_dates
+
+    def visit_dates(self, dt=None):
+        """Returns a read-only ordered dictionary of VisitDates named
+        tuples (visit, base, lower, upper) calculated relative to the
+        first visit.
+
+        Unlike `timepoint_dates`, does not change the visits.
+
+        The most recently used `visit_dates_cache_size` results are
+        cached by `dt` until visits are added or removed. See
+        `visit_dates_cache_info`.
+        """
+        key = (dt, getattr(dt, 'tzinfo', None))
+        with self._visit_dates_lock:
+            try:
+                visit_dates = self._visit_dates_cache[key]
+            except KeyError:
+                self.visit_dates_cache_misses += 1
+            else:
+                self.visit_dates_cache_hits += 1
+                self._visit_dates_cache.move_to_end(key)
+                return visit_dates
+        visit_dates = MappingProxyType(self._get_visit_dates(dt=dt))
+        with self._visit_dates_lock:
+            self._visit_dates_cache[key] = visit_dates
+            while len(self._visit_dates_cache) > self.visit_dates_cache_size:
+                self._visit_dates_cache.popitem(last=False)
+        return visit_dates
+
+    def _get_visit_dates(self, dt=None):
+        visit_dates = OrderedDict()
         for visit in self.values():
             try:
                 timepoint_datetime = dt + visit.rbase
@@ -24,7 +303,94 @@ class VisitCollection(OrderedCollection):
                 raise VisitCollectionError(
                     f'Invalid visit.rbase. visit.rbase={visit.rbase}. '
                     f'See {repr(visit)}. Got {e}.')
+            visit_dates.update(
+                {visit: visit.get_visit_dates(timepoint_datetime=timepoint_datetime)})
+        return visit_dates
+
+    def visit_dates_cache_info(self):
+        """Returns a named tuple of hits, misses, maxsize and currsize
+        of the `visit_dates` cache.
+        """
+        return CacheInfo(self.visit_dates_cache_hits, self.visit_dates_cache_misses,
+                         self.visit_dates_cache_size, len(self._visit_dates_cache))
+
+    def _window_definitions(self):
+        """Returns a list of (code, rbase, rlower, rupper) of all
+        visits ordered on timepoint without creating periodic visits.
+        """
+        definitions = [(visit.timepoint, visit.code, visit.rbase, visit.rlower, visit.rupper)
+                       for visit in super().values()]
+        for periodic_visits in self.periodic_visits:
+            definitions.extend(
+                (periodic_visits.get_timepoint(index), periodic_visits.get_code(index),
+                 periodic_visits.get_rbase(index), periodic_visits.rlower,
+                 periodic_visits.rupper)
+                for index in range(0, len(periodic_visits)))
+        definitions.sort(key=itemgetter(0))
+        return [definition[1:] for definition in definitions]
+
+    @property
+    def window_index(self):
+        """Returns a WindowIndex of visit windows as offsets relative
+        to the base datetime or None if any of rbase, rlower or rupper
+        is not a fixed offset (e.g. months).
+
+        Rebuilt after visits are added or removed.
+        """
+        if self._window_index is None:
+            intervals = []
+            for code, rbase, rlower, rupper in self._window_definitions():
+                offsets = [get_offset(value) for value in (rbase, rlower, rupper)]
+                if not all(isinstance(offset, timedelta) for offset in offsets):
+                    intervals = None
+                    break
+                rbase, rlower, rupper = offsets
+                intervals.append((code, rbase - rlower, rbase + rupper))
+            self._window_index = False if intervals is None else WindowIndex(intervals)
+        return self._window_index or None
+
+    def visits_for_datetime(self, base_datetime=None, dt=None):
+        """Returns a list of visits whose window contains `dt`.
+
+        `base_datetime` is the datetime `visit_dates` is relative to.
+        Does not change the visits.
+        """
+        return self.bulk_visits_for_datetime({None: (base_datetime, dt)})[None]
+
+    def bulk_visits_for_datetime(self, datetimes=None):
+        """Returns an ordered dictionary of {key: list of visits} for
+        a dictionary of {key: (base_datetime, dt)}, for example, keyed
+        on subject_identifier.
+
+        See also `visits_for_datetime`.
+        """
+        results = OrderedDict()
+        window_index = self.window_index
+        window_indexes = {}
+        for key, (base_datetime, dt) in datetimes.items():
+            if window_index:
+                codes = window_index.get(dt - base_datetime)
             else:
-                visit.timepoint_datetime = timepoint_datetime
-            timepoint_dates.update({visit: visit.timepoint_datetime})
-        return timepoint_dates
+                if base_datetime not in window_indexes:
+                    window_indexes[base_datetime] = WindowIndex(
+                        (code, base_datetime + rbase - rlower, base_datetime + rbase + rupper)
+                        for code, rbase, rlower, rupper in self._window_definitions())
+                codes = window_indexes[base_datetime].get(dt)
+            results[key] = [self[code] for code in codes]
+        return results
+
+    def project_dates(self, base_datetimes=None):
+        """Returns a VisitDateProjection of the timepoint, lower and
+        upper datetimes of every visit for each of a sequence of base
+        datetimes, for example, one per subject.
+
+        The matrices are numpy datetime64[us] arrays in UTC.
+        Requires numpy.
+
+        Does not change the visits. See `project_visit_dates`.
+        """
+        definitions = self._window_definitions()
+        return project_visit_dates(
+            base_datetimes=base_datetimes,
+            visits=[self[code] for code, _, _, _ in definitions],
+            definitions=[definition[1:] for definition in definitions])
@@ -0,0 +1,73 @@
+from collections import namedtuple
+from datetime import timedelta, timezone
+
+from ..visit.window_period import get_offset
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+VisitDateProjection = namedtuple(
+    'VisitDateProjection', ['visits', 'timepoint', 'lower', 'upper'])
+
+
+class VisitDateProjectionError(Exception):
+    pass
+
+
+def naive_utc(dt=None):
+    """Returns a timezone aware datetime as a naive datetime in UTC.
+    """
+    if dt.tzinfo is None:
+        return dt
+    return dt.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def to_array(datetimes=None):
+    """Returns a numpy datetime64[us] array in UTC of a list of
+    datetimes.
+    """
+    return np.array([naive_utc(dt) for dt in datetimes], dtype='datetime64[us]')
+
+
+def project_visit_dates(base_datetimes=None, visits=None, definitions=None):
+    """Returns a VisitDateProjection of subjects x visits matrices
+    of the timepoint, lower and upper datetimes of each visit for
+    each base datetime.
+
+    `definitions` is a list of (rbase, rlower, rupper), one per visit.
+
+    The matrices are numpy datetime64[us] arrays in UTC. Requires
+    numpy, see `pip install edc-visit-schedule[numpy]`.
+
+    Fixed offsets (days, weeks) are applied to a whole column of
+    subjects at once, as elapsed time. Month or year offsets use
+    calendar (relativedelta) arithmetic per subject on the given,
+    possibly timezone aware, datetimes as `VisitCollection.visit_dates`
+    does and are then converted to UTC.
+    """
+    if np is None:
+        raise VisitDateProjectionError(
+            'Projecting visit dates requires numpy. '
+            'Install with `pip install edc-visit-schedule[numpy]`.')
+    base_datetimes = list(base_datetimes)
+    bases = to_array(base_datetimes)
+    shape = (len(bases), len(definitions))
+    timepoint, lower, upper = [np.empty(shape, dtype='datetime64[us]') for _ in range(0, 3)]
+    for column, definition in enumerate(definitions):
+        base_offset, lower_offset, upper_offset = [get_offset(r) for r in definition]
+        timepoints = None
+        if isinstance(base_offset, timedelta):
+            timepoint[:, column] = bases + np.timedelta64(base_offset)
+        else:
+            timepoints = [dt + base_offset for dt in base_datetimes]
+            timepoint[:, column] = to_array(timepoints)
+        for matrix, offset in [(lower, -lower_offset), (upper, upper_offset)]:
+            if isinstance(offset, timedelta):
+                matrix[:, column] = timepoint[:, column] + np.timedelta64(offset)
+            else:
+                if timepoints is None:
+                    timepoints = [dt + base_offset for dt in base_datetimes]
+                matrix[:, column] = to_array([dt + offset for dt in timepoints])
+    return VisitDateProjection(visits, timepoint, lower, upper)
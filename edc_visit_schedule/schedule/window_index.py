@@ -0,0 +1,38 @@
+from bisect import bisect_left
+
+
+class WindowIndex:
+
+    """An index of closed intervals (key, lower, upper) that returns
+    the keys of the intervals containing a value in O(log n).
+
+    The sorted interval boundaries divide the line into boundary
+    points and the gaps between them. The keys covering each point
+    and gap are precomputed, in the order the intervals were given.
+    """
+
+    def __init__(self, intervals=None):
+        intervals = [(key, lower, upper) for key, lower, upper in intervals
+                     if lower <= upper]
+        self.bounds = sorted({bound for _, lower, upper in intervals
+                              for bound in (lower, upper)})
+        segments = [[] for _ in range(0, 2 * len(self.bounds))]
+        for key, lower, upper in intervals:
+            start = bisect_left(self.bounds, lower)
+            end = bisect_left(self.bounds, upper)
+            for segment in range(2 * start, 2 * end + 1):
+                segments[segment].append(key)
+        self.segments = [tuple(keys) for keys in segments]
+
+    def __repr__(self):
+        return f'{self.__class__.__name__}(bounds={len(self.bounds)})'
+
+    def get(self, value=None):
+        """Returns a tuple of the keys of intervals that contain value.
+        """
+        position = bisect_left(self.bounds, value)
+        if position < len(self.bounds) and self.bounds[position] == value:
+            return self.segments[2 * position]
+        if position == 0 or position == len(self.bounds):
+            return ()
+        return self.segments[2 * position - 1]
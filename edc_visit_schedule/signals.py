@@ -1,29 +1,30 @@
+from django.apps import apps as django_apps
 from django.db.models.signals import post_save, post_delete
-from django.dispatch import receiver
 
 from .constants import ON_SCHEDULE
 from .site_visit_schedules import site_visit_schedules, SiteVisitScheduleError
+from .subject_schedule_history_cache import subject_schedule_history_cache
 
 
-@receiver(post_save, weak=False, dispatch_uid='offschedule_model_on_post_save')
 def offschedule_model_on_post_save(instance, raw, update_fields, **kwargs):
+    subject_schedule_history_cache.invalidate(
+        subject_identifier=instance.subject_identifier)
     if not raw and not update_fields:
-        try:
-            instance.take_off_schedule()
-        except AttributeError:
-            pass
+        instance.take_off_schedule()
 
 
-@receiver(post_save, weak=False, dispatch_uid='onschedule_model_on_post_save')
 def onschedule_model_on_post_save(instance, raw, update_fields, **kwargs):
+    subject_schedule_history_cache.invalidate(
+        subject_identifier=instance.subject_identifier)
     if not raw and not update_fields:
-        try:
-            instance.put_on_schedule()
-        except AttributeError:
-            pass
+        instance.put_on_schedule()
+
+
+def history_model_on_post_save_or_delete(instance, **kwargs):
+    subject_schedule_history_cache.invalidate(
+        subject_identifier=instance.subject_identifier)
 
 
-@receiver(post_delete, weak=False, dispatch_uid='offschedule_model_on_post_delete')
 def offschedule_model_on_post_delete(instance, **kwargs):
     try:
         _, schedule = site_visit_schedules.get_by_offschedule_model(
@@ -31,26 +32,61 @@ def offschedule_model_on_post_delete(instance, **kwargs):
     except SiteVisitScheduleError:
         pass
     else:
-        if schedule.offschedule_model == instance._meta.label_lower:
-            history_obj = schedule.history_model_cls.objects.get(
-                subject_identifier=instance.subject_identifier,
-                onschedule_model=schedule.onschedule_model)
-            history_obj.offschedule_datetime = None
-            history_obj.schedule_status = ON_SCHEDULE
-            history_obj.save()
-            onschedule_model_obj = schedule.onschedule_model_cls.objects.get(
-                subject_identifier=instance.subject_identifier)
-            onschedule_model_obj.save()
-
-
-@receiver(post_delete, weak=False, dispatch_uid='onschedule_model_on_post_delete')
+        history_obj = schedule.history_model_cls.objects.get(
+            subject_identifier=instance.subject_identifier,
+            onschedule_model=schedule.onschedule_model)
+        history_obj.offschedule_datetime = None
+        history_obj.schedule_status = ON_SCHEDULE
+        history_obj.save()
+        onschedule_model_obj = schedule.onschedule_model_cls.objects.get(
+            subject_identifier=instance.subject_identifier)
+        onschedule_model_obj.save()
+
+
 def onschedule_model_on_post_delete(instance, **kwargs):
+    subject_schedule_history_cache.invalidate(
+        subject_identifier=instance.subject_identifier)
     try:
-        _, schedule = site_visit_schedules.get_by_offschedule_model(
+        _, schedule = site_visit_schedules.get_by_onschedule_model(
             instance._meta.label_lower)
     except SiteVisitScheduleError:
         pass
     else:
-        if schedule.onschedule_model == instance._meta.label_lower:
-            schedule.history_model_cls.objects.filter(
-                subject_identifier=instance.subject_identifier).delete()
+        opts = dict(onschedule_model=instance._meta.label_lower)
+        if instance.schedule_name:
+            opts.update(schedule_name=instance.schedule_name)
+        schedule.history_model_cls.objects.filter(
+            subject_identifier=instance.subject_identifier, **opts).delete()
+
+
+def connect_visit_schedule_signals(visit_schedule):
+    """Connects the on/offschedule receivers to the on/offschedule
+    models of each schedule in the visit schedule.
+
+    Models that cannot be found are skipped (see system checks).
+    """
+    for schedule in visit_schedule.schedules.values():
+        for model, receivers in [
+                (schedule.onschedule_model,
+                 [(post_save, onschedule_model_on_post_save),
+                  (post_delete, onschedule_model_on_post_delete)]),
+                (schedule.offschedule_model,
+                 [(post_save, offschedule_model_on_post_save),
+                  (post_delete, offschedule_model_on_post_delete)])]:
+            try:
+                model_cls = django_apps.get_model(model)
+            except (LookupError, ValueError):
+                continue
+            for signal, receiver in receivers:
+                signal.connect(
+                    receiver, sender=model_cls, weak=False,
+                    dispatch_uid=f'{receiver.__name__}.{model}')
+        history_model = schedule.subject_schedule_cls.history_model
+        try:
+            model_cls = django_apps.get_model(history_model)
+        except (LookupError, ValueError):
+            continue
+        for signal in [post_save, post_delete]:
+            signal.connect(
+                history_model_on_post_save_or_delete, sender=model_cls, weak=False,
+                dispatch_uid=f'history_model_on_post_save_or_delete.{history_model}')
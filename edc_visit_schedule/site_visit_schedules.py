@@ -1,8 +1,26 @@
-import copy
 import sys
+import time
 
+from collections import namedtuple
+from importlib import import_module
+from itertools import groupby
+from types import MappingProxyType
 from django.apps import apps as django_apps
-from django.utils.module_loading import import_module, module_has_submodule
+
+from .app_module_spec import find_app_module_spec
+from .constants import PRN, SCHEDULED, UNSCHEDULED
+from .fingerprint import get_fingerprint
+from .registry_artifact import (
+    dump_registry, get_dependencies, get_source_files, get_source_hashes, load_registry)
+from .visit import PeriodicVisits
+
+FormReference = namedtuple(
+    'FormReference', ['visit_schedule', 'schedule', 'visit', 'form', 'category'])
+
+AutodiscoverTiming = namedtuple(
+    'AutodiscoverTiming',
+    ['app', 'module', 'seconds', 'visit_schedules', 'schedules', 'visits', 'forms'])
+
 
 class RegistryNotLoaded(Exception):
     pass
@@ -21,11 +39,27 @@ class SiteVisitSchedules:
     """ Main controller of :class:`VisitSchedule` objects.
 
     A visit_schedule contains schedules
+
+    After autodiscover, AppConfig.ready calls `freeze` to make the
+    registry read only and compile lookup tables.
     """
 
     def __init__(self):
         self._registry = {}
         self._all_post_consent_models = None
+        self._indexed_registry = None
+        self._indexed_state = None
+        self._onschedule_models = {}
+        self._onschedule_model_schedule_names = {}
+        self._offschedule_models = {}
+        self._form_models = None
+        self._panel_names = None
+        self._frozen_registry = None
+        self._visit_schedule_names = {}
+        self._schedule_names = {}
+        self._visit_codes = {}
+        self._frozen_fingerprint = None
+        self.autodiscover_report = []
         self.loaded = False
 
     @property
@@ -36,18 +70,240 @@ class SiteVisitSchedules:
                 'declared in settings?.')
         return self._registry
 
+    @property
+    def frozen(self):
+        """Returns True if the registry is frozen.
+
+        Replacing the registry (e.g. in tests) unfreezes it.
+        """
+        return self._frozen_registry is not None and self._frozen_registry is self._registry
+
+    def freeze(self):
+        """Makes the registry read only and compiles lookup tables
+        of visit schedule names, dotted "visit_schedule.schedule"
+        names and visit codes.
+
+        The schedules and visits collections of registered visit
+        schedules are frozen as well, until the registry is replaced.
+
+        Periodic visits are not created, so only the first code of
+        each periodic visits is in the visit code table.
+        """
+        registry = MappingProxyType(dict(self.registry))
+
+        def frozen():
+            return self._registry is registry
+
+        self._visit_schedule_names = {}
+        self._schedule_names = {}
+        self._visit_codes = {}
+        for visit_schedule in registry.values():
+            visit_schedule.schedules.freeze(frozen=frozen)
+            self._visit_schedule_names[visit_schedule.name] = visit_schedule
+            for schedule in visit_schedule.schedules.values():
+                schedule.visits.freeze(frozen=frozen)
+                name = f'{visit_schedule.name}.{schedule.name}'
+                self._visit_schedule_names[name] = visit_schedule
+                self._schedule_names[name] = (visit_schedule, schedule)
+                for visit in schedule.visits.visit_definitions():
+                    self._visit_codes[(name, visit.code)] = visit
+        self._registry = registry
+        self._rebuild_indexes()
+        self._frozen_fingerprint = None
+        self._frozen_registry = registry
+
+    @property
+    def fingerprint(self):
+        """Returns a hash of the definitions of the registered visit
+        schedules.
+
+        Use as a cache key to invalidate anything built from the
+        registry when a definition changes. Computed once if frozen.
+        """
+        if not self.frozen:
+            return self._get_fingerprint()
+        if self._frozen_fingerprint is None:
+            self._frozen_fingerprint = self._get_fingerprint()
+        return self._frozen_fingerprint
+
+    def _get_fingerprint(self):
+        return get_fingerprint(*[
+            (name, self.registry[name].fingerprint) for name in sorted(self.registry)])
+
+    def _raise_if_frozen(self):
+        if self.frozen:
+            raise SiteVisitScheduleError(
+                'Registry is frozen. Visit schedules cannot be registered '
+                'after AppConfig.ready.')
+
     def register(self, visit_schedule):
         self.loaded = True
+        if self.frozen and self.is_registered(visit_schedule):
+            # e.g. a visit_schedules module imported after loading an artifact
+            return
+        self._raise_if_frozen()
         if not visit_schedule.schedules:
             raise SiteVisitScheduleError(
                 f'Visit schedule {visit_schedule} has no schedules. '
                 f'Add one before registering.')
-        if visit_schedule.name not in self.registry:
-            self.registry.update({visit_schedule.name: visit_schedule})
-        else:
+        if visit_schedule.name in self.registry:
             raise AlreadyRegisteredVisitSchedule(
                 f'Visit Schedule {visit_schedule} is already registered.')
+        stale = self._indexes_stale()
+        self.registry.update({visit_schedule.name: visit_schedule})
         self._all_post_consent_models = None
+        if stale:
+            self._rebuild_indexes()
+        else:
+            self._update_indexes(visit_schedule)
+            self._indexed_state = self._get_registry_state()
+        if django_apps.models_ready:
+            self._connect_signals(visit_schedule)
+
+    def is_registered(self, visit_schedule):
+        """Returns True if a visit schedule with the same name and
+        definition, by fingerprint, is registered.
+        """
+        registered = self.registry.get(visit_schedule.name)
+        return bool(registered and registered.fingerprint == visit_schedule.fingerprint)
+
+    def _connect_signals(self, visit_schedule):
+        from .signals import connect_visit_schedule_signals
+        connect_visit_schedule_signals(visit_schedule)
+
+    def connect_signals(self):
+        """Connects the on/offschedule model signal receivers
+        for all registered visit schedules.
+
+        Called by AppConfig.ready after autodiscover.
+        """
+        for visit_schedule in self.registry.values():
+            self._connect_signals(visit_schedule)
+
+    def _update_indexes(self, visit_schedule):
+        """Adds the schedules of a visit schedule to the model
+        label indexes and, if built, the forms of their visits to
+        the form model and panel name indexes.
+
+        The first schedule registered for a label wins, as it would
+        when walking the registry in order.
+        """
+        for schedule in visit_schedule.schedules.values():
+            value = (visit_schedule, schedule)
+            self._onschedule_models.setdefault(schedule.onschedule_model, value)
+            self._onschedule_model_schedule_names.setdefault(
+                (schedule.onschedule_model, schedule.name), value)
+            self._offschedule_models.setdefault(schedule.offschedule_model, value)
+        if self._form_models is not None:
+            self._update_form_indexes(visit_schedule, self._form_models, self._panel_names)
+
+    @staticmethod
+    def _update_form_indexes(visit_schedule, form_models, panel_names):
+        """Adds a FormReference for each form of each visit of a visit
+        schedule to the form model and panel name indexes.
+
+        Periodic visits are not created. For each PeriodicVisits, the
+        forms of its first visit, which all its visits share, are
+        added with the PeriodicVisits as `visit`. These are resolved
+        by `_resolve_form_references` when queried.
+        """
+        for schedule in visit_schedule.schedules.values():
+            definitions = schedule.visits.visit_definitions()
+            periodic_visits = schedule.visits.periodic_visits
+            visits = definitions[:len(definitions) - len(periodic_visits)] + periodic_visits
+            for visit, definition in zip(visits, definitions):
+                for category, forms in [(SCHEDULED, definition.forms),
+                                        (UNSCHEDULED, definition.unscheduled_forms),
+                                        (PRN, definition.prn_forms)]:
+                    for form in forms:
+                        reference = FormReference(
+                            visit_schedule, schedule, visit, form, category)
+                        form_models.setdefault(form.model, []).append(reference)
+                        panel = getattr(form, 'panel', None)
+                        if panel is not None:
+                            panel_names.setdefault(panel.name, []).append(reference)
+
+    @staticmethod
+    def _resolve_form_references(references):
+        """Returns a list of FormReferences where each reference to a
+        PeriodicVisits is replaced by a reference to each of its
+        visits, creating them if they do not exist.
+
+        References are ordered on visit timepoint within each schedule.
+        """
+        resolved = []
+        for _, schedule_references in groupby(
+                references, key=lambda r: (id(r.visit_schedule), id(r.schedule))):
+            schedule_resolved = []
+            for reference in schedule_references:
+                if isinstance(reference.visit, PeriodicVisits):
+                    schedule_resolved.extend(
+                        reference._replace(visit=reference.visit.get_visit(index))
+                        for index in range(0, len(reference.visit)))
+                else:
+                    schedule_resolved.append(reference)
+            resolved.extend(sorted(schedule_resolved, key=lambda r: r.visit.timepoint))
+        return resolved
+
+    def _rebuild_indexes(self):
+        """Rebuilds the model label indexes from the registry.
+        """
+        self._onschedule_models.clear()
+        self._onschedule_model_schedule_names.clear()
+        self._offschedule_models.clear()
+        self._form_models = None
+        self._panel_names = None
+        for visit_schedule in self._registry.values():
+            self._update_indexes(visit_schedule)
+        self._indexed_registry = self._registry
+        self._indexed_state = self._get_registry_state()
+
+    def _get_registry_state(self):
+        """Returns a list of each registered visit schedule with the
+        versions of its schedules and visits collections.
+        """
+        return [(name, visit_schedule, visit_schedule.schedules.version,
+                 [(schedule, schedule.visits.version)
+                  for schedule in visit_schedule.schedules.values()])
+                for name, visit_schedule in self._registry.items()]
+
+    def _indexes_stale(self):
+        """Returns True if the registry was replaced or, unless
+        frozen, changed since the indexes were built.
+
+        For example, a schedule added to a registered visit schedule
+        or a visit schedule set directly on the registry.
+        """
+        if self._indexed_registry is not self.registry:
+            return True
+        return not self.frozen and self._indexed_state != self._get_registry_state()
+
+    def _get_indexed(self, index, key):
+        """Returns the value for key from an index or None.
+
+        Indexes are rebuilt if the registry changed since they
+        were last built (see `_indexes_stale`).
+        """
+        if self._indexes_stale():
+            self._rebuild_indexes()
+        return index.get(key)
+
+    def _get_form_references(self, index_name, key):
+        """Returns a list of FormReferences from the form model or
+        panel name index.
+
+        The form indexes are built from the registry when first
+        queried and are then kept up to date by `register`.
+        """
+        if self._indexes_stale():
+            self._rebuild_indexes()
+        if self._form_models is None:
+            form_models, panel_names = {}, {}
+            for visit_schedule in self._registry.values():
+                self._update_form_indexes(visit_schedule, form_models, panel_names)
+            self._panel_names = panel_names
+            self._form_models = form_models
+        return getattr(self, index_name).get(key, [])
 
     @property
     def visit_schedules(self):
@@ -56,6 +312,11 @@ class SiteVisitSchedules:
     def get_visit_schedule(self, visit_schedule_name=None, **kwargs):
         """Returns a visit schedule instance or raises.
         """
+        if self._frozen_registry is self._registry:
+            try:
+                return self._visit_schedule_names[visit_schedule_name]
+            except (KeyError, TypeError):
+                pass
         try:
             visit_schedule_name = visit_schedule_name.split('.')[0]
         except AttributeError:
@@ -83,76 +344,196 @@ class SiteVisitSchedules:
                 visit_schedule_name)
         return visit_schedules or self.registry
 
+    def get_schedule(self, name=None):
+        """Returns a tuple of visit_schedule, schedule for the
+        dotted name "visit_schedule_name.schedule_name" or raises.
+        """
+        if self._frozen_registry is self._registry:
+            try:
+                return self._schedule_names[name]
+            except (KeyError, TypeError):
+                pass
+        try:
+            visit_schedule_name, schedule_name = name.split('.')
+        except (AttributeError, ValueError):
+            raise SiteVisitScheduleError(
+                f'Invalid schedule name. Expected \'visit_schedule_name.schedule_name\'. '
+                f'Got \'{name}\'.')
+        visit_schedule = self.get_visit_schedule(visit_schedule_name)
+        schedule = visit_schedule.schedules.get(schedule_name)
+        if not schedule:
+            raise SiteVisitScheduleError(
+                f'Schedule not found. Got \'{name}\'. See {repr(self)}.')
+        return visit_schedule, schedule
+
+    def get_visit(self, name=None, visit_code=None):
+        """Returns the visit for the dotted schedule name
+        "visit_schedule_name.schedule_name" and visit code or raises.
+        """
+        if self._frozen_registry is self._registry:
+            try:
+                return self._visit_codes[(name, visit_code)]
+            except (KeyError, TypeError):
+                pass
+        _, schedule = self.get_schedule(name)
+        visit = schedule.visits.get(visit_code)
+        if not visit:
+            raise SiteVisitScheduleError(
+                f'Visit not found. Got \'{name}\', visit_code=\'{visit_code}\'.')
+        return visit
+
     def get_by_onschedule_model(self, onschedule_model=None):
         """Returns a tuple of visit_schedule, schedule
         for the given onschedule model.
         """
-        schedule = None
-        for visit_schedule in self.visit_schedules.values():
-            for schedule in visit_schedule.schedules.values():
-                if schedule.onschedule_model == onschedule_model:
-                    return visit_schedule, schedule
-        raise SiteVisitScheduleError(
-            f'Schedule not found. No schedule exists for '
-            f'onschedule_model={onschedule_model}.')
-        return None
+        value = self._get_indexed(self._onschedule_models, onschedule_model)
+        if not value:
+            raise SiteVisitScheduleError(
+                f'Schedule not found. No schedule exists for '
+                f'onschedule_model={onschedule_model}.')
+        return value
 
     def get_by_onschedule_model_schedule_name(self, onschedule_model=None, name=None):
         """Returns a tuple of visit_schedule, schedule
         for the given onschedule model and schedule name.
         """
-        schedule = None
-        for visit_schedule in self.visit_schedules.values():
-            for schedule in visit_schedule.schedules.values():
-                if schedule.onschedule_model == onschedule_model and schedule.name == name:
-                    return visit_schedule, schedule
-        raise SiteVisitScheduleError(
-            f'Schedule not found. No schedule exists for '
-            f'onschedule_model={onschedule_model}.')
-        return None
+        value = self._get_indexed(
+            self._onschedule_model_schedule_names, (onschedule_model, name))
+        if not value:
+            raise SiteVisitScheduleError(
+                f'Schedule not found. No schedule exists for '
+                f'onschedule_model={onschedule_model}.')
+        return value
 
     def get_by_offschedule_model(self, offschedule_model=None):
         """Returns a tuple of visit_schedule, schedule
         for the given offschedule model.
         """
-        for visit_schedule in self.visit_schedules.values():
-            for schedule in visit_schedule.schedules.values():
-                if schedule.offschedule_model == offschedule_model:
-                    return visit_schedule, schedule
-        raise SiteVisitScheduleError(
-            f'Schedule not found. No schedule exists for '
-            f'offschedule_model={offschedule_model}.')
-        return None, None
+        value = self._get_indexed(self._offschedule_models, offschedule_model)
+        if not value:
+            raise SiteVisitScheduleError(
+                f'Schedule not found. No schedule exists for '
+                f'offschedule_model={offschedule_model}.')
+        return value
+
+    def get_by_form_model(self, model=None, category=None):
+        """Returns a list of FormReference named tuples, (visit_schedule,
+        schedule, visit, form, category), for each visit that includes
+        the CRF or requisition model.
+
+        `category` is one of SCHEDULED, UNSCHEDULED or PRN. If None,
+        references of all categories are returned.
+
+        Periodic visits are created only if they include the model.
+        """
+        references = self._get_form_references('_form_models', model)
+        return self._resolve_form_references(
+            [reference for reference in references
+             if category is None or reference.category == category])
+
+    def get_by_panel_name(self, panel_name=None, category=None):
+        """Returns a list of FormReference named tuples for each visit
+        that includes a requisition for the panel.
+
+        See also `get_by_form_model`.
+        """
+        references = self._get_form_references('_panel_names', panel_name)
+        return self._resolve_form_references(
+            [reference for reference in references
+             if category is None or reference.category == category])
 
     def autodiscover(self, module_name=None, apps=None, verbose=None):
         """Autodiscovers classes in the visit_schedules.py file of
         any INSTALLED_APP.
+
+        Returns a list of AutodiscoverTiming named tuples, one per
+        imported module, also kept as `autodiscover_report`.
         """
         self.loaded = True
+        self._raise_if_frozen()
         module_name = module_name or 'visit_schedules'
         verbose = True if verbose is None else verbose
         if verbose:
             sys.stdout.write(
                 f' * checking site for module \'{module_name}\' ...\n')
+        report = []
         for app in (apps or django_apps.app_configs):
-            try:
-                mod = import_module(app)
-                try:
-                    before_import_registry = copy.copy(
-                        site_visit_schedules._registry)
-                    import_module(f'{app}.{module_name}')
-                    if verbose:
-                        sys.stdout.write(
-                            ' * registered visit schedule from '
-                            f'\'{app}\'\n')
-                except Exception as e:
-                    if f'No module named \'{app}.{module_name}\'' not in str(e):
-                        raise
-                    site_visit_schedules._registry = before_import_registry
-                    if module_has_submodule(mod, module_name):
-                        raise
-            except ModuleNotFoundError:
-                pass
+            if not find_app_module_spec(app=app, module_name=module_name):
+                continue
+            names = set(self._registry)
+            start = time.perf_counter()
+            import_module(f'{app}.{module_name}')
+            seconds = time.perf_counter() - start
+            visit_schedules = [
+                visit_schedule for name, visit_schedule in self._registry.items()
+                if name not in names]
+            report.append(self.get_autodiscover_timing(
+                app, f'{app}.{module_name}', seconds, visit_schedules))
+            if verbose:
+                sys.stdout.write(
+                    ' * registered visit schedule from '
+                    f'\'{app}\'\n')
+        self.autodiscover_report = report
+        return report
+
+    @staticmethod
+    def get_autodiscover_timing(app=None, module=None, seconds=None, visit_schedules=None):
+        """Returns an AutodiscoverTiming for the visit schedules
+        registered by importing a module.
+
+        Periodic visits are counted once, as they are declared.
+        """
+        schedules = [schedule for visit_schedule in visit_schedules
+                     for schedule in visit_schedule.schedules.values()]
+        visits = [visit for schedule in schedules
+                  for visit in schedule.visits.visit_definitions()]
+        return AutodiscoverTiming(
+            app=app,
+            module=module,
+            seconds=seconds,
+            visit_schedules=[visit_schedule.name for visit_schedule in visit_schedules],
+            schedules=len(schedules),
+            visits=len(visits),
+            forms=sum(len(visit.forms + visit.unscheduled_forms + visit.prn_forms)
+                      for visit in visits))
+
+    def export_artifact(self, path=None, module_name=None, apps=None):
+        """Writes the registered visit schedules to an artifact file
+        that `load_artifact` can load instead of autodiscovering.
+
+        The artifact keeps the hashes of the visit schedule modules
+        and of the python files of the apps they import from.
+        """
+        apps = apps or django_apps.app_configs
+        source_files = get_source_files(
+            module_name=module_name or 'visit_schedules', apps=apps)
+        packages = [app_config.name for app_config in django_apps.get_app_configs()]
+        filenames = get_dependencies(
+            filenames=[f for filenames in source_files.values() for f in filenames],
+            packages=[*apps, *packages])
+        dump_registry(
+            path=path, registry=self.registry, source_files=source_files,
+            source_hashes=get_source_hashes(filenames=filenames))
+
+    def load_artifact(self, path=None, module_name=None, apps=None):
+        """Registers the visit schedules of an artifact file, written
+        by `export_artifact`, and returns True or returns False if the
+        file does not exist or is stale.
+
+        The artifact is stale if the visit schedule modules of the apps,
+        or any python file they import from, changed since it was
+        written.
+        """
+        self._raise_if_frozen()
+        source_files = get_source_files(
+            module_name=module_name or 'visit_schedules',
+            apps=apps or django_apps.app_configs)
+        registry = load_registry(path=path, source_files=source_files)
+        if registry is None:
+            return False
+        for visit_schedule in registry.values():
+            self.register(visit_schedule)
+        return True
 
     @property
     def all_post_consent_models(self):
@@ -166,15 +547,22 @@ class SiteVisitSchedules:
         return self._all_post_consent_models
 
     def check(self):
+        """Returns a dictionary of lists of warnings for visit
+        schedules, schedules and visits.
+
+        Every warning is collected. Form models are looked up once
+        for all visits.
+        """
         if not self.loaded:
             raise SiteVisitScheduleError('Registry is not loaded.')
         errors = {'visit_schedules': [], 'schedules': [], 'visits': []}
+        lookup_errors = {}
         for visit_schedule in site_visit_schedules.visit_schedules.values():
             errors['visit_schedules'].extend(visit_schedule.check())
             for schedule in visit_schedule.schedules.values():
                 errors['schedules'].extend(schedule.check())
-                for visit in schedule.visits.values():
-                    errors['visits'].extend(visit.check())
+                for visit in schedule.visits.visit_definitions():
+                    errors['visits'].extend(visit.check(lookup_errors=lookup_errors))
         return errors
 
 
@@ -1,12 +1,19 @@
-from django.apps import apps as django_apps
+from collections import OrderedDict
+from functools import reduce
+from operator import or_
 from django.conf import settings
+from django.contrib.sites.models import Site
 from django.core.exceptions import ObjectDoesNotExist, MultipleObjectsReturned
+from django.db import transaction
+from django.db.models import Case, DateTimeField, Max, Q, Value, When
 from edc_base.utils import get_utcnow, convert_php_dateformat
 
 from edc_appointment.constants import IN_PROGRESS_APPT, COMPLETE_APPT
 from edc_appointment.creators import AppointmentsCreator
 
 from .constants import OFF_SCHEDULE, ON_SCHEDULE
+from .model_cls_cache import get_model_cls
+from .subject_schedule_history_cache import subject_schedule_history_cache
 
 
 class SubjectScheduleError(Exception):
@@ -43,6 +50,7 @@ class SubjectSchedule:
     history_model = 'edc_visit_schedule.subjectschedulehistory'
     registered_subject_model = 'edc_registration.registeredsubject'
     appointments_creator_cls = AppointmentsCreator
+    bulk_batch_size = 500
 
     def __init__(self, visit_schedule=None, schedule=None):
         self.visit_schedule = visit_schedule
@@ -56,19 +64,19 @@ class SubjectSchedule:
 
     @property
     def onschedule_model_cls(self):
-        return django_apps.get_model(self.onschedule_model)
+        return get_model_cls(self.onschedule_model)
 
     @property
     def offschedule_model_cls(self):
-        return django_apps.get_model(self.offschedule_model)
+        return get_model_cls(self.offschedule_model)
 
     @property
     def history_model_cls(self):
-        return django_apps.get_model(self.history_model)
+        return get_model_cls(self.history_model)
 
     @property
     def appointment_model_cls(self):
-        return django_apps.get_model(self.appointment_model)
+        return get_model_cls(self.appointment_model)
 
     @property
     def visit_model_cls(self):
@@ -119,13 +127,256 @@ class SubjectSchedule:
                 schedule_status=ON_SCHEDULE)
         if history_obj.schedule_status == ON_SCHEDULE:
             # create appointments per schedule
-            creator = self.appointments_creator_cls(
-                report_datetime=onschedule_datetime,
+            self._create_appointments(
                 subject_identifier=subject_identifier,
-                schedule=self.schedule,
-                visit_schedule=self.visit_schedule,
-                appointment_model=self.appointment_model)
-            creator.create_appointments(base_appt_datetime or onschedule_datetime)
+                onschedule_datetime=onschedule_datetime,
+                base_appt_datetime=base_appt_datetime)
+
+    def bulk_put_on_schedule(self, subjects=None, schedule_name=None, bulk_create=None):
+        """Puts many subjects on-schedule.
+
+        `subjects` is an iterable of (subject_identifier,
+        onschedule_datetime) pairs. If onschedule_datetime is None,
+        now is used.
+
+        Registrations, consents, onschedule model instances and
+        history instances are fetched per batch of subjects. Each
+        subject is then put on schedule, as `put_on_schedule` does,
+        from the fetched instances in its own savepoint. Onschedule
+        model instances are created with `save`, so audit history and
+        post_save signals run as for a single subject.
+
+        If `bulk_create` is True, missing onschedule and history
+        instances are bulk created per batch instead. Audit history
+        rows are created for the onschedule instances but their `save`
+        methods and post_save signals are skipped.
+
+        Either way, a subject for whom appointments cannot be created
+        is not put on schedule and the error is returned.
+
+        Returns an ordered dictionary of {subject_identifier: error}
+        where error is None if the subject was put on schedule.
+        """
+        results = OrderedDict()
+        for batch in self._batches(subjects):
+            with transaction.atomic():
+                if bulk_create:
+                    results.update(self._bulk_put_on_schedule(
+                        subjects=batch, schedule_name=schedule_name))
+                else:
+                    results.update(self._put_on_schedule_per_subject(
+                        subjects=batch, schedule_name=schedule_name))
+        subject_schedule_history_cache.invalidate()
+        return results
+
+    def _batches(self, subjects=None):
+        """Yields ordered dictionaries of {subject_identifier: datetime}
+        of up to `bulk_batch_size` subjects.
+        """
+        subjects = OrderedDict(
+            (subject_identifier, dt or get_utcnow()) for subject_identifier, dt in subjects)
+        subject_identifiers = list(subjects)
+        for index in range(0, len(subject_identifiers), self.bulk_batch_size):
+            yield OrderedDict(
+                (subject_identifier, subjects[subject_identifier])
+                for subject_identifier in subject_identifiers[
+                    index:index + self.bulk_batch_size])
+
+    def _bulk_create(self, model_cls=None, objs=None):
+        """Bulk creates model instances and, if the model has
+        `HistoricalRecords`, their audit history rows.
+        """
+        model_cls.objects.bulk_create(objs)
+        if objs and hasattr(model_cls, 'history'):
+            model_cls.history.bulk_history_create(objs)
+
+    @staticmethod
+    def _savepoint(func, *args, **kwargs):
+        """Returns None or the exception raised by `func` in a savepoint.
+        """
+        try:
+            with transaction.atomic():
+                func(*args, **kwargs)
+        except Exception as e:
+            return e
+        return None
+
+    def _bulk_validate_onschedule(self, subjects=None, schedule_name=None):
+        """Returns a tuple of an ordered dictionary of
+        {subject_identifier: error} and the set of subject identifiers
+        already on schedule.
+
+        Validates new subjects as `registered_or_raise` and
+        `consented_or_raise` do but without raising.
+        """
+        results = OrderedDict((subject_identifier, None) for subject_identifier in subjects)
+        opts = dict(subject_identifier__in=list(subjects))
+        if schedule_name:
+            opts.update(schedule_name=schedule_name)
+        onscheduled = set(
+            self.onschedule_model_cls.objects.filter(**opts).values_list(
+                'subject_identifier', flat=True))
+        new_subject_identifiers = [s for s in subjects if s not in onscheduled]
+        registered = set(
+            get_model_cls(self.registered_subject_model).objects.filter(
+                subject_identifier__in=new_subject_identifiers).values_list(
+                    'subject_identifier', flat=True))
+        consented = set(
+            get_model_cls(self.consent_model).objects.filter(
+                subject_identifier__in=new_subject_identifiers).values_list(
+                    'subject_identifier', flat=True))
+        for subject_identifier in new_subject_identifiers:
+            if subject_identifier not in registered:
+                results[subject_identifier] = UnknownSubjectError(
+                    f'Failed to put subject on schedule. Unknown subject.  '
+                    f'Got {subject_identifier}.')
+            elif subject_identifier not in consented:
+                results[subject_identifier] = NotConsentedError(
+                    f'Failed to put subject on schedule. Consent not found. '
+                    f'Using consent model \'{self.consent_model}\' '
+                    f'subject identifier={subject_identifier}.')
+        return results, onscheduled
+
+    def _get_schedule_statuses(self, subject_identifiers=None):
+        """Returns a dictionary of {subject_identifier: schedule_status}
+        of the subjects' history instances for this schedule.
+        """
+        return dict(self.history_model_cls.objects.filter(
+            subject_identifier__in=list(subject_identifiers),
+            schedule_name=self.schedule_name,
+            visit_schedule_name=self.visit_schedule_name).values_list(
+                'subject_identifier', 'schedule_status'))
+
+    def _put_on_schedule_per_subject(self, subjects=None, schedule_name=None):
+        results, onscheduled = self._bulk_validate_onschedule(
+            subjects=subjects, schedule_name=schedule_name)
+        schedule_statuses = self._get_schedule_statuses(subjects)
+        for subject_identifier, onschedule_datetime in subjects.items():
+            if not results[subject_identifier]:
+                results[subject_identifier] = self._savepoint(
+                    self._put_validated_subject_on_schedule,
+                    subject_identifier=subject_identifier,
+                    onschedule_datetime=onschedule_datetime,
+                    schedule_name=schedule_name,
+                    onscheduled=subject_identifier in onscheduled,
+                    schedule_status=schedule_statuses.get(subject_identifier))
+        return results
+
+    def _put_validated_subject_on_schedule(self, subject_identifier=None,
+                                           onschedule_datetime=None, schedule_name=None,
+                                           onscheduled=None, schedule_status=None):
+        """Puts a subject on schedule as `put_on_schedule` does but
+        from the state fetched for the batch.
+        """
+        if not onscheduled:
+            self.onschedule_model_cls.objects.create(
+                subject_identifier=subject_identifier,
+                onschedule_datetime=onschedule_datetime,
+                schedule_name=schedule_name or self.schedule_name)
+            if schedule_status is None:
+                schedule_status = self.history_model_cls.objects.filter(
+                    subject_identifier=subject_identifier,
+                    schedule_name=self.schedule_name,
+                    visit_schedule_name=self.visit_schedule_name).values_list(
+                        'schedule_status', flat=True).first()
+                if schedule_status:
+                    # put on schedule by the onschedule model's post_save
+                    return
+        if schedule_status is None:
+            self.history_model_cls.objects.create(
+                subject_identifier=subject_identifier,
+                onschedule_model=self.onschedule_model,
+                offschedule_model=self.offschedule_model,
+                schedule_name=self.schedule_name,
+                visit_schedule_name=self.visit_schedule_name,
+                onschedule_datetime=onschedule_datetime,
+                schedule_status=ON_SCHEDULE)
+            schedule_status = ON_SCHEDULE
+        if schedule_status == ON_SCHEDULE:
+            self._create_appointments(
+                subject_identifier=subject_identifier,
+                onschedule_datetime=onschedule_datetime)
+
+    def _bulk_put_on_schedule(self, subjects=None, schedule_name=None):
+        """Returns the results of `_bulk_create_onschedule`.
+
+        If appointments cannot be created for some subjects, the
+        batch is rolled back and repeated without them.
+        """
+        results = OrderedDict((subject_identifier, None) for subject_identifier in subjects)
+        subjects = OrderedDict(subjects)
+        while True:
+            sid = transaction.savepoint()
+            batch_results, failed = self._bulk_create_onschedule(
+                subjects=subjects, schedule_name=schedule_name)
+            if not failed:
+                transaction.savepoint_commit(sid)
+                results.update(batch_results)
+                return results
+            transaction.savepoint_rollback(sid)
+            for subject_identifier, error in failed.items():
+                results[subject_identifier] = error
+                del subjects[subject_identifier]
+
+    def _bulk_create_onschedule(self, subjects=None, schedule_name=None):
+        """Returns a tuple of an ordered dictionary of
+        {subject_identifier: error} and a dictionary of
+        {subject_identifier: error} of the subjects for whom
+        appointments could not be created.
+
+        Bulk creates the missing onschedule and history instances
+        and creates appointments per subject in a savepoint.
+        """
+        results, onscheduled = self._bulk_validate_onschedule(
+            subjects=subjects, schedule_name=schedule_name)
+        site = Site.objects.get_current()
+        onschedule_objs = []
+        for subject_identifier, onschedule_datetime in subjects.items():
+            if not results[subject_identifier] and subject_identifier not in onscheduled:
+                onschedule_objs.append(self.onschedule_model_cls(
+                    subject_identifier=subject_identifier,
+                    onschedule_datetime=onschedule_datetime,
+                    report_datetime=onschedule_datetime,
+                    schedule_name=schedule_name or self.schedule_name,
+                    site=site))
+                onscheduled.add(subject_identifier)
+        self._bulk_create(model_cls=self.onschedule_model_cls, objs=onschedule_objs)
+
+        history = self._get_schedule_statuses(onscheduled)
+        history_objs = []
+        for subject_identifier in [s for s in subjects if s in onscheduled]:
+            if subject_identifier not in history:
+                history_objs.append(self.history_model_cls(
+                    subject_identifier=subject_identifier,
+                    onschedule_model=self.onschedule_model,
+                    offschedule_model=self.offschedule_model,
+                    schedule_name=self.schedule_name,
+                    visit_schedule_name=self.visit_schedule_name,
+                    onschedule_datetime=subjects[subject_identifier],
+                    schedule_status=ON_SCHEDULE))
+                history.update({subject_identifier: ON_SCHEDULE})
+        self._bulk_create(model_cls=self.history_model_cls, objs=history_objs)
+
+        failed = {}
+        for subject_identifier, schedule_status in history.items():
+            if schedule_status == ON_SCHEDULE:
+                error = self._savepoint(
+                    self._create_appointments,
+                    subject_identifier=subject_identifier,
+                    onschedule_datetime=subjects[subject_identifier])
+                if error:
+                    failed[subject_identifier] = error
+        return results, failed
+
+    def _create_appointments(self, subject_identifier=None, onschedule_datetime=None,
+                             base_appt_datetime=None):
+        creator = self.appointments_creator_cls(
+            report_datetime=onschedule_datetime,
+            subject_identifier=subject_identifier,
+            schedule=self.schedule,
+            visit_schedule=self.visit_schedule,
+            appointment_model=self.appointment_model)
+        creator.create_appointments(base_appt_datetime or onschedule_datetime)
 
     def take_off_schedule(self, offschedule_model_obj=None, subject_identifier=None,
                           schedule_name=None, offschedule_datetime=None):
@@ -181,14 +432,216 @@ class SubjectSchedule:
                 subject_identifier=subject_identifier,
                 offschedule_datetime=offschedule_datetime)
 
-            self._update_in_progress_appointment(
-                subject_identifier=subject_identifier)
+            self._update_appointments(
+                subject_identifier=subject_identifier,
+                offschedule_datetime=offschedule_datetime)
 
-            # clear future appointments
-            self.appointment_model_cls.objects.delete_for_subject_after_date(
-                subject_identifier, offschedule_datetime,
-                visit_schedule_name=self.visit_schedule_name,
-                schedule_name=self.schedule_name)
+    def bulk_take_off_schedule(self, subjects=None, schedule_name=None, bulk_create=None):
+        """Takes many subjects off-schedule.
+
+        `subjects` is an iterable of (subject_identifier,
+        offschedule_datetime) pairs. If offschedule_datetime is None,
+        now is used. If an offschedule model instance already exists
+        its offschedule_datetime is used.
+
+        Offschedule model instances, history instances and the last
+        visit of each subject are fetched and validated per batch of
+        subjects. Each valid subject is then taken off schedule from
+        the fetched instances in its own savepoint. Offschedule model
+        instances are created and history instances updated with
+        `save`, so audit history and post_save signals run as for a
+        single subject.
+
+        If `bulk_create` is True, missing offschedule model instances
+        are bulk created and history instances are updated per batch
+        instead. Audit history rows are created for the offschedule
+        instances but their `save` methods and post_save signals, and
+        those of the history instances, are skipped.
+
+        Either way, the "in progress" appointments of the batch are
+        completed with one update and the appointments after each
+        subject's offschedule datetime deleted with one delete. Note
+        that, if connected, the post_save signal of each offschedule
+        model instance created with `save` also updates the subject's
+        appointments, as `take_off_schedule` does.
+
+        Returns an ordered dictionary of {subject_identifier: error}
+        where error is None if the subject was taken off schedule.
+        """
+        results = OrderedDict()
+        for batch in self._batches(subjects):
+            with transaction.atomic():
+                if bulk_create:
+                    results.update(self._bulk_take_off_schedule(
+                        subjects=batch, schedule_name=schedule_name))
+                else:
+                    results.update(self._take_off_schedule_per_subject(
+                        subjects=batch, schedule_name=schedule_name))
+        subject_schedule_history_cache.invalidate()
+        return results
+
+    def _get_offschedule_datetimes(self, subjects=None, schedule_name=None):
+        """Returns a dictionary of {subject_identifier: offschedule_datetime}
+        of the subjects' existing offschedule model instances.
+        """
+        opts = dict(subject_identifier__in=list(subjects))
+        if schedule_name:
+            opts.update(schedule_name=schedule_name)
+        return dict(self.offschedule_model_cls.objects.filter(**opts).values_list(
+            'subject_identifier', 'offschedule_datetime'))
+
+    def _take_off_schedule_per_subject(self, subjects=None, schedule_name=None):
+        offschedule_datetimes = self._get_offschedule_datetimes(
+            subjects=subjects, schedule_name=schedule_name)
+        subjects.update(offschedule_datetimes)
+        results, history_objs = self._bulk_validate_offschedule(subjects=subjects)
+        for subject_identifier, offschedule_datetime in subjects.items():
+            if not results[subject_identifier]:
+                results[subject_identifier] = self._savepoint(
+                    self._take_validated_subject_off_schedule,
+                    subject_identifier=subject_identifier,
+                    offschedule_datetime=offschedule_datetime,
+                    schedule_name=schedule_name,
+                    offscheduled=subject_identifier in offschedule_datetimes,
+                    history_obj=history_objs[subject_identifier])
+        self._bulk_update_appointments(subjects=OrderedDict(
+            (subject_identifier, offschedule_datetime)
+            for subject_identifier, offschedule_datetime in subjects.items()
+            if not results[subject_identifier]))
+        return results
+
+    def _take_validated_subject_off_schedule(self, subject_identifier=None,
+                                             offschedule_datetime=None, schedule_name=None,
+                                             offscheduled=None, history_obj=None):
+        """Takes a subject off schedule as `take_off_schedule` does,
+        except for the appointments, but from the state fetched for
+        the batch.
+        """
+        if not offscheduled:
+            opts = dict(schedule_name=schedule_name) if schedule_name else {}
+            self.offschedule_model_cls.objects.create(
+                subject_identifier=subject_identifier,
+                offschedule_datetime=offschedule_datetime, **opts)
+            # may be taken off schedule by the offschedule model's post_save
+            history_obj.refresh_from_db()
+        if (history_obj.schedule_status != OFF_SCHEDULE
+                or history_obj.offschedule_datetime != offschedule_datetime):
+            history_obj.offschedule_datetime = offschedule_datetime
+            history_obj.schedule_status = OFF_SCHEDULE
+            history_obj.save()
+
+    def _bulk_take_off_schedule(self, subjects=None, schedule_name=None):
+        offschedule_datetimes = self._get_offschedule_datetimes(
+            subjects=subjects, schedule_name=schedule_name)
+        subjects.update(offschedule_datetimes)
+        results, history_objs = self._bulk_validate_offschedule(subjects=subjects)
+        valid = OrderedDict(
+            (subject_identifier, offschedule_datetime)
+            for subject_identifier, offschedule_datetime in subjects.items()
+            if not results[subject_identifier])
+        if valid:
+            site = Site.objects.get_current()
+            offschedule_objs = []
+            for subject_identifier, offschedule_datetime in valid.items():
+                if subject_identifier not in offschedule_datetimes:
+                    opts = dict(schedule_name=schedule_name) if schedule_name else {}
+                    offschedule_objs.append(self.offschedule_model_cls(
+                        subject_identifier=subject_identifier,
+                        offschedule_datetime=offschedule_datetime,
+                        report_datetime=offschedule_datetime,
+                        site=site, **opts))
+            self._bulk_create(model_cls=self.offschedule_model_cls, objs=offschedule_objs)
+            self.history_model_cls.objects.filter(
+                pk__in=[history_objs[s].pk for s in valid]).update(
+                    offschedule_datetime=Case(
+                        *[When(pk=history_objs[s].pk, then=Value(dt))
+                          for s, dt in valid.items()],
+                        output_field=DateTimeField()),
+                    schedule_status=OFF_SCHEDULE)
+            self._bulk_update_appointments(subjects=valid)
+        return results
+
+    def _bulk_update_appointments(self, subjects=None):
+        """Completes the "in progress" appointments and deletes the
+        appointments after the offschedule datetime of each subject.
+
+        `subjects` is a dictionary of {subject_identifier:
+        offschedule_datetime}. Runs one update and one delete for all
+        subjects, so appointment `save` methods are skipped.
+        """
+        if not subjects:
+            return
+        appointments = self.appointment_model_cls.objects.filter(
+            subject_identifier__in=list(subjects),
+            schedule_name=self.schedule_name,
+            visit_schedule_name=self.visit_schedule_name)
+        appointments.filter(appt_status=IN_PROGRESS_APPT).update(appt_status=COMPLETE_APPT)
+        subject_identifiers = {}
+        for subject_identifier, offschedule_datetime in subjects.items():
+            subject_identifiers.setdefault(offschedule_datetime, []).append(subject_identifier)
+        appointments.filter(reduce(or_, [
+            Q(subject_identifier__in=identifiers, appt_datetime__gt=offschedule_datetime)
+            for offschedule_datetime, identifiers in subject_identifiers.items()])).delete()
+
+    def _bulk_validate_offschedule(self, subjects=None):
+        """Returns a tuple of an ordered dictionary of
+        {subject_identifier: error} and a dictionary of
+        {subject_identifier: history_obj}.
+
+        Validates the subjects as `_update_history_or_raise` does
+        but without raising.
+        """
+        results = OrderedDict()
+        history_objs = {
+            obj.subject_identifier: obj for obj in self.history_model_cls.objects.filter(
+                subject_identifier__in=list(subjects),
+                schedule_name=self.schedule_name,
+                visit_schedule_name=self.visit_schedule_name)}
+        related_visit_model_attr = self.appointment_model_cls.related_visit_model_attr()
+        last_visit_datetimes = dict(
+            self.appointment_model_cls.objects.filter(
+                subject_identifier__in=list(history_objs),
+                schedule_name=self.schedule_name,
+                visit_schedule_name=self.visit_schedule_name).order_by().values(
+                    'subject_identifier').annotate(
+                        last_visit_datetime=Max(
+                            f'{related_visit_model_attr}__report_datetime')).values_list(
+                                'subject_identifier', 'last_visit_datetime'))
+        for subject_identifier, offschedule_datetime in subjects.items():
+            history_obj = history_objs.get(subject_identifier)
+            last_visit_datetime = last_visit_datetimes.get(subject_identifier)
+            error = None
+            if not history_obj:
+                error = NotOnScheduleError(
+                    'Failed to take subject off schedule. '
+                    f'Subject has not been put on schedule '
+                    f'\'{self.visit_schedule_name}.{self.schedule_name}\'. '
+                    f'Got \'{subject_identifier}\'.')
+            elif history_obj.onschedule_datetime > offschedule_datetime:
+                error = InvalidOffscheduleDate(
+                    'Failed to take subject off schedule. '
+                    'Offschedule date cannot precede onschedule date. '
+                    f'Subject was put on schedule {self.visit_schedule_name}.'
+                    f'{self.schedule_name} on {history_obj.onschedule_datetime}. '
+                    f'Got {offschedule_datetime}.')
+            elif last_visit_datetime and last_visit_datetime > offschedule_datetime:
+                error = InvalidOffscheduleDate(
+                    f'Failed to take subject off schedule. '
+                    f'Visits exist after proposed offschedule date. '
+                    f'Got \'{offschedule_datetime}\'.')
+            results.update({subject_identifier: error})
+        return results, history_objs
+
+    def _update_appointments(self, subject_identifier=None, offschedule_datetime=None):
+        """Completes the "in progress" appointment and deletes
+        future appointments.
+        """
+        self._update_in_progress_appointment(
+            subject_identifier=subject_identifier)
+        self.appointment_model_cls.objects.delete_for_subject_after_date(
+            subject_identifier, offschedule_datetime,
+            visit_schedule_name=self.visit_schedule_name,
+            schedule_name=self.schedule_name)
 
     def _update_history_or_raise(self, history_obj=None, subject_identifier=None,
                                  offschedule_datetime=None):
@@ -267,7 +720,7 @@ class SubjectSchedule:
     def registered_or_raise(self, subject_identifier=None):
         """Raises an exception if RegisteredSubject instance does not exist.
         """
-        model_cls = django_apps.get_model(self.registered_subject_model)
+        model_cls = get_model_cls(self.registered_subject_model)
         try:
             model_cls.objects.get(
                 subject_identifier=subject_identifier)
@@ -279,7 +732,7 @@ class SubjectSchedule:
     def consented_or_raise(self, subject_identifier=None):
         """Raises an exception if one or more consents do not exist.
         """
-        consent_model_cls = django_apps.get_model(self.consent_model)
+        consent_model_cls = get_model_cls(self.consent_model)
         try:
             consent_model_cls.objects.get(
                 subject_identifier=subject_identifier)
@@ -291,38 +744,91 @@ class SubjectSchedule:
         except MultipleObjectsReturned:
             pass
 
+    def get_history_obj(self, subject_identifier=None):
+        """Returns the history model instance for this subject
+        and schedule or None.
+
+        Uses the SubjectScheduleHistory cache, if active.
+        """
+        def fetch():
+            try:
+                return self.history_model_cls.objects.get(
+                    subject_identifier=subject_identifier,
+                    visit_schedule_name=self.visit_schedule_name,
+                    schedule_name=self.schedule_name)
+            except ObjectDoesNotExist:
+                return None
+        return subject_schedule_history_cache.get(
+            subject_identifier=subject_identifier,
+            visit_schedule_name=self.visit_schedule_name,
+            schedule_name=self.schedule_name,
+            fetch=fetch)
+
     def onschedule_or_raise(self, subject_identifier=None, report_datetime=None,
                             compare_as_datetimes=None):
-        try:
-            history_obj = self.history_model_cls.objects.get(
-                subject_identifier=subject_identifier,
-                visit_schedule_name=self.visit_schedule_name,
-                schedule_name=self.schedule_name)
-        except ObjectDoesNotExist:
+        history_obj = self.get_history_obj(subject_identifier=subject_identifier)
+        if not history_obj:
             raise NotOnScheduleError(
                 f'Subject is not been put on schedule {self.schedule_name}. '
                 f'Got {subject_identifier}.')
-        offschedule_datetime = history_obj.offschedule_datetime or get_utcnow()
-        if compare_as_datetimes:
-            in_date_range = (history_obj.onschedule_datetime
-                             <= report_datetime
-                             <= offschedule_datetime)
-        else:
-            in_date_range = (history_obj.onschedule_datetime.date()
-                             <= report_datetime.date()
-                             <= offschedule_datetime.date())
-
-        if not in_date_range:
+        if not self._in_date_range(
+                history_obj=history_obj, report_datetime=report_datetime,
+                compare_as_datetimes=compare_as_datetimes):
             formatted_date = report_datetime.strftime(
                 convert_php_dateformat(settings.SHORT_DATE_FORMAT))
             raise NotOnScheduleForDateError(
                 f'Subject not on schedule {self.schedule_name} on '
                 f'{formatted_date}. Got {subject_identifier}.')
 
+    def bulk_is_onschedule(self, subjects=None, compare_as_datetimes=None):
+        """Returns an ordered dictionary of
+        {(subject_identifier, report_datetime): True/False}.
+
+        `subjects` is an iterable of (subject_identifier, report_datetime)
+        pairs. Same as `onschedule_or_raise` but does not raise and
+        queries the history once per batch of subjects.
+        """
+        subjects = list(subjects)
+        subject_identifiers = list(OrderedDict.fromkeys(
+            subject_identifier for subject_identifier, _ in subjects))
+        history_objs = {}
+        for index in range(0, len(subject_identifiers), self.bulk_batch_size):
+            history_objs.update({
+                obj.subject_identifier: obj for obj in self.history_model_cls.objects.filter(
+                    subject_identifier__in=subject_identifiers[
+                        index:index + self.bulk_batch_size],
+                    visit_schedule_name=self.visit_schedule_name,
+                    schedule_name=self.schedule_name)})
+        return OrderedDict(
+            ((subject_identifier, report_datetime),
+             self._in_date_range(
+                 history_obj=history_objs.get(subject_identifier),
+                 report_datetime=report_datetime,
+                 compare_as_datetimes=compare_as_datetimes))
+            for subject_identifier, report_datetime in subjects)
+
+    @staticmethod
+    def _in_date_range(history_obj=None, report_datetime=None, compare_as_datetimes=None):
+        """Returns True if report_datetime is within the history
+        instance's on/offschedule datetimes.
+        """
+        if not history_obj:
+            return False
+        offschedule_datetime = history_obj.offschedule_datetime or get_utcnow()
+        if compare_as_datetimes:
+            return (history_obj.onschedule_datetime
+                    <= report_datetime
+                    <= offschedule_datetime)
+        return (history_obj.onschedule_datetime.date()
+                <= report_datetime.date()
+                <= offschedule_datetime.date())
+
     def check(self):
-        try:
-            self.onschedule_model_cls
-            self.offschedule_model_cls
-            self.appointment_model_cls
-        except LookupError as e:
-            raise SubjectScheduleError(e)
+        errors = []
+        for attr in ['onschedule_model_cls', 'offschedule_model_cls', 'appointment_model_cls']:
+            try:
+                getattr(self, attr)
+            except LookupError as e:
+                errors.append(str(e))
+        if errors:
+            raise SubjectScheduleError(' '.join(errors))
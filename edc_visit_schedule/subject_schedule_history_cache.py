@@ -0,0 +1,69 @@
+import threading
+
+
+class SubjectScheduleHistoryCache:
+
+    """An opt-in, thread local cache of SubjectScheduleHistory model
+    instances keyed on (subject_identifier, visit_schedule_name,
+    schedule_name).
+
+    The cache is only active within a `with` block, for example,
+    per request (see SubjectScheduleHistoryCacheMiddleware) or
+    around a data import:
+
+        with subject_schedule_history_cache:
+            for obj in crfs:
+                obj.save()
+
+    Entries for a subject are invalidated when the subject's history
+    or on/offschedule model instances are saved or deleted.
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+
+    def __enter__(self):
+        self._local.depth = getattr(self._local, 'depth', 0) + 1
+        if self._local.depth == 1:
+            self._local.history_objs = {}
+        return self
+
+    def __exit__(self, *args):
+        self._local.depth -= 1
+        if not self._local.depth:
+            self._local.history_objs = {}
+
+    @property
+    def active(self):
+        return bool(getattr(self._local, 'depth', 0))
+
+    def get(self, subject_identifier=None, visit_schedule_name=None,
+            schedule_name=None, fetch=None):
+        """Returns a history model instance or None.
+
+        `fetch` is called to get the instance (or None) if the cache
+        is not active or the key is not cached.
+        """
+        if not self.active:
+            return fetch()
+        history_objs = self._local.history_objs.setdefault(subject_identifier, {})
+        key = (visit_schedule_name, schedule_name)
+        try:
+            history_obj = history_objs[key]
+        except KeyError:
+            history_obj = fetch()
+            history_objs[key] = history_obj
+        return history_obj
+
+    def invalidate(self, subject_identifier=None):
+        """Removes cached entries for a subject or, if
+        subject_identifier is None, all entries.
+        """
+        if self.active:
+            if subject_identifier is None:
+                self._local.history_objs.clear()
+            else:
+                self._local.history_objs.pop(subject_identifier, None)
+
+
+subject_schedule_history_cache = SubjectScheduleHistoryCache()
@@ -1,8 +1,42 @@
+import json
+import os
+
+from django.apps import apps as django_apps
+from django.conf import settings
 from django.core.checks import Warning
 
+from .fingerprint import get_fingerprint
 from .site_visit_schedules import site_visit_schedules
 
 
+def get_check_results():
+    """Returns the results of `site_visit_schedules.check`.
+
+    If settings.EDC_VISIT_SCHEDULE_CHECK_CACHE_DIR is set, results are
+    cached in that folder keyed on the registry fingerprint and the
+    installed models.
+    """
+    cache_dir = getattr(settings, 'EDC_VISIT_SCHEDULE_CHECK_CACHE_DIR', None)
+    if not cache_dir:
+        return site_visit_schedules.check()
+    key = get_fingerprint(site_visit_schedules.fingerprint, *sorted(
+        model._meta.label_lower for model in django_apps.get_models(
+            include_auto_created=True, include_swapped=True)))
+    path = os.path.join(cache_dir, f'visit_schedule_check_{key}.json')
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        pass
+    site_results = site_visit_schedules.check()
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(site_results, f)
+    os.replace(tmp_path, path)
+    return site_results
+
+
 def visit_schedule_check(app_configs, **kwargs):
     errors = []
 
@@ -11,7 +45,7 @@ def visit_schedule_check(app_configs, **kwargs):
             Warning(
                 'No visit schedules have been registered!',
                 id='edc_visit_schedule.001'))
-    site_results = site_visit_schedules.check()
+    site_results = get_check_results()
     for key, results in site_results.items():
         for result in results:
             errors.append(
@@ -0,0 +1,716 @@
+import copy
+import os
+import sys
+import tempfile
+import timeit
+import tracemalloc
+
+from collections import namedtuple
+from datetime import datetime
+from dateutil.relativedelta import relativedelta
+from django.apps import apps as django_apps
+from django.db import connection
+from django.db.models import DateTimeField
+from django.db.models.signals import post_save
+from django.test import TestCase, tag
+from django.utils.module_loading import import_module, module_has_submodule
+from unittest import skipIf, skipUnless
+
+from ..app_module_spec import find_app_module_spec
+from ..constants import OFF_SCHEDULE
+from ..model_cls_cache import get_model_cls
+from ..models import SubjectScheduleHistory
+from ..signals import offschedule_model_on_post_save, onschedule_model_on_post_save
+from ..site_visit_schedules import site_visit_schedules
+from ..schedule import Schedule, visit_date_projection
+from ..schedule.visit_collection import VisitCollection
+from ..visit import Crf, FormsCollection, Panel, Requisition, Visit, WindowPeriod
+from ..visit_schedule import VisitSchedule
+from .models import OnSchedule, OffSchedule, SubjectOffstudy
+from .visit_schedule import visit_schedule
+
+
+def benchmark(cls):
+    """Tags a benchmark test case and skips it unless the
+    EDC_VISIT_SCHEDULE_BENCHMARKS environment variable is set.
+    """
+    return tag('benchmark')(skipUnless(
+        os.environ.get('EDC_VISIT_SCHEDULE_BENCHMARKS'),
+        'Set EDC_VISIT_SCHEDULE_BENCHMARKS=1 to run benchmarks.')(cls))
+
+
+def report(name, number, seconds):
+    sys.stdout.write(
+        f'\n * {name}: {number} calls in {seconds:.4f}s '
+        f'({seconds / number * 1e6:.2f}us per call)\n')
+
+
+def put_on_schedule_for_any_sender(instance, raw, update_fields, **kwargs):
+    """The previous onschedule post_save receiver, connected to every model.
+    """
+    if not raw and not update_fields:
+        try:
+            instance.put_on_schedule()
+        except AttributeError:
+            pass
+
+
+def take_off_schedule_for_any_sender(instance, raw, update_fields, **kwargs):
+    """The previous offschedule post_save receiver, connected to every model.
+    """
+    if not raw and not update_fields:
+        try:
+            instance.take_off_schedule()
+        except AttributeError:
+            pass
+
+
+@benchmark
+class TestSignalsBenchmark(TestCase):
+
+    def setUp(self):
+        site_visit_schedules.loaded = False
+        site_visit_schedules._registry = {}
+        site_visit_schedules.register(visit_schedule)
+
+    def test_receivers_scoped_to_schedule_models(self):
+        receivers = post_save._live_receivers(OnSchedule)
+        self.assertIn(onschedule_model_on_post_save, receivers)
+        receivers = post_save._live_receivers(OffSchedule)
+        self.assertIn(offschedule_model_on_post_save, receivers)
+        receivers = post_save._live_receivers(SubjectOffstudy)
+        self.assertNotIn(onschedule_model_on_post_save, receivers)
+        self.assertNotIn(offschedule_model_on_post_save, receivers)
+
+    def test_post_save_unrelated_model(self):
+        number = 100000
+        instance = SubjectOffstudy()
+
+        def send():
+            post_save.send(
+                sender=SubjectOffstudy, instance=instance, created=False,
+                raw=False, update_fields=None)
+
+        receivers = [put_on_schedule_for_any_sender, take_off_schedule_for_any_sender]
+        for receiver in receivers:
+            post_save.connect(receiver, weak=False, dispatch_uid=receiver.__name__)
+        try:
+            report('post_save for an unrelated model, receivers for any sender (previous)',
+                   number, timeit.timeit(send, number=number))
+        finally:
+            for receiver in receivers:
+                post_save.disconnect(dispatch_uid=receiver.__name__)
+        report('post_save for an unrelated model, receivers per sender', number,
+               timeit.timeit(send, number=number))
+
+
+@benchmark
+@skipUnless(connection.vendor == 'sqlite', 'requires sqlite')
+class TestSubjectScheduleHistoryIndexes(TestCase):
+
+    rows = 1000000
+
+    @classmethod
+    def setUpTestData(cls):
+        """Inserts `rows` history rows with a recursive CTE,
+        5 schedules per subject, half of them off schedule.
+        """
+        expressions = {
+            'id': 'lower(hex(randomblob(16)))',
+            'subject_identifier': '\'S\' || (n / 5)',
+            'visit_schedule_name': '\'visit_schedule\'',
+            'schedule_name': '\'schedule\' || (n % 5)',
+            'onschedule_datetime': (
+                'datetime(\'2017-01-01\', \'+\' || (n % 1000) || \' days\')'),
+            'offschedule_datetime': (
+                'CASE WHEN n % 2 THEN datetime(\'2019-01-01\', \'+\' || (n % 1000) '
+                '|| \' days\') ELSE NULL END'),
+            'schedule_status': (
+                'CASE WHEN n % 2 THEN \'offschedule\' ELSE \'onschedule\' END')}
+        columns = []
+        values = []
+        for field in SubjectScheduleHistory._meta.concrete_fields:
+            columns.append(field.column)
+            if field.name in expressions:
+                values.append(expressions[field.name])
+            elif isinstance(field, DateTimeField):
+                values.append('datetime(\'now\')')
+            else:
+                values.append('NULL' if field.null else '\'\'')
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'WITH RECURSIVE seq(n) AS (SELECT 0 UNION ALL SELECT n + 1 '
+                f'FROM seq WHERE n < {cls.rows - 1}) '
+                f'INSERT INTO {SubjectScheduleHistory._meta.db_table} '
+                f'({", ".join(columns)}) SELECT {", ".join(values)} FROM seq')
+            cursor.execute('ANALYZE')
+
+    def query_plan(self, queryset):
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+            return ' '.join(str(row) for row in cursor.fetchall())
+
+    def test_onschedules_uses_subject_dates_index(self):
+        queryset = SubjectScheduleHistory.objects.onschedule_history_for_subjects(
+            subject_identifiers=['S10', 'S11', 'S12'], report_datetime=datetime(2018, 1, 1))
+        self.assertIn('ssh_subject_dates_idx', self.query_plan(queryset))
+
+    def test_status_onschedule_datetime_uses_index(self):
+        queryset = SubjectScheduleHistory.objects.filter(
+            schedule_status=OFF_SCHEDULE,
+            onschedule_datetime__gte=datetime(2017, 3, 1),
+            onschedule_datetime__lt=datetime(2017, 4, 1))
+        self.assertIn('ssh_status_onschedule_idx', self.query_plan(queryset))
+
+    def test_status_offschedule_datetime_uses_index(self):
+        queryset = SubjectScheduleHistory.objects.filter(
+            schedule_status=OFF_SCHEDULE,
+            offschedule_datetime__gte=datetime(2019, 3, 1),
+            offschedule_datetime__lt=datetime(2019, 4, 1))
+        self.assertIn('ssh_status_offschedule_idx', self.query_plan(queryset))
+
+
+@benchmark
+class TestModelClsBenchmark(TestCase):
+
+    def setUp(self):
+        site_visit_schedules.loaded = False
+        site_visit_schedules._registry = {}
+        site_visit_schedules.register(visit_schedule)
+        self.schedule = visit_schedule.schedules.get('schedule')
+        self.crf = Crf(show_order=1, model='edc_visit_schedule.crfone')
+
+    def test_model_cls(self):
+        number = 100000
+        for name, func in [
+                ('django_apps.get_model',
+                 lambda: django_apps.get_model('edc_visit_schedule.onschedule')),
+                ('get_model_cls',
+                 lambda: get_model_cls('edc_visit_schedule.onschedule')),
+                ('Schedule.onschedule_model_cls',
+                 lambda: self.schedule.onschedule_model_cls),
+                ('Schedule.history_model_cls',
+                 lambda: self.schedule.history_model_cls),
+                ('Crf.model_cls', lambda: self.crf.model_cls),
+                ('Crf.verbose_name', lambda: self.crf.verbose_name)]:
+            report(name, number, timeit.timeit(func, number=number))
+        self.assertEqual(self.schedule.onschedule_model_cls, OnSchedule)
+
+
+@benchmark
+class TestVisitCollectionBenchmark(TestCase):
+
+    def get_visits(self, count):
+        return [Visit(code=str(1000 + i), timepoint=i, rbase=relativedelta(days=i),
+                      rlower=relativedelta(days=0), rupper=relativedelta(days=6))
+                for i in range(0, count)]
+
+    def test_visit_collection(self):
+        for count in [10, 100, 5000]:
+            visits = self.get_visits(count)
+            number = max(1, 10000 // count)
+
+            def build():
+                visit_collection = VisitCollection()
+                for visit in visits:
+                    visit_collection.update({visit.code: visit})
+                return visit_collection
+
+            visit_collection = build()
+            report(f'build VisitCollection of {count} visits', number,
+                   timeit.timeit(build, number=number))
+
+            def traverse():
+                for visit in visits:
+                    visit_collection.next(visit.code)
+                    visit_collection.previous(visit.code)
+
+            report(f'next/previous over {count} visits', number,
+                   timeit.timeit(traverse, number=number))
+            self.assertEqual(list(visit_collection.values()), visits)
+            self.assertEqual(visit_collection.first, visits[0])
+            self.assertEqual(visit_collection.last, visits[-1])
+
+    def test_schedule_add_visits(self):
+        for count in [10, 100, 5000]:
+            visits = self.get_visits(count)
+            number = max(1, 10000 // count)
+
+            def get_schedule():
+                return Schedule(
+                    name='schedule',
+                    onschedule_model='edc_visit_schedule.onschedule',
+                    offschedule_model='edc_visit_schedule.offschedule',
+                    consent_model='edc_visit_schedule.subjectconsent',
+                    appointment_model='edc_appointment.appointment')
+
+            def add_visit():
+                schedule = get_schedule()
+                for visit in visits:
+                    schedule.add_visit(visit=visit)
+
+            def add_visits():
+                schedule = get_schedule()
+                schedule.add_visits(reversed(visits))
+                return schedule
+
+            report(f'Schedule.add_visit x {count} visits', number,
+                   timeit.timeit(add_visit, number=number))
+            report(f'Schedule.add_visits of {count} visits', number,
+                   timeit.timeit(add_visits, number=number))
+            self.assertEqual(list(add_visits().visits.values()), visits)
+
+    def test_visits_for_datetime(self):
+        base_datetime = datetime(2018, 1, 1)
+        for count in [10, 100, 5000]:
+            visit_collection = VisitCollection()
+            visit_collection.update({visit.code: visit for visit in self.get_visits(count)})
+            dts = [base_datetime + relativedelta(hours=i * 7) for i in range(0, 100)]
+
+            def scan():
+                for dt in dts:
+                    [visit_dates.visit for visit_dates in visit_collection._get_visit_dates(
+                        dt=base_datetime).values()
+                     if visit_dates.lower <= dt <= visit_dates.upper]
+
+            def lookup():
+                for dt in dts:
+                    visit_collection.visits_for_datetime(base_datetime, dt)
+
+            number = max(1, 1000 // count)
+            report(f'scan visit_dates of {count} visits x 100', number,
+                   timeit.timeit(scan, number=number))
+            report(f'visits_for_datetime of {count} visits x 100', number,
+                   timeit.timeit(lookup, number=number))
+            self.assertEqual(
+                visit_collection.visits_for_datetime(base_datetime, dts[-1]),
+                [visit_dates.visit for visit_dates in visit_collection.visit_dates(
+                    dt=base_datetime).values()
+                 if visit_dates.lower <= dts[-1] <= visit_dates.upper])
+
+    def test_visit_dates_cache(self):
+        visit_collection = VisitCollection()
+        visit_collection.update({visit.code: visit for visit in self.get_visits(50)})
+        base_datetimes = [datetime(2018, 1, 1) + relativedelta(days=i) for i in range(0, 10)]
+        number = 1000
+
+        def get_visit_dates():
+            for dt in base_datetimes:
+                visit_collection._get_visit_dates(dt=dt)
+
+        def get_cached_visit_dates():
+            for dt in base_datetimes:
+                visit_collection.visit_dates(dt=dt)
+
+        report('visit_dates of 50 visits x 10 base datetimes (not cached)', number,
+               timeit.timeit(get_visit_dates, number=number))
+        report('visit_dates of 50 visits x 10 base datetimes (cached)', number,
+               timeit.timeit(get_cached_visit_dates, number=number))
+        sys.stdout.write(f'\n * {visit_collection.visit_dates_cache_info()}\n')
+        self.assertEqual(visit_collection.visit_dates_cache_info().misses, 10)
+
+
+@benchmark
+class TestPeriodicVisitsBenchmark(TestCase):
+
+    def get_schedule(self):
+        return Schedule(
+            name='schedule',
+            onschedule_model='edc_visit_schedule.onschedule',
+            offschedule_model='edc_visit_schedule.offschedule',
+            consent_model='edc_visit_schedule.subjectconsent',
+            appointment_model='edc_appointment.appointment')
+
+    def test_add_periodic_visits(self):
+        for count in [52, 520, 5200]:
+            for name, add_visits in [
+                    ('add_visits', lambda schedule: schedule.add_visits(
+                        Visit(code=f'2{i:04d}', timepoint=i, rbase=relativedelta(weeks=i),
+                              rlower=relativedelta(days=0), rupper=relativedelta(days=6))
+                        for i in range(0, count))),
+                    ('add_periodic_visits', lambda schedule: schedule.add_periodic_visits(
+                        code_pattern='2{n:04d}', count=count, timepoint=0,
+                        timepoint_interval=1, start=relativedelta(weeks=0),
+                        interval=relativedelta(weeks=1), rlower=relativedelta(days=0),
+                        rupper=relativedelta(days=6)))]:
+                tracemalloc.start()
+                schedule = self.get_schedule()
+                seconds = timeit.timeit(lambda: add_visits(schedule), number=1)
+                size, _ = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+                report(f'{name} of {count} weekly visits ({size / 1024:.0f}KB)', 1, seconds)
+                self.assertEqual(schedule.visits.next('20010').code, '20011')
+
+
+@benchmark
+class TestVisitMemoryBenchmark(TestCase):
+
+    schedules = 50
+    visits_per_schedule = 30
+
+    def get_visit(self, code, timepoint):
+        """Returns a visit declaring its own, identical, forms.
+        """
+        crfs = FormsCollection(*[
+            Crf(show_order=i, model=f'edc_visit_schedule.crf{i}') for i in range(1, 21)])
+        requisitions = FormsCollection(*[
+            Requisition(show_order=i, panel=Panel(
+                name=f'panel{i}', requisition_model='edc_visit_schedule.requisition'))
+            for i in range(1, 6)])
+        return Visit(code=code, timepoint=timepoint, rbase=relativedelta(days=timepoint),
+                     rlower=relativedelta(days=0), rupper=relativedelta(days=6),
+                     crfs=crfs, requisitions=requisitions, crfs_prn=crfs)
+
+    def test_bytes_per_visit(self):
+        tracemalloc.start()
+        schedules = []
+        for i in range(0, self.schedules):
+            schedule = Schedule(
+                name=f'schedule{i}',
+                onschedule_model='edc_visit_schedule.onschedule',
+                offschedule_model='edc_visit_schedule.offschedule',
+                consent_model='edc_visit_schedule.subjectconsent',
+                appointment_model='edc_appointment.appointment')
+            schedule.add_visits(
+                self.get_visit(str(1000 + j), j) for j in range(0, self.visits_per_schedule))
+            schedules.append(schedule)
+        size, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        visits = self.schedules * self.visits_per_schedule
+        sys.stdout.write(
+            f'\n * {self.schedules} schedules, {visits} visits: {size} bytes, '
+            f'{size // visits} bytes per visit\n')
+        visit = schedules[0].visits.first
+        self.assertIs(visit.crfs[0], schedules[-1].visits.last.crfs[0])
+
+
+@benchmark
+class TestVisitFormsBenchmark(TestCase):
+
+    def test_form_lookups(self):
+        crfs = FormsCollection(*[
+            Crf(show_order=i, model=f'edc_visit_schedule.crf{i}') for i in range(1, 41)])
+        requisitions = FormsCollection(*[
+            Requisition(show_order=i, required=True, panel=Panel(
+                name=f'panel{i}', requisition_model='edc_visit_schedule.requisition'))
+            for i in range(1, 21)])
+        visit = Visit(code='1000', rbase=relativedelta(days=0),
+                      rlower=relativedelta(days=0), rupper=relativedelta(days=6),
+                      crfs=crfs, requisitions=requisitions)
+
+        def scan_requisition(model, panel_name):
+            for requisition in visit.crfs + visit.requisitions:
+                if requisition.model == model and requisition.panel.name == panel_name:
+                    return requisition
+            return None
+
+        def scan_next_form(model):
+            forms = visit.crfs + visit.requisitions
+            next_form = None
+            for index, form in enumerate(forms):
+                if form.model == model and form.required:
+                    try:
+                        next_form = forms[index + 1]
+                    except IndexError:
+                        pass
+            return next_form
+
+        number = 100000
+        model = 'edc_visit_schedule.requisition'
+        report('scan for a requisition (previous)', number, timeit.timeit(
+            lambda: scan_requisition(model, 'panel20'), number=number))
+        report('Visit.get_requisition', number, timeit.timeit(
+            lambda: visit.get_requisition(model, 'panel20'), number=number))
+        report('scan for next form (previous)', number, timeit.timeit(
+            lambda: scan_next_form('edc_visit_schedule.crf20'), number=number))
+        report('Visit.next_form', number, timeit.timeit(
+            lambda: visit.next_form('edc_visit_schedule.crf20'), number=number))
+        self.assertIs(
+            visit.get_requisition(model, 'panel20'), scan_requisition(model, 'panel20'))
+        self.assertIs(visit.next_form(model), scan_next_form(model))
+
+
+@benchmark
+class TestFormIndexBenchmark(TestCase):
+
+    def setUp(self):
+        crfs = FormsCollection(*[
+            Crf(show_order=i, model=f'edc_visit_schedule.crf{i}') for i in range(1, 41)])
+        requisitions = FormsCollection(*[
+            Requisition(show_order=i, panel=Panel(
+                name=f'panel{i}', requisition_model='edc_visit_schedule.requisition'))
+            for i in range(1, 11)])
+        site_visit_schedules._registry = {}
+        for i in range(0, 5):
+            visit_schedule_ = VisitSchedule(
+                name=f'visit_schedule{i}',
+                offstudy_model='edc_visit_schedule.subjectoffstudy',
+                death_report_model='edc_visit_schedule.deathreport')
+            schedule = Schedule(
+                name=f'schedule{i}',
+                onschedule_model=f'edc_visit_schedule.onschedule{i}',
+                offschedule_model=f'edc_visit_schedule.offschedule{i}',
+                consent_model='edc_visit_schedule.subjectconsent',
+                appointment_model='edc_appointment.appointment')
+            schedule.add_visits(
+                Visit(code=str(1000 + j), timepoint=j, rbase=relativedelta(days=j),
+                      rlower=relativedelta(days=0), rupper=relativedelta(days=6),
+                      crfs=crfs, requisitions=requisitions, crfs_prn=crfs)
+                for j in range(0, 50))
+            visit_schedule_.add_schedule(schedule)
+            site_visit_schedules.register(visit_schedule_)
+
+    def test_get_by_form_model(self):
+
+        def walk(model):
+            visits = []
+            for visit_schedule_ in site_visit_schedules.visit_schedules.values():
+                for schedule in visit_schedule_.schedules.values():
+                    for visit in schedule.visits.values():
+                        for form in visit.forms + visit.unscheduled_forms + visit.prn_forms:
+                            if form.model == model:
+                                visits.append(visit)
+            return visits
+
+        number = 1000
+        model = 'edc_visit_schedule.crf40'
+        report('walk the registry for a model (previous)', number,
+               timeit.timeit(lambda: walk(model), number=number))
+        report('SiteVisitSchedules.get_by_form_model', number, timeit.timeit(
+            lambda: site_visit_schedules.get_by_form_model(model), number=number))
+        self.assertEqual(
+            [reference.visit for reference in site_visit_schedules.get_by_form_model(model)],
+            walk(model))
+
+
+@benchmark
+class TestFrozenRegistryBenchmark(TestCase):
+
+    def setUp(self):
+        site_visit_schedules._registry = {}
+        for i in range(0, 5):
+            visit_schedule_ = VisitSchedule(
+                name=f'visit_schedule{i}',
+                offstudy_model='edc_visit_schedule.subjectoffstudy',
+                death_report_model='edc_visit_schedule.deathreport')
+            for j in range(0, 4):
+                schedule = Schedule(
+                    name=f'schedule{j}',
+                    onschedule_model=f'edc_visit_schedule.onschedule{i}{j}',
+                    offschedule_model=f'edc_visit_schedule.offschedule{i}{j}',
+                    consent_model='edc_visit_schedule.subjectconsent',
+                    appointment_model='edc_appointment.appointment')
+                schedule.add_visits(
+                    Visit(code=str(1000 + k), timepoint=k, rbase=relativedelta(days=k),
+                          rlower=relativedelta(days=0), rupper=relativedelta(days=6))
+                    for k in range(0, 50))
+                visit_schedule_.add_schedule(schedule)
+            site_visit_schedules.register(visit_schedule_)
+
+    def test_lookups(self):
+        name = 'visit_schedule4.schedule3'
+        lookups = [
+            ('get_visit_schedule', lambda: site_visit_schedules.get_visit_schedule(name)),
+            ('get_schedule', lambda: site_visit_schedules.get_schedule(name)),
+            ('get_visit', lambda: site_visit_schedules.get_visit(name, '1049'))]
+        number = 100000
+        for frozen in [False, True]:
+            if frozen:
+                site_visit_schedules.freeze()
+            for lookup_name, lookup in lookups:
+                report(f'{lookup_name} ({"frozen" if frozen else "not frozen"})',
+                       number, timeit.timeit(lookup, number=number))
+        self.assertEqual(site_visit_schedules.get_visit(name, '1049').code, '1049')
+
+
+@benchmark
+class TestRegistryArtifactBenchmark(TestCase):
+
+    def get_visit(self, code, timepoint):
+        """Returns a visit declaring its own forms, as visits in a
+        visit_schedules module usually do.
+        """
+        crfs = FormsCollection(*[
+            Crf(show_order=i, model=f'edc_visit_schedule.crf{i}') for i in range(1, 41)])
+        requisitions = FormsCollection(*[
+            Requisition(show_order=i, panel=Panel(
+                name=f'panel{i}', requisition_model='edc_visit_schedule.requisition'))
+            for i in range(1, 11)])
+        return Visit(code=code, timepoint=timepoint, rbase=relativedelta(days=timepoint),
+                     rlower=relativedelta(days=0), rupper=relativedelta(days=6),
+                     crfs=crfs, requisitions=requisitions, crfs_prn=crfs)
+
+    def build_registry(self):
+        """Builds and registers visit schedules as autodiscover would.
+        """
+        site_visit_schedules._registry = {}
+        for i in range(0, 5):
+            visit_schedule_ = VisitSchedule(
+                name=f'visit_schedule{i}',
+                offstudy_model='edc_visit_schedule.subjectoffstudy',
+                death_report_model='edc_visit_schedule.deathreport')
+            schedule = Schedule(
+                name=f'schedule{i}',
+                onschedule_model=f'edc_visit_schedule.onschedule{i}',
+                offschedule_model=f'edc_visit_schedule.offschedule{i}',
+                consent_model='edc_visit_schedule.subjectconsent',
+                appointment_model='edc_appointment.appointment')
+            schedule.add_visits(
+                self.get_visit(str(1000 + j), j) for j in range(0, 100))
+            visit_schedule_.add_schedule(schedule)
+            site_visit_schedules.register(visit_schedule_)
+
+    def test_startup(self):
+        options = dict(apps=['edc_visit_schedule.tests'], module_name='visit_schedule')
+        path = os.path.join(tempfile.mkdtemp(), 'registry.artifact')
+        self.build_registry()
+        site_visit_schedules.export_artifact(path, **options)
+
+        def load():
+            site_visit_schedules._registry = {}
+            return site_visit_schedules.load_artifact(path, **options)
+
+        number = 10
+        report(f'build 500 visits ({os.path.getsize(path) // 1024}KB artifact)', number,
+               timeit.timeit(self.build_registry, number=number))
+        report('load_artifact', number, timeit.timeit(load, number=number))
+        os.remove(path)
+        self.assertEqual(len(site_visit_schedules.get_by_form_model(
+            'edc_visit_schedule.crf1')), 1000)
+
+
+@benchmark
+class TestAutodiscoverBenchmark(TestCase):
+
+    def test_probe_apps(self):
+        apps = list(django_apps.app_configs) + [
+            app_config.name for app_config in django_apps.get_app_configs()]
+
+        def import_module_probe():
+            found = []
+            for app in apps:
+                try:
+                    mod = import_module(app)
+                    try:
+                        copy.copy(site_visit_schedules._registry)
+                        import_module(f'{app}.visit_schedules')
+                        found.append(app)
+                    except Exception as e:
+                        if f'No module named \'{app}.visit_schedules\'' not in str(e):
+                            raise
+                        module_has_submodule(mod, 'visit_schedules')
+                except ModuleNotFoundError:
+                    pass
+            return found
+
+        def find_spec_probe():
+            return [app for app in apps
+                    if find_app_module_spec(app=app, module_name='visit_schedules')]
+
+        number = 100
+        report(f'import_module probe of {len(apps)} apps (previous)', number,
+               timeit.timeit(import_module_probe, number=number))
+        report(f'find_spec probe of {len(apps)} apps', number,
+               timeit.timeit(find_spec_probe, number=number))
+        self.assertEqual(find_spec_probe(), import_module_probe())
+
+
+@benchmark
+class TestSystemChecksBenchmark(TestCase):
+
+    def test_check(self):
+        crfs = FormsCollection(*[
+            Crf(show_order=i, model=f'edc_visit_schedule.crf{i}') for i in range(0, 30)])
+        site_visit_schedules._registry = {}
+        visit_schedule_ = VisitSchedule(
+            name='visit_schedule',
+            offstudy_model='edc_visit_schedule.subjectoffstudy',
+            death_report_model='edc_visit_schedule.deathreport')
+        schedule = Schedule(
+            name='schedule',
+            onschedule_model='edc_visit_schedule.onschedule',
+            offschedule_model='edc_visit_schedule.offschedule',
+            appointment_model='edc_appointment.appointment',
+            consent_model='edc_visit_schedule.subjectconsent')
+        schedule.add_visits(
+            Visit(code=str(1000 + i), timepoint=i, rbase=relativedelta(days=i * 7),
+                  rlower=relativedelta(days=0), rupper=relativedelta(days=6),
+                  crfs=crfs, crfs_unscheduled=crfs)
+            for i in range(0, 100))
+        visit_schedule_.add_schedule(schedule)
+        site_visit_schedules.register(visit_schedule_)
+
+        def check_per_visit():
+            warnings = []
+            for visit in schedule.visits.visit_definitions():
+                for crf in visit.crfs + visit.crfs_unscheduled:
+                    try:
+                        django_apps.get_model(crf.model)
+                    except LookupError as e:
+                        warnings.append(f'{e} Got Visit {visit.code} crf.model={crf.model}.')
+            return warnings
+
+        number = 20
+        report('model lookups per visit and form, 100 visits x 60 forms (previous)', number,
+               timeit.timeit(check_per_visit, number=number))
+        report('site_visit_schedules.check, 100 visits x 60 forms', number,
+               timeit.timeit(site_visit_schedules.check, number=number))
+        self.assertEqual(
+            len(site_visit_schedules.check()['visits']), len(check_per_visit()) // 2)
+
+
+@benchmark
+class TestWindowPeriodBenchmark(TestCase):
+
+    def test_get_window(self):
+        dt = datetime(2018, 1, 1)
+
+        def get_window_per_call_namedtuple(rlower, rupper):
+            Window = namedtuple('window', ['lower', 'upper'])
+            return Window(dt - rlower, dt + rupper)
+
+        rlower, rupper = relativedelta(days=7), relativedelta(days=14)
+        number = 10000
+        report('namedtuple class per call and relativedelta (previous)', number,
+               timeit.timeit(lambda: get_window_per_call_namedtuple(rlower, rupper),
+                             number=number))
+        for name, number, window_period in [
+                ('days', 1000000, WindowPeriod(rlower=rlower, rupper=rupper)),
+                ('months', 100000, WindowPeriod(
+                    rlower=relativedelta(months=1), rupper=relativedelta(months=1)))]:
+            report(f'WindowPeriod.get_window ({name})', number,
+                   timeit.timeit(lambda: window_period.get_window(dt), number=number))
+        self.assertEqual(
+            WindowPeriod(rlower=rlower, rupper=rupper).get_window(dt),
+            get_window_per_call_namedtuple(rlower, rupper))
+
+
+@benchmark
+@skipIf(visit_date_projection.np is None, 'numpy is not installed')
+class TestVisitDateProjectionBenchmark(TestCase):
+
+    def test_project_dates(self):
+        base_datetimes = [
+            datetime(2018, 1, 1) + relativedelta(hours=i) for i in range(0, 10000)]
+        for unit in ['weeks', 'months']:
+            visit_collection = VisitCollection()
+            visit_collection.update({
+                str(1000 + i): Visit(
+                    code=str(1000 + i), timepoint=i, rbase=relativedelta(**{unit: i}),
+                    rlower=relativedelta(days=3), rupper=relativedelta(days=7))
+                for i in range(0, 24)})
+
+            def loop():
+                return [visit_collection.visit_dates(dt=dt) for dt in base_datetimes]
+
+            def project():
+                return visit_collection.project_dates(base_datetimes)
+
+            report(f'visit_dates per subject, 10000 subjects x 24 visits ({unit})', 1,
+                   timeit.timeit(loop, number=1))
+            report(f'project_dates, 10000 subjects x 24 visits ({unit})', 1,
+                   timeit.timeit(project, number=1))
+            self.assertEqual(
+                project().upper[-1].tolist(),
+                [visit_dates.upper for visit_dates in loop()[-1].values()])
@@ -1,6 +1,13 @@
 from django.test import TestCase, tag
 
-from ..visit import Crf, FormsCollection, FormsCollectionError
+from ..visit import Crf, FormsCollection, FormsCollectionError, Panel, Requisition
+
+
+class CrfWithInstructions(Crf):
+
+    def __init__(self, instructions=None, **kwargs):
+        super().__init__(**kwargs)
+        self.instructions = instructions
 
 
 class TestFormsCollection(TestCase):
@@ -29,3 +36,35 @@ class TestFormsCollection(TestCase):
             self.fail(f'FormsCollectionError unexpectedly raised. Got {e}')
         crfs.append(0)
         self.assertRaises(FormsCollectionError, FormsCollection, *crfs)
+
+    def test_forms_collection_shares_identical_forms(self):
+        crfs1 = FormsCollection(
+            Crf(show_order=1, model='x.one'), Crf(show_order=2, model='x.two'))
+        crfs2 = FormsCollection(
+            Crf(show_order=1, model='x.one'),
+            Crf(show_order=2, model='x.two', required=False))
+        self.assertIs(crfs1.forms[0], crfs2.forms[0])
+        self.assertIsNot(crfs1.forms[1], crfs2.forms[1])
+
+    def test_forms_collection_shares_identical_requisitions(self):
+        panel = Panel(name='one', requisition_model='x.requisition')
+        requisitions1 = FormsCollection(Requisition(show_order=1, panel=panel))
+        requisitions2 = FormsCollection(
+            Requisition(show_order=1, panel=Panel(
+                name='one', requisition_model='x.requisition')))
+        requisitions3 = FormsCollection(
+            Requisition(show_order=1, panel=Panel(
+                name='two', requisition_model='x.requisition')))
+        self.assertIs(requisitions1.forms[0], requisitions2.forms[0])
+        self.assertIsNot(requisitions1.forms[0], requisitions3.forms[0])
+
+    def test_forms_collection_does_not_share_subclasses(self):
+        crfs1 = FormsCollection(
+            CrfWithInstructions(show_order=1, model='x.one', instructions='one'))
+        crfs2 = FormsCollection(
+            CrfWithInstructions(show_order=1, model='x.one', instructions='two'))
+        crfs3 = FormsCollection(Crf(show_order=1, model='x.one'))
+        self.assertIsNot(crfs1.forms[0], crfs2.forms[0])
+        self.assertEqual(crfs2.forms[0].instructions, 'two')
+        self.assertIsNot(crfs3.forms[0], crfs1.forms[0])
+        self.assertIs(type(crfs3.forms[0]), Crf)
@@ -151,6 +151,45 @@ class TestModels(SiteTestCaseMixin, TestCase):
             report_datetime=datetime(2018, 1, 1, 0, 0, 0, 0, pytz.utc))
         self.assertEqual(0, len(onschedules))
 
+    def test_onschedules_for_subjects_manager(self):
+        onschedules = {}
+        for subject_identifier in ['1234', '5678', '9012']:
+            onschedules[subject_identifier] = OnSchedule.objects.create(
+                subject_identifier=subject_identifier,
+                onschedule_datetime=datetime(2017, 12, 1, 0, 0, 0, 0, pytz.utc))
+        with self.assertNumQueries(2):
+            results = SubjectScheduleHistory.objects.onschedules_for_subjects(
+                subject_identifiers=['1234', '5678', '9012', 'ABCD'])
+        self.assertEqual(list(results), ['1234', '5678', '9012', 'ABCD'])
+        for subject_identifier, onschedule in onschedules.items():
+            self.assertEqual(results[subject_identifier], [onschedule])
+        self.assertEqual(results['ABCD'], [])
+
+    def test_onschedules_for_subjects_manager_without_onschedule(self):
+        """Asserts raises, as `onschedules` did, if the onschedule
+        model instance of a history instance does not exist.
+        """
+        OnSchedule.objects.create(
+            subject_identifier='1234',
+            onschedule_datetime=datetime(2017, 12, 1, 0, 0, 0, 0, pytz.utc))
+        SubjectScheduleHistory.objects.create(
+            subject_identifier='5678',
+            onschedule_model='edc_visit_schedule.onschedule',
+            offschedule_model='edc_visit_schedule.offschedule',
+            visit_schedule_name='visit_schedule',
+            schedule_name='schedule',
+            onschedule_datetime=datetime(2017, 12, 1, 0, 0, 0, 0, pytz.utc),
+            schedule_status=ON_SCHEDULE)
+        self.assertRaises(
+            OnSchedule.DoesNotExist,
+            SubjectScheduleHistory.objects.onschedules_for_subjects,
+            subject_identifiers=['1234', '5678'])
+        self.assertRaises(
+            OnSchedule.DoesNotExist,
+            SubjectScheduleHistory.objects.onschedules, subject_identifier='5678')
+        self.assertEqual(
+            len(SubjectScheduleHistory.objects.onschedules(subject_identifier='1234')), 1)
+
     def test_natural_key(self):
         obj = OnSchedule.objects.create(subject_identifier='1234')
         self.assertEqual(obj.natural_key(), ('1234', ))
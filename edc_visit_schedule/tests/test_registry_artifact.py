@@ -0,0 +1,192 @@
+import os
+import sys
+import tempfile
+
+from dateutil.relativedelta import relativedelta
+from datetime import datetime
+from django.test import TestCase
+from importlib import invalidate_caches
+
+from ..registry_artifact import RegistryArtifactError, dump_registry
+from ..registry_artifact import get_dependencies, get_source_files, get_source_hashes
+from ..schedule import Schedule
+from ..site_visit_schedules import site_visit_schedules
+from ..visit import Crf, FormsCollection, Panel, Requisition, Visit
+from ..visit_schedule import VisitSchedule
+
+
+class TestRegistryArtifact(TestCase):
+
+    def setUp(self):
+        crfs = FormsCollection(
+            Crf(show_order=1, model='edc_visit_schedule.crfone'),
+            Crf(show_order=2, model='edc_visit_schedule.crftwo'))
+        requisitions = FormsCollection(
+            Requisition(show_order=10, panel=Panel(
+                name='one', requisition_model='edc_visit_schedule.subjectrequisition')))
+        self.visit_schedule = VisitSchedule(
+            name='visit_schedule',
+            verbose_name='Visit Schedule',
+            offstudy_model='edc_visit_schedule.subjectoffstudy',
+            death_report_model='edc_visit_schedule.deathreport')
+        self.schedule = Schedule(
+            name='schedule',
+            onschedule_model='edc_visit_schedule.onschedule',
+            offschedule_model='edc_visit_schedule.offschedule',
+            appointment_model='edc_appointment.appointment',
+            consent_model='edc_visit_schedule.subjectconsent')
+        self.schedule.add_visits(
+            Visit(code=str(1000 + i), timepoint=i, rbase=relativedelta(days=i * 7),
+                  rlower=relativedelta(days=0), rupper=relativedelta(days=6),
+                  crfs=crfs, requisitions=requisitions)
+            for i in range(0, 3))
+        self.schedule.add_periodic_visits(
+            code_pattern='3{n:03d}', count=10, timepoint=10, timepoint_interval=1,
+            start=relativedelta(days=70), interval=relativedelta(weeks=1),
+            rlower=relativedelta(days=0), rupper=relativedelta(days=6), crfs=crfs)
+        self.visit_schedule.add_schedule(self.schedule)
+        site_visit_schedules._registry = {}
+        site_visit_schedules.register(self.visit_schedule)
+        self.path = os.path.join(tempfile.mkdtemp(), 'registry.artifact')
+        self.options = dict(apps=['edc_visit_schedule.tests'], module_name='visit_schedule')
+
+    def tearDown(self):
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+    def test_source_files(self):
+        source_files = get_source_files(**self.options)
+        self.assertEqual(list(source_files), ['edc_visit_schedule.tests.visit_schedule'])
+        self.assertEqual(get_source_files(apps=['blah'], module_name='visit_schedule'), {})
+        filename = source_files['edc_visit_schedule.tests.visit_schedule'][0]
+        filenames = get_dependencies(
+            filenames=[filename], packages=['edc_visit_schedule.tests'])
+        package = os.path.dirname(os.path.dirname(os.path.abspath(filename)))
+        self.assertIn(os.path.join(package, 'tests', 'visit_schedule.py'), filenames)
+        self.assertIn(os.path.join(package, 'visit', 'crf.py'), filenames)
+        self.assertIn(os.path.join(package, 'schedule', 'schedule.py'), filenames)
+        self.assertNotIn(os.path.join(package, 'tests', 'test_schedule.py'), filenames)
+        self.assertEqual(list(get_source_hashes(filenames=filenames)), filenames)
+
+    def test_export_and_load(self):
+        self.schedule.visits.first.dates.base = datetime(2018, 1, 1)
+        site_visit_schedules.export_artifact(self.path, **self.options)
+        site_visit_schedules._registry = {}
+        self.assertTrue(site_visit_schedules.load_artifact(self.path, **self.options))
+        visit_schedule = site_visit_schedules.get_visit_schedule('visit_schedule')
+        self.assertIsNot(visit_schedule, self.visit_schedule)
+        _, schedule = site_visit_schedules.get_by_onschedule_model(
+            'edc_visit_schedule.onschedule')
+        self.assertEqual(list(schedule.visits), list(self.schedule.visits))
+        self.assertIsNone(schedule.visits.first.dates.base)
+        visit = schedule.visits.get('1001')
+        self.assertEqual(visit.get_requisition(
+            'edc_visit_schedule.subjectrequisition', panel_name='one').show_order, 10)
+        self.assertIs(visit.crfs[0], schedule.visits.get('1002').crfs[0])
+        self.assertEqual(schedule.visits.next('1002').code, '3001')
+        self.assertEqual(
+            [ref.visit.code for ref in site_visit_schedules.get_by_panel_name('one')],
+            ['1000', '1001', '1002'])
+
+    def test_missing_or_stale(self):
+        site_visit_schedules._registry = {}
+        self.assertFalse(site_visit_schedules.load_artifact(self.path, **self.options))
+        source_files = get_source_files(**self.options)
+        filename = source_files['edc_visit_schedule.tests.visit_schedule'][0]
+        for source_hashes in [{filename: 'blah'}, {f'{filename}.blah': 'blah'}]:
+            with self.subTest(source_hashes=source_hashes):
+                dump_registry(
+                    path=self.path, registry={'visit_schedule': self.visit_schedule},
+                    source_files=source_files, source_hashes=source_hashes)
+                self.assertFalse(
+                    site_visit_schedules.load_artifact(self.path, **self.options))
+        self.assertEqual(site_visit_schedules.registry, {})
+
+    def test_corrupt(self):
+        site_visit_schedules.export_artifact(self.path, **self.options)
+        with open(self.path, 'ab') as f:
+            f.write(b'blah')
+        site_visit_schedules._registry = {}
+        self.assertRaises(
+            RegistryArtifactError,
+            site_visit_schedules.load_artifact, self.path, **self.options)
+
+
+class TestRegistryArtifactDependencies(TestCase):
+
+    visit_schedules_source = (
+        'from dateutil.relativedelta import relativedelta\n'
+        'from edc_visit_schedule.schedule import Schedule\n'
+        'from edc_visit_schedule.site_visit_schedules import site_visit_schedules\n'
+        'from edc_visit_schedule.visit import Visit\n'
+        'from edc_visit_schedule.visit_schedule import VisitSchedule\n'
+        'from .lists import crfs\n'
+        'visit_schedule = VisitSchedule(\n'
+        '    name=\'artifact_visit_schedule\',\n'
+        '    offstudy_model=\'edc_visit_schedule.subjectoffstudy\',\n'
+        '    death_report_model=\'edc_visit_schedule.deathreport\')\n'
+        'schedule = Schedule(\n'
+        '    name=\'schedule\',\n'
+        '    onschedule_model=\'edc_visit_schedule.onschedule\',\n'
+        '    offschedule_model=\'edc_visit_schedule.offschedule\',\n'
+        '    appointment_model=\'edc_appointment.appointment\',\n'
+        '    consent_model=\'edc_visit_schedule.subjectconsent\')\n'
+        'schedule.add_visit(Visit(\n'
+        '    code=\'1000\', timepoint=0, rbase=relativedelta(days=0),\n'
+        '    rlower=relativedelta(days=0), rupper=relativedelta(days=6), crfs=crfs))\n'
+        'visit_schedule.add_schedule(schedule)\n'
+        'site_visit_schedules.register(visit_schedule)\n')
+
+    lists_source = (
+        'from edc_visit_schedule.visit import Crf, FormsCollection\n'
+        'crfs = FormsCollection(Crf(show_order=1, model=\'edc_visit_schedule.crfone\'))\n')
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.app_path = os.path.join(self.tmp, 'artifact_app')
+        os.mkdir(self.app_path)
+        open(os.path.join(self.app_path, '__init__.py'), 'w').close()
+        with open(os.path.join(self.app_path, 'visit_schedules.py'), 'w') as f:
+            f.write(self.visit_schedules_source)
+        with open(os.path.join(self.app_path, 'lists.py'), 'w') as f:
+            f.write(self.lists_source)
+        sys.path.insert(0, self.tmp)
+        invalidate_caches()
+        site_visit_schedules._registry = {}
+        site_visit_schedules.autodiscover(apps=['artifact_app'], verbose=False)
+        self.path = os.path.join(self.tmp, 'registry.artifact')
+        site_visit_schedules.export_artifact(self.path, apps=['artifact_app'])
+        site_visit_schedules._registry = {}
+
+    def tearDown(self):
+        sys.path.remove(self.tmp)
+        for name in ['artifact_app', 'artifact_app.visit_schedules', 'artifact_app.lists']:
+            sys.modules.pop(name, None)
+
+    def test_load(self):
+        self.assertTrue(site_visit_schedules.load_artifact(self.path, apps=['artifact_app']))
+        self.assertEqual(list(site_visit_schedules.registry), ['artifact_visit_schedule'])
+
+    def test_imported_module_changed(self):
+        with open(os.path.join(self.app_path, 'lists.py'), 'a') as f:
+            f.write('crfs.pop(0)\n')
+        self.assertFalse(site_visit_schedules.load_artifact(self.path, apps=['artifact_app']))
+
+    def test_imported_module_removed(self):
+        os.remove(os.path.join(self.app_path, 'lists.py'))
+        self.assertFalse(site_visit_schedules.load_artifact(self.path, apps=['artifact_app']))
+
+    def test_unrelated_module_changed(self):
+        with open(os.path.join(self.app_path, 'models.py'), 'w') as f:
+            f.write('blah = 1\n')
+        self.assertTrue(site_visit_schedules.load_artifact(self.path, apps=['artifact_app']))
+
+    def test_import_after_load_and_freeze(self):
+        self.assertTrue(site_visit_schedules.load_artifact(self.path, apps=['artifact_app']))
+        site_visit_schedules.freeze()
+        for name in ['artifact_app.visit_schedules', 'artifact_app.lists']:
+            sys.modules.pop(name, None)
+        __import__('artifact_app.visit_schedules')
+        self.assertEqual(list(site_visit_schedules.registry), ['artifact_visit_schedule'])
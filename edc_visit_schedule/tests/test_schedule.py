@@ -1,12 +1,18 @@
-from datetime import timedelta
+import pytz
+import threading
+
+from datetime import datetime, timedelta, timezone
 from dateutil.relativedelta import relativedelta
 from django.test import TestCase, tag
+from unittest import skipIf
 from edc_base.utils import get_utcnow
 
 from ..schedule import Schedule, AlreadyRegisteredVisit
 from ..schedule import ScheduleNameError
+from ..schedule import visit_date_projection
+from ..schedule.window_index import WindowIndex
 from ..simple_model_validator import InvalidModel
-from ..visit import Visit
+from ..visit import PeriodicVisits, Visit
 from .models import OnSchedule, OffSchedule
 
 
@@ -175,6 +181,76 @@ class TestSchedule(TestCase):
         self.assertRaises(AlreadyRegisteredVisit,
                           schedule.add_visit, visit=visit)
 
+    def test_add_visits_bulk(self):
+        schedule = Schedule(
+            name='schedule',
+            onschedule_model='edc_visit_schedule.onschedule',
+            offschedule_model='edc_visit_schedule.offschedule',
+            consent_model='edc_visit_schedule.subjectconsent',
+            appointment_model='edc_appointment.appointment')
+        schedule.add_visit(
+            code='3', timepoint=3, rbase=relativedelta(days=3),
+            rlower=relativedelta(days=0), rupper=relativedelta(days=6))
+        visits = [Visit(code=str(i), timepoint=i, rbase=relativedelta(days=i),
+                        rlower=relativedelta(days=0), rupper=relativedelta(days=6))
+                  for i in [5, 1, 0, 2, 4]]
+        self.assertEqual(schedule.add_visits(visits), visits)
+        self.assertEqual([v.timepoint for v in schedule.visits.values()],
+                         [0, 1, 2, 3, 4, 5])
+        self.assertEqual(schedule.visits.next('3').code, '4')
+        self.assertEqual(schedule.visits.previous('3').code, '2')
+
+    def test_add_visits_bulk_duplicate_in_batch(self):
+        schedule = Schedule(
+            name='schedule',
+            onschedule_model='edc_visit_schedule.onschedule',
+            offschedule_model='edc_visit_schedule.offschedule',
+            consent_model='edc_visit_schedule.subjectconsent',
+            appointment_model='edc_appointment.appointment')
+        visits = [
+            Visit(code='0', timepoint=0, rbase=relativedelta(days=0),
+                  rlower=relativedelta(days=0), rupper=relativedelta(days=6)),
+            Visit(code='1', timepoint=1, rbase=relativedelta(days=0),
+                  rlower=relativedelta(days=0), rupper=relativedelta(days=6))]
+        self.assertRaises(AlreadyRegisteredVisit, schedule.add_visits, visits)
+        self.assertEqual(len(schedule.visits), 0)
+
+    def test_add_visits_bulk_duplicate_existing(self):
+        schedule = Schedule(
+            name='schedule',
+            onschedule_model='edc_visit_schedule.onschedule',
+            offschedule_model='edc_visit_schedule.offschedule',
+            consent_model='edc_visit_schedule.subjectconsent',
+            appointment_model='edc_appointment.appointment')
+        schedule.add_visit(
+            code='0', title='erik', timepoint=0, rbase=relativedelta(days=0),
+            rlower=relativedelta(days=0), rupper=relativedelta(days=6))
+        visits = [
+            Visit(code='1', timepoint=1, rbase=relativedelta(days=1),
+                  rlower=relativedelta(days=0), rupper=relativedelta(days=6)),
+            Visit(code='2', title='erik', timepoint=2, rbase=relativedelta(days=2),
+                  rlower=relativedelta(days=0), rupper=relativedelta(days=6))]
+        self.assertRaises(AlreadyRegisteredVisit, schedule.add_visits, visits)
+        self.assertEqual(list(schedule.visits), ['0'])
+
+    def test_add_visit_after_pop(self):
+        schedule = Schedule(
+            name='schedule',
+            onschedule_model='edc_visit_schedule.onschedule',
+            offschedule_model='edc_visit_schedule.offschedule',
+            consent_model='edc_visit_schedule.subjectconsent',
+            appointment_model='edc_appointment.appointment')
+        schedule.add_visit(
+            code='0', timepoint=0, rbase=relativedelta(days=0),
+            rlower=relativedelta(days=0), rupper=relativedelta(days=6))
+        schedule.visits.pop('0')
+        try:
+            schedule.add_visit(
+                code='0', timepoint=0, rbase=relativedelta(days=0),
+                rlower=relativedelta(days=0), rupper=relativedelta(days=6))
+        except AlreadyRegisteredVisit as e:
+            self.fail(f'Exception unexpectedly raised. Got {e}')
+
 
 class TestScheduleWithVisits(TestCase):
 
@@ -194,6 +270,36 @@ class TestScheduleWithVisits(TestCase):
         self.assertEqual([v.timepoint for v in self.schedule.visits.values()],
                          [0, 1, 2, 3, 4, 5])
 
+    def test_fingerprint(self):
+        fingerprints = [self.schedule.fingerprint]
+        for i in range(0, 3):
+            visit = Visit(code=str(i), timepoint=i, rbase=relativedelta(days=i),
+                          rlower=relativedelta(days=0), rupper=relativedelta(days=6))
+            self.schedule.add_visit(visit=visit)
+            fingerprints.append(self.schedule.fingerprint)
+        self.schedule.visits.pop('2')
+        self.assertEqual(self.schedule.fingerprint, fingerprints[2])
+        self.assertEqual(len(set(fingerprints)), 4)
+        schedule = Schedule(
+            name='schedule',
+            onschedule_model='edc_visit_schedule.onschedule',
+            offschedule_model='edc_visit_schedule.offschedule',
+            consent_model='edc_visit_schedule.subjectconsent2',
+            appointment_model='edc_appointment.appointment')
+        schedule.add_visits(self.schedule.visits.values())
+        self.assertNotEqual(schedule.fingerprint, self.schedule.fingerprint)
+
+    def test_order_next_previous_after_pop(self):
+        for i in [3, 5, 1, 0, 2, 4]:
+            visit = Visit(code=str(i), timepoint=i, rbase=relativedelta(days=i),
+                          rlower=relativedelta(days=0), rupper=relativedelta(days=6))
+            self.schedule.add_visit(visit=visit)
+        self.schedule.visits.pop('2')
+        self.assertEqual(list(self.schedule.visits), ['0', '1', '3', '4', '5'])
+        self.assertEqual(self.schedule.visits.next('1').code, '3')
+        self.assertEqual(self.schedule.visits.previous('3').code, '1')
+        self.assertIsNone(self.schedule.visits.next('2'))
+
     def test_first_visit(self):
         for i in range(1, 5):
             visit = Visit(code=str(i), timepoint=i, rbase=relativedelta(days=i),
@@ -268,3 +374,361 @@ class TestScheduleWithVisits(TestCase):
         for k, v in self.schedule.visits.timepoint_dates(dt=dt).items():
             self.assertEqual(v - dt, timedelta(index * (index + 1)), msg=k)
             index += 1
+
+    def test_visit_dates_does_not_change_visits(self):
+        dt = get_utcnow()
+        for i in range(0, 5):
+            visit = Visit(code=str(i), timepoint=i, rbase=relativedelta(days=i),
+                          rlower=relativedelta(days=1), rupper=relativedelta(days=6))
+            self.schedule.add_visit(visit=visit)
+        for index, (visit, visit_dates) in enumerate(
+                self.schedule.visits.visit_dates(dt=dt).items()):
+            self.assertEqual(visit_dates.visit, visit)
+            self.assertEqual(visit_dates.base, dt + relativedelta(days=index))
+            self.assertEqual(visit_dates.lower, visit_dates.base - relativedelta(days=1))
+            self.assertEqual(visit_dates.upper, visit_dates.base + relativedelta(days=6))
+            self.assertIsNone(visit.timepoint_datetime)
+            self.assertIsNone(visit.dates.lower)
+
+    def test_timepoint_dates_per_thread(self):
+        dt = get_utcnow()
+        visit = Visit(code='1', timepoint=1, rbase=relativedelta(days=1),
+                      rlower=relativedelta(days=0), rupper=relativedelta(days=6))
+        self.schedule.add_visit(visit=visit)
+        with self.assertWarns(DeprecationWarning):
+            self.schedule.visits.timepoint_dates(dt=dt)
+
+        def other_thread():
+            self.schedule.visits.timepoint_dates(dt=dt + relativedelta(years=1))
+        thread = threading.Thread(target=other_thread)
+        thread.start()
+        thread.join()
+        self.assertEqual(visit.timepoint_datetime, dt + relativedelta(days=1))
+        self.assertEqual(visit.dates.upper, dt + relativedelta(days=7))
+
+
+class TestScheduleWithPeriodicVisits(TestCase):
+
+    def setUp(self):
+        self.schedule = Schedule(
+            name='schedule',
+            onschedule_model='edc_visit_schedule.onschedule',
+            offschedule_model='edc_visit_schedule.offschedule',
+            consent_model='edc_visit_schedule.subjectconsent',
+            appointment_model='edc_appointment.appointment')
+        for i in [0, 1]:
+            self.schedule.add_visit(
+                code=f'100{i}', timepoint=i, rbase=relativedelta(weeks=i),
+                rlower=relativedelta(days=0), rupper=relativedelta(days=6))
+        self.periodic_visits = self.schedule.add_periodic_visits(
+            code_pattern='2{n:03d}', title_pattern='Week {n}', count=5,
+            timepoint=2, timepoint_interval=1, start=relativedelta(weeks=2),
+            interval=relativedelta(weeks=1), rlower=relativedelta(days=0),
+            rupper=relativedelta(days=6))
+        self.schedule.add_visit(
+            code='9000', timepoint=100, rbase=relativedelta(years=1),
+            rlower=relativedelta(days=0), rupper=relativedelta(days=6))
+
+    def test_order(self):
+        codes = ['1000', '1001', '2001', '2002', '2003', '2004', '2005', '9000']
+        self.assertEqual(list(self.schedule.visits), codes)
+        self.assertEqual(list(reversed(self.schedule.visits)), list(reversed(codes)))
+        self.assertEqual(len(self.schedule.visits), 8)
+        self.assertEqual(
+            [v.code for v in self.schedule.visits.values()], codes)
+
+    def test_get(self):
+        self.assertEqual(self.schedule.visits.get('2003').title, 'Week 3')
+        self.assertIn('2005', self.schedule.visits)
+        self.assertIsNone(self.schedule.visits.get('2006'))
+
+    def test_visits_created_when_accessed(self):
+        self.assertEqual(self.periodic_visits._visits, {})
+        self.schedule.visits.next('1001')
+        self.assertEqual(list(self.periodic_visits._visits), [0])
+
+    def test_fingerprint(self):
+        fingerprint = self.schedule.fingerprint
+        self.assertEqual(list(self.periodic_visits._visits), [0])
+        periodic_visits = PeriodicVisits(
+            code_pattern='2{n:03d}', title_pattern='Week {n}', count=6,
+            timepoint=2, timepoint_interval=1, start=relativedelta(weeks=2),
+            interval=relativedelta(weeks=1), rlower=relativedelta(days=0),
+            rupper=relativedelta(days=6))
+        self.assertNotEqual(periodic_visits.fingerprint, self.periodic_visits.fingerprint)
+        self.schedule.visits.periodic_visits.remove(self.periodic_visits)
+        self.schedule.visits.add_periodic_visits(periodic_visits)
+        self.assertNotEqual(self.schedule.fingerprint, fingerprint)
+
+    def test_next_previous(self):
+        self.assertEqual(self.schedule.visits.next('1001').code, '2001')
+        self.assertEqual(self.schedule.visits.next('2001').code, '2002')
+        self.assertEqual(self.schedule.visits.next('2005').code, '9000')
+        self.assertIsNone(self.schedule.visits.next('9000'))
+        self.assertEqual(self.schedule.visits.previous('9000').code, '2005')
+        self.assertEqual(self.schedule.visits.previous('2001').code, '1001')
+        self.assertIsNone(self.schedule.visits.previous('1000'))
+        self.assertEqual(self.schedule.visits.first.code, '1000')
+        self.assertEqual(self.schedule.visits.last.code, '9000')
+
+    def test_duplicates(self):
+        for options in [dict(code='2002', timepoint=50),
+                        dict(code='3000', title='Week 2', timepoint=50),
+                        dict(code='3000', timepoint=4)]:
+            with self.subTest(**options):
+                self.assertRaises(
+                    AlreadyRegisteredVisit, self.schedule.add_visit,
+                    rbase=relativedelta(years=2), rlower=relativedelta(days=0),
+                    rupper=relativedelta(days=6), **options)
+        self.assertRaises(
+            AlreadyRegisteredVisit, self.schedule.add_periodic_visits,
+            code_pattern='3{n:03d}', count=5, timepoint=5, timepoint_interval=1,
+            start=relativedelta(weeks=5), interval=relativedelta(weeks=1))
+
+    def test_duplicate_rbase(self):
+        for rbase in [relativedelta(weeks=3), relativedelta(days=42)]:
+            with self.subTest(rbase=rbase):
+                self.assertRaises(
+                    AlreadyRegisteredVisit, self.schedule.add_visit,
+                    code='3000', timepoint=50, rbase=rbase,
+                    rlower=relativedelta(days=0), rupper=relativedelta(days=6))
+        self.assertRaises(
+            AlreadyRegisteredVisit, self.schedule.add_periodic_visits,
+            code_pattern='3{n:03d}', count=5, timepoint=200, timepoint_interval=1,
+            start=relativedelta(months=6), interval=relativedelta(months=6),
+            rlower=relativedelta(days=0), rupper=relativedelta(days=6))
+        self.assertEqual(
+            [self.periodic_visits.get_rbase_index(rbase) for rbase in [
+                relativedelta(weeks=2), relativedelta(weeks=6), relativedelta(weeks=7),
+                relativedelta(weeks=2, days=3), relativedelta(weeks=1)]],
+            [0, 4, None, None, None])
+        for i, rbase in enumerate([relativedelta(weeks=2, days=3), relativedelta(weeks=7)]):
+            self.schedule.add_visit(
+                code=f'300{i}', timepoint=50 + i, rbase=rbase,
+                rlower=relativedelta(days=0), rupper=relativedelta(days=6))
+
+    def test_timepoint_dates(self):
+        dt = get_utcnow()
+        timepoint_dates = self.schedule.visits.timepoint_dates(dt=dt)
+        self.assertEqual(len(timepoint_dates), 8)
+        self.assertEqual(
+            timepoint_dates[self.schedule.visits.get('2003')], dt + relativedelta(weeks=4))
+
+
+class TestVisitWindows(TestCase):
+
+    def setUp(self):
+        self.schedule = Schedule(
+            name='schedule',
+            onschedule_model='edc_visit_schedule.onschedule',
+            offschedule_model='edc_visit_schedule.offschedule',
+            consent_model='edc_visit_schedule.subjectconsent',
+            appointment_model='edc_appointment.appointment')
+
+    def add_visits(self, unit):
+        # windows of visits 1 and 2 overlap, visit 3 leaves a gap
+        for i, (rlower, rupper) in enumerate([(0, 6), (3, 10), (5, 5), (2, 2)]):
+            self.schedule.add_visit(
+                code=str(1000 + i), timepoint=i, rbase=relativedelta(**{unit: 14 * i}),
+                rlower=relativedelta(days=rlower), rupper=relativedelta(days=rupper))
+
+    def scan(self, base_datetime, dt):
+        return [visit_dates.visit for visit_dates in self.schedule.visits.visit_dates(
+            dt=base_datetime).values() if visit_dates.lower <= dt <= visit_dates.upper]
+
+    def test_window_index(self):
+        window_index = WindowIndex([('a', 0, 10), ('b', 5, 15), ('c', 20, 20)])
+        self.assertEqual(window_index.get(-1), ())
+        self.assertEqual(window_index.get(0), ('a', ))
+        self.assertEqual(window_index.get(5), ('a', 'b'))
+        self.assertEqual(window_index.get(12), ('b', ))
+        self.assertEqual(window_index.get(16), ())
+        self.assertEqual(window_index.get(20), ('c', ))
+        self.assertEqual(window_index.get(21), ())
+
+    def test_visits_for_datetime_matches_scan(self):
+        base_datetime = get_utcnow()
+        for unit in ['days', 'months']:
+            with self.subTest(unit=unit):
+                self.schedule.visits.clear()
+                self.add_visits(unit)
+                if unit == 'days':
+                    self.assertIsNotNone(self.schedule.visits.window_index)
+                else:
+                    self.assertIsNone(self.schedule.visits.window_index)
+                for hours in range(-48, 24 * 140, 7):
+                    dt = base_datetime + timedelta(hours=hours)
+                    self.assertEqual(
+                        self.schedule.visits.visits_for_datetime(base_datetime, dt),
+                        self.scan(base_datetime, dt))
+
+    def test_visits_for_datetime_does_not_change_visits(self):
+        self.add_visits('days')
+        base_datetime = get_utcnow()
+        self.schedule.visits.visits_for_datetime(base_datetime, base_datetime)
+        for visit in self.schedule.visits.values():
+            self.assertIsNone(visit.timepoint_datetime)
+
+    def test_visits_for_datetime_after_add_visit(self):
+        self.add_visits('days')
+        base_datetime = get_utcnow()
+        dt = base_datetime + relativedelta(days=100)
+        self.assertEqual(self.schedule.visits.visits_for_datetime(base_datetime, dt), [])
+        visit = self.schedule.add_visit(
+            code='2000', timepoint=10, rbase=relativedelta(days=100),
+            rlower=relativedelta(days=0), rupper=relativedelta(days=6))
+        self.assertEqual(
+            self.schedule.visits.visits_for_datetime(base_datetime, dt), [visit])
+
+    def test_visits_for_datetime_periodic(self):
+        self.schedule.add_periodic_visits(
+            code_pattern='2{n:03d}', count=100, timepoint=0, timepoint_interval=1,
+            start=relativedelta(days=0), interval=relativedelta(weeks=1),
+            rlower=relativedelta(days=1), rupper=relativedelta(days=1))
+        base_datetime = get_utcnow()
+        visits = self.schedule.visits.visits_for_datetime(
+            base_datetime, base_datetime + relativedelta(days=64))
+        self.assertEqual([visit.code for visit in visits], ['2010'])
+
+    def test_bulk_visits_for_datetime(self):
+        for unit in ['days', 'months']:
+            with self.subTest(unit=unit):
+                self.schedule.visits.clear()
+                self.add_visits(unit)
+                base_datetime = get_utcnow()
+                datetimes = {
+                    f'S{i}': (base_datetime + timedelta(days=i % 3),
+                              base_datetime + timedelta(days=i))
+                    for i in range(0, 60)}
+                results = self.schedule.visits.bulk_visits_for_datetime(datetimes)
+                self.assertEqual(list(results), list(datetimes))
+                for key, (base_datetime, dt) in datetimes.items():
+                    self.assertEqual(results[key], self.scan(base_datetime, dt))
+
+
+class TestVisitDateProjection(TestCase):
+
+    def setUp(self):
+        self.schedule = Schedule(
+            name='schedule',
+            onschedule_model='edc_visit_schedule.onschedule',
+            offschedule_model='edc_visit_schedule.offschedule',
+            consent_model='edc_visit_schedule.subjectconsent',
+            appointment_model='edc_appointment.appointment')
+        for i, rbase in enumerate([relativedelta(days=0), relativedelta(weeks=2),
+                                   relativedelta(months=1), relativedelta(months=6, days=3)]):
+            self.schedule.add_visit(
+                code=str(1000 + i), timepoint=i, rbase=rbase,
+                rlower=relativedelta(days=i), rupper=relativedelta(months=i % 2, days=6))
+        self.base_datetimes = [
+            get_utcnow().replace(month=1, day=31, microsecond=0) + relativedelta(days=i * 11)
+            for i in range(0, 40)]
+
+    def expected(self, attr):
+        return [[getattr(visit_dates, attr)
+                 for visit_dates in self.schedule.visits.visit_dates(dt=dt).values()]
+                for dt in self.base_datetimes]
+
+    @skipIf(visit_date_projection.np is None, 'numpy is not installed')
+    def test_project_dates(self):
+        projection = self.schedule.visits.project_dates(self.base_datetimes)
+        self.assertEqual(projection.visits, list(self.schedule.visits.values()))
+        self.assertEqual(projection.timepoint.shape, (40, 4))
+        for attr, name in [('base', 'timepoint'), ('lower', 'lower'), ('upper', 'upper')]:
+            with self.subTest(attr=attr):
+                self.assertEqual(
+                    getattr(projection, name).tolist(),
+                    [[visit_date_projection.naive_utc(dt) for dt in row]
+                     for row in self.expected(attr)])
+
+    @skipIf(visit_date_projection.np is None, 'numpy is not installed')
+    def test_project_dates_timezone(self):
+        """Asserts calendar offsets are applied in the timezone of
+        the base datetimes, as visit_dates does.
+        """
+        tz = pytz.timezone('Africa/Gaborone')
+        self.base_datetimes = [
+            tz.localize(datetime(2020, 1, 31, 1, 0)) + relativedelta(days=i * 11)
+            for i in range(0, 40)]
+        projection = self.schedule.visits.project_dates(self.base_datetimes)
+        for attr, name in [('base', 'timepoint'), ('lower', 'lower'), ('upper', 'upper')]:
+            with self.subTest(attr=attr):
+                self.assertEqual(
+                    getattr(projection, name).tolist(),
+                    [[visit_date_projection.naive_utc(dt) for dt in row]
+                     for row in self.expected(attr)])
+        self.assertEqual(projection.timepoint[0, 2].tolist(), datetime(2020, 2, 28, 23, 0))
+
+    def test_project_dates_without_numpy(self):
+        np = visit_date_projection.np
+        visit_date_projection.np = None
+        try:
+            self.assertRaises(
+                visit_date_projection.VisitDateProjectionError,
+                self.schedule.visits.project_dates, self.base_datetimes)
+        finally:
+            visit_date_projection.np = np
+
+
+class TestVisitDatesCache(TestCase):
+
+    def setUp(self):
+        self.schedule = Schedule(
+            name='schedule',
+            onschedule_model='edc_visit_schedule.onschedule',
+            offschedule_model='edc_visit_schedule.offschedule',
+            consent_model='edc_visit_schedule.subjectconsent',
+            appointment_model='edc_appointment.appointment')
+        for i in range(0, 5):
+            self.schedule.add_visit(
+                code=str(1000 + i), timepoint=i, rbase=relativedelta(days=i * 7),
+                rlower=relativedelta(days=0), rupper=relativedelta(days=6))
+
+    def test_hits_and_misses(self):
+        dt = get_utcnow()
+        visit_dates = self.schedule.visits.visit_dates(dt=dt)
+        self.assertIs(self.schedule.visits.visit_dates(dt=dt), visit_dates)
+        self.schedule.visits.timepoint_dates(dt=dt)
+        self.schedule.visits.visit_dates(dt=dt + relativedelta(days=1))
+        cache_info = self.schedule.visits.visit_dates_cache_info()
+        self.assertEqual(cache_info.hits, 2)
+        self.assertEqual(cache_info.misses, 2)
+        self.assertEqual(cache_info.currsize, 2)
+
+    def test_read_only(self):
+        visit_dates = self.schedule.visits.visit_dates(dt=get_utcnow())
+        visit = self.schedule.visits.first
+        with self.assertRaises(TypeError):
+            visit_dates[visit] = None
+        self.assertRaises(AttributeError, setattr, visit_dates[visit], 'base', None)
+
+    def test_invalidated_by_add_visit(self):
+        dt = get_utcnow()
+        self.assertEqual(len(self.schedule.visits.visit_dates(dt=dt)), 5)
+        self.schedule.add_visit(
+            code='2000', timepoint=10, rbase=relativedelta(days=100),
+            rlower=relativedelta(days=0), rupper=relativedelta(days=6))
+        self.assertEqual(len(self.schedule.visits.visit_dates(dt=dt)), 6)
+        self.schedule.visits.pop('2000')
+        self.assertEqual(len(self.schedule.visits.visit_dates(dt=dt)), 5)
+
+    def test_lru(self):
+        self.schedule.visits.visit_dates_cache_size = 3
+        dt = get_utcnow()
+        for days in [0, 1, 2, 0, 3]:
+            self.schedule.visits.visit_dates(dt=dt + relativedelta(days=days))
+        self.assertEqual(self.schedule.visits.visit_dates_cache_info().currsize, 3)
+        self.schedule.visits.visit_dates(dt=dt)
+        self.assertEqual(self.schedule.visits.visit_dates_cache_info().hits, 2)
+        self.schedule.visits.visit_dates(dt=dt + relativedelta(days=1))
+        self.assertEqual(self.schedule.visits.visit_dates_cache_info().misses, 5)
+
+    def test_keyed_on_timezone(self):
+        dt = get_utcnow()
+        other_dt = dt.astimezone(timezone(timedelta(hours=2)))
+        visit = self.schedule.visits.first
+        self.assertEqual(
+            self.schedule.visits.visit_dates(dt=other_dt)[visit].base.tzinfo,
+            other_dt.tzinfo)
+        self.assertEqual(
+            self.schedule.visits.visit_dates(dt=dt)[visit].base.tzinfo, dt.tzinfo)
@@ -1,9 +1,19 @@
+import os
+import pickle
+import sys
+import tempfile
+
+from dateutil.relativedelta import relativedelta
+from importlib import invalidate_caches
 from django.apps import apps as django_apps
 from django.test import TestCase, tag
 
+from ..constants import PRN, SCHEDULED, UNSCHEDULED
+from ..ordered_collection import FrozenCollectionError
 from ..schedule import Schedule
 from ..site_visit_schedules import site_visit_schedules, SiteVisitScheduleError
 from ..site_visit_schedules import AlreadyRegisteredVisitSchedule
+from ..visit import Crf, FormsCollection, Panel, Requisition, Visit
 from ..visit_schedule import VisitSchedule
 from .models import OnSchedule, OffSchedule
 
@@ -127,3 +137,412 @@ class TestSiteVisitSchedule1(TestCase):
         _, schedule = site_visit_schedules.get_by_offschedule_model(
             'edc_visit_schedule.offschedule')
         self.assertEqual(schedule.offschedule_model_cls, OffSchedule)
+
+    def test_get_schedule_by_onschedule_model_schedule_name(self):
+        visit_schedule, schedule = (
+            site_visit_schedules.get_by_onschedule_model_schedule_name(
+                'edc_visit_schedule.onscheduletwo', name='schedule_two'))
+        self.assertEqual(visit_schedule, self.visit_schedule_two)
+        self.assertEqual(schedule, self.schedule_two)
+        self.assertRaises(
+            SiteVisitScheduleError,
+            site_visit_schedules.get_by_onschedule_model_schedule_name,
+            'edc_visit_schedule.onscheduletwo', name='schedule')
+
+    def test_get_schedule_by_model_raises(self):
+        self.assertRaises(
+            SiteVisitScheduleError,
+            site_visit_schedules.get_by_onschedule_model,
+            'edc_visit_schedule.blah')
+        self.assertRaises(
+            SiteVisitScheduleError,
+            site_visit_schedules.get_by_offschedule_model,
+            'edc_visit_schedule.blah')
+
+    def test_get_schedule_by_model_after_registry_reset(self):
+        """Asserts model label lookups follow the registry if it
+        is replaced.
+        """
+        site_visit_schedules._registry = {}
+        site_visit_schedules.register(self.visit_schedule_two)
+        self.assertRaises(
+            SiteVisitScheduleError,
+            site_visit_schedules.get_by_onschedule_model,
+            'edc_visit_schedule.onschedule')
+        visit_schedule, _ = site_visit_schedules.get_by_offschedule_model(
+            'edc_visit_schedule.offscheduletwo')
+        self.assertEqual(visit_schedule, self.visit_schedule_two)
+
+    def test_get_schedule_by_model_after_schedule_added(self):
+        """Asserts model label lookups follow schedules added to a
+        registered visit schedule.
+        """
+        site_visit_schedules.get_by_onschedule_model('edc_visit_schedule.onschedule')
+        schedule = Schedule(
+            name='schedule_three',
+            onschedule_model='edc_visit_schedule.onschedulethree',
+            offschedule_model='edc_visit_schedule.offschedulethree',
+            appointment_model='edc_appointment.appointment',
+            consent_model='edc_visit_schedule.subjectconsent')
+        self.visit_schedule.add_schedule(schedule)
+        self.assertEqual(
+            site_visit_schedules.get_by_onschedule_model(
+                'edc_visit_schedule.onschedulethree'),
+            (self.visit_schedule, schedule))
+        self.assertEqual(
+            site_visit_schedules.get_by_onschedule_model_schedule_name(
+                'edc_visit_schedule.onschedulethree', name='schedule_three'),
+            (self.visit_schedule, schedule))
+        self.assertEqual(
+            site_visit_schedules.get_by_offschedule_model(
+                'edc_visit_schedule.offschedulethree'),
+            (self.visit_schedule, schedule))
+        self.visit_schedule.schedules.pop('schedule_three')
+        self.assertRaises(
+            SiteVisitScheduleError,
+            site_visit_schedules.get_by_onschedule_model,
+            'edc_visit_schedule.onschedulethree')
+
+    def test_get_schedule_by_model_after_registry_changed(self):
+        site_visit_schedules.get_by_onschedule_model('edc_visit_schedule.onschedule')
+        del site_visit_schedules._registry['visit_schedule_two']
+        self.assertRaises(
+            SiteVisitScheduleError,
+            site_visit_schedules.get_by_onschedule_model,
+            'edc_visit_schedule.onscheduletwo')
+        site_visit_schedules._registry['visit_schedule_two'] = self.visit_schedule_two
+        visit_schedule, _ = site_visit_schedules.get_by_onschedule_model(
+            'edc_visit_schedule.onscheduletwo')
+        self.assertEqual(visit_schedule, self.visit_schedule_two)
+
+
+class TestSiteVisitScheduleFormIndex(TestCase):
+
+    def setUp(self):
+        crfs = FormsCollection(
+            Crf(show_order=1, model='edc_visit_schedule.crfone'),
+            Crf(show_order=2, model='edc_visit_schedule.crftwo'))
+        requisitions = FormsCollection(
+            Requisition(show_order=10, panel=Panel(
+                name='one', requisition_model='edc_visit_schedule.subjectrequisition')),
+            Requisition(show_order=20, panel=Panel(
+                name='two', requisition_model='edc_visit_schedule.subjectrequisition')))
+        crfs_prn = FormsCollection(
+            Crf(show_order=1, model='edc_visit_schedule.crfthree'))
+        self.visit_schedule = VisitSchedule(
+            name='visit_schedule',
+            verbose_name='Visit Schedule',
+            offstudy_model='edc_visit_schedule.subjectoffstudy',
+            death_report_model='edc_visit_schedule.deathreport')
+        self.schedule = Schedule(
+            name='schedule',
+            onschedule_model='edc_visit_schedule.onschedule',
+            offschedule_model='edc_visit_schedule.offschedule',
+            appointment_model='edc_appointment.appointment',
+            consent_model='edc_visit_schedule.subjectconsent')
+        self.schedule.add_visit(Visit(
+            code='1000', timepoint=0, rbase=relativedelta(days=0),
+            rlower=relativedelta(days=0), rupper=relativedelta(days=6),
+            crfs=crfs, requisitions=requisitions, crfs_prn=crfs_prn))
+        self.schedule.add_visit(Visit(
+            code='2000', timepoint=1, rbase=relativedelta(days=28),
+            rlower=relativedelta(days=0), rupper=relativedelta(days=6),
+            crfs=crfs, crfs_unscheduled=crfs, requisitions_prn=requisitions))
+        self.visit_schedule.add_schedule(self.schedule)
+        site_visit_schedules._registry = {}
+        site_visit_schedules.register(self.visit_schedule)
+
+    def test_get_by_form_model(self):
+        references = site_visit_schedules.get_by_form_model('edc_visit_schedule.crfone')
+        self.assertEqual(
+            [(ref.visit.code, ref.category) for ref in references],
+            [('1000', SCHEDULED), ('2000', SCHEDULED), ('2000', UNSCHEDULED)])
+        reference = references[0]
+        self.assertEqual(reference.visit_schedule, self.visit_schedule)
+        self.assertEqual(reference.schedule, self.schedule)
+        self.assertEqual(reference.form.model, 'edc_visit_schedule.crfone')
+        references = site_visit_schedules.get_by_form_model(
+            'edc_visit_schedule.crfthree', category=SCHEDULED)
+        self.assertEqual(references, [])
+        references = site_visit_schedules.get_by_form_model(
+            'edc_visit_schedule.crfthree', category=PRN)
+        self.assertEqual([ref.visit.code for ref in references], ['1000'])
+        self.assertEqual(site_visit_schedules.get_by_form_model('edc_visit_schedule.blah'), [])
+
+    def test_get_by_panel_name(self):
+        references = site_visit_schedules.get_by_panel_name('two')
+        self.assertEqual(
+            [(ref.visit.code, ref.category, ref.form.show_order) for ref in references],
+            [('1000', SCHEDULED, 20), ('2000', PRN, 20)])
+        self.assertEqual(
+            len(site_visit_schedules.get_by_form_model(
+                'edc_visit_schedule.subjectrequisition')), 4)
+        self.assertEqual(site_visit_schedules.get_by_panel_name('three'), [])
+
+    def test_form_index_updated_on_register(self):
+        self.assertEqual(len(site_visit_schedules.get_by_panel_name('two')), 2)
+        visit_schedule = VisitSchedule(
+            name='visit_schedule_two',
+            offstudy_model='edc_visit_schedule.subjectoffstudy',
+            death_report_model='edc_visit_schedule.deathreport')
+        schedule = Schedule(
+            name='schedule_two',
+            onschedule_model='edc_visit_schedule.onscheduletwo',
+            offschedule_model='edc_visit_schedule.offscheduletwo',
+            appointment_model='edc_appointment.appointment',
+            consent_model='edc_visit_schedule.subjectconsent')
+        schedule.add_visit(Visit(
+            code='1000', timepoint=0, rbase=relativedelta(days=0),
+            rlower=relativedelta(days=0), rupper=relativedelta(days=6),
+            requisitions=FormsCollection(*self.schedule.visits.get('1000').requisitions)))
+        visit_schedule.add_schedule(schedule)
+        site_visit_schedules.register(visit_schedule)
+        references = site_visit_schedules.get_by_panel_name('two')
+        self.assertEqual(
+            [ref.visit_schedule.name for ref in references],
+            ['visit_schedule', 'visit_schedule', 'visit_schedule_two'])
+
+    def test_form_index_after_visit_added(self):
+        self.assertEqual(len(site_visit_schedules.get_by_panel_name('two')), 2)
+        self.schedule.add_visit(Visit(
+            code='3000', timepoint=2, rbase=relativedelta(days=56),
+            rlower=relativedelta(days=0), rupper=relativedelta(days=6),
+            requisitions=FormsCollection(*self.schedule.visits.get('1000').requisitions)))
+        self.assertEqual(
+            [ref.visit.code for ref in site_visit_schedules.get_by_panel_name('two')],
+            ['1000', '2000', '3000'])
+
+    def test_form_index_does_not_create_periodic_visits(self):
+        self.schedule.add_periodic_visits(
+            code_pattern='3{n:03d}', count=5000, timepoint=10, timepoint_interval=1,
+            start=relativedelta(days=70), interval=relativedelta(weeks=1),
+            rlower=relativedelta(days=0), rupper=relativedelta(days=6),
+            crfs_prn=FormsCollection(Crf(show_order=1, model='edc_visit_schedule.crffour')))
+        periodic_visits = self.schedule.visits.periodic_visits[0]
+        references = site_visit_schedules.get_by_panel_name('two')
+        self.assertEqual([ref.visit.code for ref in references], ['1000', '2000'])
+        self.assertEqual(
+            len(site_visit_schedules.get_by_form_model('edc_visit_schedule.crfone')), 3)
+        self.assertEqual(len(periodic_visits._visits), 1)
+        self.assertEqual(
+            site_visit_schedules.get_by_form_model(
+                'edc_visit_schedule.crffour', category=SCHEDULED), [])
+        self.assertEqual(len(periodic_visits._visits), 1)
+        references = site_visit_schedules.get_by_form_model(
+            'edc_visit_schedule.crffour', category=PRN)
+        self.assertEqual(len(references), 5000)
+        self.assertEqual(
+            [ref.visit.code for ref in references[:2]] + [references[-1].visit.code],
+            ['3001', '3002', '35000'])
+        self.assertEqual(references[0].visit, self.schedule.visits.get('3001'))
+
+    def test_form_index_after_registry_reset(self):
+        site_visit_schedules._registry = {}
+        self.assertEqual(site_visit_schedules.get_by_panel_name('two'), [])
+
+
+class TestSiteVisitScheduleFrozen(TestCase):
+
+    def setUp(self):
+        self.visit_schedule = VisitSchedule(
+            name='visit_schedule',
+            verbose_name='Visit Schedule',
+            offstudy_model='edc_visit_schedule.subjectoffstudy',
+            death_report_model='edc_visit_schedule.deathreport')
+        self.schedule = Schedule(
+            name='schedule',
+            onschedule_model='edc_visit_schedule.onschedule',
+            offschedule_model='edc_visit_schedule.offschedule',
+            appointment_model='edc_appointment.appointment',
+            consent_model='edc_visit_schedule.subjectconsent')
+        self.visit = Visit(
+            code='1000', timepoint=0, rbase=relativedelta(days=0),
+            rlower=relativedelta(days=0), rupper=relativedelta(days=6))
+        self.schedule.add_visit(self.visit)
+        self.visit_schedule.add_schedule(self.schedule)
+        site_visit_schedules._registry = {}
+        site_visit_schedules.register(self.visit_schedule)
+
+    def test_lookups(self):
+        for freeze in [False, True]:
+            with self.subTest(frozen=freeze):
+                if freeze:
+                    site_visit_schedules.freeze()
+                self.assertEqual(site_visit_schedules.frozen, freeze)
+                self.assertEqual(
+                    site_visit_schedules.get_visit_schedule('visit_schedule.schedule'),
+                    self.visit_schedule)
+                self.assertEqual(
+                    site_visit_schedules.get_schedule('visit_schedule.schedule'),
+                    (self.visit_schedule, self.schedule))
+                self.assertEqual(
+                    site_visit_schedules.get_visit('visit_schedule.schedule', '1000'),
+                    self.visit)
+                self.assertEqual(
+                    site_visit_schedules.get_by_onschedule_model(
+                        'edc_visit_schedule.onschedule'),
+                    (self.visit_schedule, self.schedule))
+                self.assertRaises(
+                    SiteVisitScheduleError,
+                    site_visit_schedules.get_visit_schedule, 'blah')
+                self.assertRaises(
+                    SiteVisitScheduleError,
+                    site_visit_schedules.get_schedule, 'visit_schedule.blah')
+                self.assertRaises(
+                    SiteVisitScheduleError,
+                    site_visit_schedules.get_schedule, 'visit_schedule')
+                self.assertRaises(
+                    SiteVisitScheduleError,
+                    site_visit_schedules.get_visit, 'visit_schedule.schedule', '2000')
+
+    def test_fingerprint(self):
+        fingerprint = site_visit_schedules.fingerprint
+        self.assertEqual(fingerprint, site_visit_schedules.fingerprint)
+        self.assertEqual(len(fingerprint), 64)
+        self.schedule.add_visit(Visit(
+            code='2000', timepoint=1, rbase=relativedelta(days=28),
+            rlower=relativedelta(days=0), rupper=relativedelta(days=6)))
+        self.assertNotEqual(site_visit_schedules.fingerprint, fingerprint)
+        fingerprint = site_visit_schedules.fingerprint
+        site_visit_schedules.freeze()
+        self.assertEqual(site_visit_schedules.fingerprint, fingerprint)
+        self.assertEqual(site_visit_schedules._frozen_fingerprint, fingerprint)
+
+    def test_frozen_registry_cannot_change(self):
+        site_visit_schedules.freeze()
+        visit_schedule = VisitSchedule(
+            name='visit_schedule_two',
+            offstudy_model='edc_visit_schedule.subjectoffstudy',
+            death_report_model='edc_visit_schedule.deathreport')
+        self.assertRaises(
+            SiteVisitScheduleError, site_visit_schedules.register, visit_schedule)
+        with self.assertRaises(TypeError):
+            site_visit_schedules.registry['visit_schedule_two'] = visit_schedule
+        self.assertRaises(
+            FrozenCollectionError, self.visit_schedule.add_schedule, Schedule(
+                name='schedule_two',
+                onschedule_model='edc_visit_schedule.onscheduletwo',
+                offschedule_model='edc_visit_schedule.offscheduletwo',
+                appointment_model='edc_appointment.appointment',
+                consent_model='edc_visit_schedule.subjectconsent'))
+        visit = Visit(
+            code='2000', timepoint=1, rbase=relativedelta(days=28),
+            rlower=relativedelta(days=0), rupper=relativedelta(days=6))
+        self.assertRaises(FrozenCollectionError, self.schedule.add_visit, visit)
+        self.assertRaises(FrozenCollectionError, self.schedule.visits.pop, '1000')
+        self.assertEqual(list(self.schedule.visits), ['1000'])
+
+    def test_register_identical_when_frozen(self):
+        site_visit_schedules.freeze()
+        visit_schedule = pickle.loads(pickle.dumps(self.visit_schedule))
+        site_visit_schedules.register(visit_schedule)
+        self.assertIs(
+            site_visit_schedules.get_visit_schedule('visit_schedule'), self.visit_schedule)
+        visit_schedule = pickle.loads(pickle.dumps(self.visit_schedule))
+        visit_schedule.schedules.get('schedule').add_visit(Visit(
+            code='2000', timepoint=1, rbase=relativedelta(days=28),
+            rlower=relativedelta(days=0), rupper=relativedelta(days=6)))
+        self.assertRaises(
+            SiteVisitScheduleError, site_visit_schedules.register, visit_schedule)
+
+    def test_replaced_registry_is_not_frozen(self):
+        site_visit_schedules.freeze()
+        site_visit_schedules._registry = {}
+        self.assertFalse(site_visit_schedules.frozen)
+        self.assertRaises(
+            SiteVisitScheduleError,
+            site_visit_schedules.get_visit_schedule, 'visit_schedule')
+
+    def test_replaced_registry_unfreezes_collections(self):
+        site_visit_schedules.freeze()
+        self.assertTrue(self.schedule.visits.frozen)
+        site_visit_schedules._registry = {}
+        site_visit_schedules.register(self.visit_schedule)
+        self.assertFalse(self.visit_schedule.schedules.frozen)
+        self.assertFalse(self.schedule.visits.frozen)
+        self.schedule.add_visit(Visit(
+            code='2000', timepoint=1, rbase=relativedelta(days=28),
+            rlower=relativedelta(days=0), rupper=relativedelta(days=6)))
+        site_visit_schedules.freeze()
+        self.assertTrue(self.schedule.visits.frozen)
+        self.assertEqual(
+            site_visit_schedules.get_visit('visit_schedule.schedule', '2000').code, '2000')
+
+    def test_freeze_does_not_create_periodic_visits(self):
+        site_visit_schedules._registry = {}
+        self.schedule.add_periodic_visits(
+            code_pattern='3{n:03d}', count=5000, timepoint=10, timepoint_interval=1,
+            start=relativedelta(days=70), interval=relativedelta(weeks=1),
+            rlower=relativedelta(days=0), rupper=relativedelta(days=6))
+        site_visit_schedules.register(self.visit_schedule)
+        site_visit_schedules.freeze()
+        periodic_visits = self.schedule.visits.periodic_visits[0]
+        self.assertEqual(len(periodic_visits._visits), 1)
+        self.assertEqual(
+            site_visit_schedules.get_visit('visit_schedule.schedule', '3100').code, '3100')
+        self.assertRaises(
+            SiteVisitScheduleError,
+            site_visit_schedules.get_visit, 'visit_schedule.schedule', '9100')
+
+
+class TestSiteVisitScheduleAutodiscover(TestCase):
+
+    module_source = (
+        'from dateutil.relativedelta import relativedelta\n'
+        'from edc_visit_schedule.schedule import Schedule\n'
+        'from edc_visit_schedule.site_visit_schedules import site_visit_schedules\n'
+        'from edc_visit_schedule.visit import Crf, FormsCollection, Visit\n'
+        'from edc_visit_schedule.visit_schedule import VisitSchedule\n'
+        'visit_schedule = VisitSchedule(\n'
+        '    name=\'autodiscover_visit_schedule\',\n'
+        '    offstudy_model=\'edc_visit_schedule.subjectoffstudy\',\n'
+        '    death_report_model=\'edc_visit_schedule.deathreport\')\n'
+        'schedule = Schedule(\n'
+        '    name=\'schedule\',\n'
+        '    onschedule_model=\'edc_visit_schedule.onschedule\',\n'
+        '    offschedule_model=\'edc_visit_schedule.offschedule\',\n'
+        '    appointment_model=\'edc_appointment.appointment\',\n'
+        '    consent_model=\'edc_visit_schedule.subjectconsent\')\n'
+        'schedule.add_visit(Visit(\n'
+        '    code=\'1000\', timepoint=0, rbase=relativedelta(days=0),\n'
+        '    rlower=relativedelta(days=0), rupper=relativedelta(days=6),\n'
+        '    crfs=FormsCollection(Crf(show_order=1, model=\'edc_visit_schedule.crfone\'))))\n'
+        'visit_schedule.add_schedule(schedule)\n'
+        'site_visit_schedules.register(visit_schedule)\n')
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        os.mkdir(os.path.join(self.path, 'autodiscover_app'))
+        open(os.path.join(self.path, 'autodiscover_app', '__init__.py'), 'w').close()
+        with open(os.path.join(self.path, 'autodiscover_app', 'visit_schedules.py'), 'w') as f:
+            f.write(self.module_source)
+        sys.path.insert(0, self.path)
+        invalidate_caches()
+        site_visit_schedules._registry = {}
+
+    def tearDown(self):
+        sys.path.remove(self.path)
+        for name in ['autodiscover_app', 'autodiscover_app.visit_schedules']:
+            sys.modules.pop(name, None)
+
+    def test_autodiscover(self):
+        report = site_visit_schedules.autodiscover(
+            apps=['blah', 'blah.blah', 'edc_visit_schedule', 'autodiscover_app'],
+            verbose=False)
+        self.assertEqual(
+            list(site_visit_schedules.registry), ['autodiscover_visit_schedule'])
+        self.assertEqual(len(report), 1)
+        timing = report[0]
+        self.assertEqual(timing.app, 'autodiscover_app')
+        self.assertEqual(timing.module, 'autodiscover_app.visit_schedules')
+        self.assertEqual(timing.visit_schedules, ['autodiscover_visit_schedule'])
+        self.assertEqual((timing.schedules, timing.visits, timing.forms), (1, 1, 1))
+        self.assertGreater(timing.seconds, 0)
+        self.assertEqual(site_visit_schedules.autodiscover_report, report)
+
+    def test_autodiscover_raises(self):
+        with open(os.path.join(self.path, 'autodiscover_app', 'visit_schedules.py'), 'a') as f:
+            f.write('import blah\n')
+        self.assertRaises(
+            ModuleNotFoundError, site_visit_schedules.autodiscover,
+            apps=['autodiscover_app'], verbose=False)
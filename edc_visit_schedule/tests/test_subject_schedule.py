@@ -1,14 +1,56 @@
+from dateutil.relativedelta import relativedelta
+from django.contrib.sites.models import Site
+from django.db import connection
 from django.test import TestCase, tag
+from django.test.utils import CaptureQueriesContext
 from django.core.exceptions import ObjectDoesNotExist
+from edc_appointment.constants import COMPLETE_APPT, IN_PROGRESS_APPT
+from edc_appointment.creators import AppointmentsCreator
+from edc_appointment.models import Appointment
 from edc_base import get_utcnow
 from edc_base.tests import SiteTestCaseMixin
+from edc_facility.import_holidays import import_holidays
+from unittest.mock import patch
 
+from ..constants import OFF_SCHEDULE, ON_SCHEDULE
 from ..models import SubjectScheduleHistory
 from ..schedule import Schedule
 from ..site_visit_schedules import site_visit_schedules
 from ..subject_schedule import SubjectSchedule, SubjectScheduleError
+from ..subject_schedule import NotOnScheduleError, NotOnScheduleForDateError
+from ..subject_schedule import UnknownSubjectError
+from ..subject_schedule_history_cache import subject_schedule_history_cache
 from ..visit_schedule import VisitSchedule
 from .models import SubjectConsent, OnSchedule, OffSchedule
+from .visit_schedule import visit_schedule
+
+
+class AppointmentsError(Exception):
+    pass
+
+
+class FailingAppointmentsCreator(AppointmentsCreator):
+
+    """Fails to create appointments for subject 333333.
+    """
+
+    def __init__(self, subject_identifier=None, **kwargs):
+        self.fail_for_subject = subject_identifier == '333333'
+        super().__init__(subject_identifier=subject_identifier, **kwargs)
+
+    def create_appointments(self, *args, **kwargs):
+        if self.fail_for_subject:
+            raise AppointmentsError('Failed to create appointments.')
+        return super().create_appointments(*args, **kwargs)
+
+
+class DummyAppointmentsCreator:
+
+    def __init__(self, **kwargs):
+        pass
+
+    def create_appointments(self, *args, **kwargs):
+        pass
 
 
 class TestSubjectSchedule(SiteTestCaseMixin, TestCase):
@@ -147,3 +189,258 @@ class TestSubjectSchedule(SiteTestCaseMixin, TestCase):
             OffSchedule.objects.get(subject_identifier=self.subject_identifier)
         except ObjectDoesNotExist:
             self.fail('ObjectDoesNotExist unexpectedly raised')
+
+    def test_bulk_put_on_schedule(self):
+        _, schedule = site_visit_schedules.get_by_onschedule_model(
+            'edc_visit_schedule.onschedule')
+        subject_identifiers = ['222222', '333333', '444444']
+        for subject_identifier in subject_identifiers:
+            SubjectConsent.objects.create(subject_identifier=subject_identifier)
+        schedule.put_on_schedule(
+            subject_identifier=self.subject_identifier,
+            onschedule_datetime=get_utcnow())
+        results = schedule.bulk_put_on_schedule(
+            subjects=[(s, get_utcnow()) for s in
+                      [self.subject_identifier, 'UNKNOWN'] + subject_identifiers])
+        self.assertEqual(
+            list(results), [self.subject_identifier, 'UNKNOWN'] + subject_identifiers)
+        self.assertIsInstance(results.pop('UNKNOWN'), UnknownSubjectError)
+        self.assertEqual(list(results.values()), [None, None, None, None])
+        for subject_identifier in [self.subject_identifier] + subject_identifiers:
+            with self.subTest(subject_identifier=subject_identifier):
+                obj = OnSchedule.objects.get(subject_identifier=subject_identifier)
+                self.assertEqual(obj.report_datetime, obj.onschedule_datetime)
+                history_obj = SubjectScheduleHistory.objects.get(
+                    subject_identifier=subject_identifier,
+                    schedule_name='schedule')
+                self.assertEqual(history_obj.schedule_status, ON_SCHEDULE)
+        self.assertFalse(OnSchedule.objects.filter(
+            subject_identifier='UNKNOWN').exists())
+
+    def test_bulk_is_onschedule(self):
+        _, schedule = site_visit_schedules.get_by_onschedule_model(
+            'edc_visit_schedule.onschedule')
+        onschedule_datetime = get_utcnow() - relativedelta(days=10)
+        schedule.put_on_schedule(
+            subject_identifier=self.subject_identifier,
+            onschedule_datetime=onschedule_datetime)
+        subjects = [
+            (self.subject_identifier, get_utcnow()),
+            (self.subject_identifier, onschedule_datetime - relativedelta(days=1)),
+            ('UNKNOWN', get_utcnow())]
+        schedule.subject
+        with self.assertNumQueries(1):
+            results = schedule.bulk_is_onschedule(subjects=subjects)
+        self.assertEqual(list(results), subjects)
+        self.assertEqual(list(results.values()), [True, False, False])
+        for (subject_identifier, report_datetime), value in results.items():
+            self.assertEqual(
+                schedule.is_onschedule(
+                    subject_identifier=subject_identifier,
+                    report_datetime=report_datetime),
+                value)
+
+    def test_history_cache(self):
+        _, schedule = site_visit_schedules.get_by_onschedule_model(
+            'edc_visit_schedule.onschedule')
+        schedule.put_on_schedule(
+            subject_identifier=self.subject_identifier,
+            onschedule_datetime=get_utcnow() - relativedelta(days=10))
+        subject_schedule = schedule.subject
+        with self.assertNumQueries(1):
+            subject_schedule.onschedule_or_raise(
+                subject_identifier=self.subject_identifier,
+                report_datetime=get_utcnow())
+        with subject_schedule_history_cache:
+            with self.assertNumQueries(1):
+                for _ in range(0, 3):
+                    subject_schedule.onschedule_or_raise(
+                        subject_identifier=self.subject_identifier,
+                        report_datetime=get_utcnow())
+            schedule.take_off_schedule(
+                subject_identifier=self.subject_identifier,
+                offschedule_datetime=get_utcnow() - relativedelta(days=5))
+            self.assertRaises(
+                NotOnScheduleForDateError,
+                subject_schedule.onschedule_or_raise,
+                subject_identifier=self.subject_identifier,
+                report_datetime=get_utcnow())
+        self.assertFalse(subject_schedule_history_cache.active)
+
+    def test_history_cache_onschedule_deleted(self):
+        """Asserts deleting the onschedule model instance deletes the
+        subject's history for the schedule and refreshes the cache.
+        """
+        _, schedule = site_visit_schedules.get_by_onschedule_model(
+            'edc_visit_schedule.onschedule')
+        schedule.put_on_schedule(
+            subject_identifier=self.subject_identifier,
+            onschedule_datetime=get_utcnow() - relativedelta(days=10))
+        subject_schedule = schedule.subject
+        with subject_schedule_history_cache:
+            subject_schedule.onschedule_or_raise(
+                subject_identifier=self.subject_identifier,
+                report_datetime=get_utcnow())
+            OnSchedule.objects.get(subject_identifier=self.subject_identifier).delete()
+            self.assertFalse(SubjectScheduleHistory.objects.filter(
+                subject_identifier=self.subject_identifier,
+                schedule_name='schedule').exists())
+            self.assertRaises(
+                NotOnScheduleError,
+                subject_schedule.onschedule_or_raise,
+                subject_identifier=self.subject_identifier,
+                report_datetime=get_utcnow())
+
+
+class TestSubjectScheduleBulk(SiteTestCaseMixin, TestCase):
+
+    def setUp(self):
+        import_holidays()
+        site_visit_schedules.loaded = False
+        site_visit_schedules._registry = {}
+        site_visit_schedules.register(visit_schedule)
+        _, self.schedule = site_visit_schedules.get_by_onschedule_model(
+            'edc_visit_schedule.onschedule')
+        self.subject_identifiers = ['222222', '333333', '444444', '555555']
+        for subject_identifier in self.subject_identifiers:
+            SubjectConsent.objects.create(subject_identifier=subject_identifier)
+
+    def test_bulk_put_on_schedule_creates_appointments(self):
+        for bulk_create, subject_identifiers in [
+                (False, self.subject_identifiers[:2]), (True, self.subject_identifiers[2:])]:
+            with self.subTest(bulk_create=bulk_create):
+                results = self.schedule.bulk_put_on_schedule(
+                    subjects=[(s, get_utcnow()) for s in subject_identifiers],
+                    bulk_create=bulk_create)
+                self.assertEqual(list(results.values()), [None, None])
+                for subject_identifier in subject_identifiers:
+                    self.assertEqual(Appointment.objects.filter(
+                        subject_identifier=subject_identifier).count(), 4)
+                    self.assertEqual(OnSchedule.history.filter(
+                        subject_identifier=subject_identifier).count(), 1)
+
+    @patch.object(SubjectSchedule, 'appointments_creator_cls', FailingAppointmentsCreator)
+    def test_bulk_put_on_schedule_appointments_error(self):
+        """Asserts a subject for whom appointments cannot be created
+        is not put on schedule, the error is returned for the subject
+        and the other subjects are put on schedule.
+        """
+        for bulk_create, subject_identifiers in [
+                (False, ['222222', '333333']), (True, ['333333', '444444'])]:
+            with self.subTest(bulk_create=bulk_create):
+                results = self.schedule.bulk_put_on_schedule(
+                    subjects=[(s, get_utcnow()) for s in subject_identifiers],
+                    bulk_create=bulk_create)
+                self.assertEqual(list(results), subject_identifiers)
+                self.assertIsInstance(results.pop('333333'), AppointmentsError)
+                self.assertEqual(list(results.values()), [None])
+                self.assertFalse(
+                    OnSchedule.objects.filter(subject_identifier='333333').exists())
+                self.assertFalse(
+                    OnSchedule.history.filter(subject_identifier='333333').exists())
+                self.assertFalse(SubjectScheduleHistory.objects.filter(
+                    subject_identifier='333333').exists())
+                self.assertFalse(
+                    Appointment.objects.filter(subject_identifier='333333').exists())
+                subject_identifier, = results
+                self.assertTrue(
+                    OnSchedule.objects.filter(subject_identifier=subject_identifier).exists())
+                self.assertEqual(Appointment.objects.filter(
+                    subject_identifier=subject_identifier).count(), 4)
+
+    @patch.object(SubjectSchedule, 'appointments_creator_cls', DummyAppointmentsCreator)
+    def test_bulk_put_on_schedule_queries(self):
+        """Asserts, not counting appointments and savepoints, the
+        number of queries does not depend on the number of subjects
+        if bulk creating and, otherwise, is less than putting each
+        subject on schedule with `put_on_schedule`.
+        """
+        Site.objects.get_current()
+
+        def count_queries(func, *args, **kwargs):
+            with CaptureQueriesContext(connection) as context:
+                func(*args, **kwargs)
+            return len([query for query in context.captured_queries
+                        if 'SAVEPOINT' not in query['sql']])
+
+        queries = [
+            count_queries(
+                self.schedule.bulk_put_on_schedule,
+                subjects=[(s, get_utcnow()) for s in subject_identifiers],
+                bulk_create=True)
+            for subject_identifiers in [['222222'], ['333333', '444444']]]
+        self.assertEqual(queries[0], queries[1])
+        OnSchedule.objects.all().delete()
+        SubjectScheduleHistory.objects.all().delete()
+
+        def put_on_schedule(subject_identifiers):
+            for subject_identifier in subject_identifiers:
+                self.schedule.put_on_schedule(
+                    subject_identifier=subject_identifier, onschedule_datetime=get_utcnow())
+
+        self.assertLess(
+            count_queries(
+                self.schedule.bulk_put_on_schedule,
+                subjects=[(s, get_utcnow()) for s in ['222222', '333333']]),
+            count_queries(put_on_schedule, ['444444', '555555']))
+
+    def test_bulk_take_off_schedule(self):
+        self.schedule.bulk_put_on_schedule(
+            subjects=[(s, get_utcnow() - relativedelta(days=10))
+                      for s in self.subject_identifiers])
+        subjects = []
+        for subject_identifier in self.subject_identifiers:
+            appointments = Appointment.objects.filter(
+                subject_identifier=subject_identifier).order_by('appt_datetime')
+            Appointment.objects.filter(pk=appointments[0].pk).update(
+                appt_status=IN_PROGRESS_APPT)
+            subjects.append((subject_identifier, appointments[1].appt_datetime))
+        for bulk_create, batch in [(False, subjects[:2]), (True, subjects[2:])]:
+            with self.subTest(bulk_create=bulk_create):
+                results = self.schedule.bulk_take_off_schedule(
+                    subjects=[('UNKNOWN', get_utcnow())] + batch, bulk_create=bulk_create)
+                self.assertIsInstance(results.pop('UNKNOWN'), NotOnScheduleError)
+                self.assertEqual(list(results.values()), [None, None])
+                for subject_identifier, offschedule_datetime in batch:
+                    OffSchedule.objects.get(subject_identifier=subject_identifier)
+                    self.assertEqual(OffSchedule.history.filter(
+                        subject_identifier=subject_identifier).count(), 1)
+                    history_obj = SubjectScheduleHistory.objects.get(
+                        subject_identifier=subject_identifier,
+                        schedule_name='schedule')
+                    self.assertEqual(history_obj.schedule_status, OFF_SCHEDULE)
+                    self.assertEqual(
+                        history_obj.offschedule_datetime, offschedule_datetime)
+                    appointments = Appointment.objects.filter(
+                        subject_identifier=subject_identifier).order_by('appt_datetime')
+                    self.assertEqual(appointments.count(), 2)
+                    self.assertEqual(appointments[0].appt_status, COMPLETE_APPT)
+        self.assertFalse(OffSchedule.objects.filter(subject_identifier='UNKNOWN').exists())
+
+    def test_bulk_take_off_schedule_updates_appointments_per_batch(self):
+        """Asserts the appointments of all subjects are completed with
+        one update and deleted with one delete.
+        """
+        self.schedule.bulk_put_on_schedule(
+            subjects=[(s, get_utcnow() - relativedelta(days=10))
+                      for s in self.subject_identifiers])
+        Appointment.objects.filter(timepoint=0).update(appt_status=IN_PROGRESS_APPT)
+        subjects = [
+            (subject_identifier, Appointment.objects.filter(
+                subject_identifier=subject_identifier).order_by(
+                    'appt_datetime')[1].appt_datetime)
+            for subject_identifier in self.subject_identifiers]
+        table = Appointment._meta.db_table
+        with CaptureQueriesContext(connection) as context:
+            results = self.schedule.bulk_take_off_schedule(
+                subjects=subjects, bulk_create=True)
+        self.assertEqual(list(results.values()), [None, None, None, None])
+        for statement in [f'UPDATE "{table}"', f'DELETE FROM "{table}"']:
+            with self.subTest(statement=statement):
+                self.assertEqual(len([
+                    query for query in context.captured_queries
+                    if query['sql'].startswith(statement)]), 1)
+        self.assertEqual(Appointment.objects.filter(
+            subject_identifier__in=self.subject_identifiers).count(), 8)
+        self.assertEqual(Appointment.objects.filter(
+            appt_status=COMPLETE_APPT).count(), 4)
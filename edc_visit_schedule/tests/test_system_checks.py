@@ -1,6 +1,11 @@
+import os
+import tempfile
+
 from dateutil.relativedelta import relativedelta
 from django.apps import apps as django_apps
 from django.test import TestCase, tag
+from django.test.utils import override_settings
+from unittest.mock import patch
 
 from ..schedule import Schedule
 from ..site_visit_schedules import site_visit_schedules
@@ -112,5 +117,100 @@ class TestSystemChecks(TestCase):
         site_visit_schedules.register(visit_schedule)
         errors = visit_schedule_check(
             app_configs=django_apps.get_app_configs())
-        self.assertEqual(len(errors), 1)
-        self.assertEqual('edc_visit_schedule.visits', errors[0].id)
+        self.assertEqual(len(errors), 3)
+        self.assertEqual(
+            ['edc_visit_schedule.visits'] * 3, [error.id for error in errors])
+
+    @tag('1')
+    def test_all_bad_models_reported(self):
+        site_visit_schedules._registry = {}
+        visit_schedule = VisitSchedule(
+            name='visit_schedule',
+            verbose_name='Visit Schedule',
+            offstudy_model='blah.subjectoffstudy',
+            death_report_model='blah.deathreport')
+        schedule = Schedule(
+            name='schedule',
+            onschedule_model='edc_visit_schedule.onschedule',
+            offschedule_model='edc_visit_schedule.offschedule',
+            appointment_model='blah.appointment',
+            consent_model='edc_visit_schedule.subjectconsent')
+        visit_schedule.add_schedule(schedule)
+        site_visit_schedules.register(visit_schedule)
+        errors = visit_schedule_check(
+            app_configs=django_apps.get_app_configs())
+        self.assertEqual(
+            ['edc_visit_schedule.visit_schedules'] * 2 + ['edc_visit_schedule.schedules'],
+            [error.id for error in errors])
+        self.assertIn("'blah'", errors[2].msg)
+
+    @tag('1')
+    def test_crf_model_looked_up_once(self):
+        site_visit_schedules._registry = {}
+        visit_schedule = VisitSchedule(
+            name='visit_schedule',
+            verbose_name='Visit Schedule',
+            offstudy_model='edc_visit_schedule.subjectoffstudy',
+            death_report_model='edc_visit_schedule.deathreport')
+        schedule = Schedule(
+            name='schedule',
+            onschedule_model='edc_visit_schedule.onschedule',
+            offschedule_model='edc_visit_schedule.offschedule',
+            appointment_model='edc_appointment.appointment',
+            consent_model='edc_visit_schedule.subjectconsent')
+        crfs = FormsCollection(
+            Crf(show_order=10, model='blah.CrfOne'),
+            Crf(show_order=20, model='edc_visit_schedule.crfone'))
+        for i in range(0, 3):
+            schedule.add_visit(Visit(
+                code=str(1000 + i),
+                timepoint=i,
+                rbase=relativedelta(days=i),
+                rlower=relativedelta(days=0),
+                rupper=relativedelta(days=0),
+                facility_name='default',
+                crfs=crfs,
+                crfs_unscheduled=crfs))
+        visit_schedule.add_schedule(schedule)
+        site_visit_schedules.register(visit_schedule)
+        with patch.object(
+                django_apps, 'get_model', wraps=django_apps.get_model) as get_model:
+            errors = site_visit_schedules.check()
+        models = [call[0][0] for call in get_model.call_args_list]
+        self.assertEqual(models.count('blah.CrfOne'), 1)
+        self.assertEqual(models.count('edc_visit_schedule.crfone'), 1)
+        self.assertEqual(
+            [error.split('Got Visit ')[1] for error in errors['visits']],
+            ['1000 crf.model=blah.CrfOne.',
+             '1001 crf.model=blah.CrfOne.',
+             '1002 crf.model=blah.CrfOne.'])
+
+    @tag('1')
+    def test_cached(self):
+        site_visit_schedules._registry = {}
+        visit_schedule = VisitSchedule(
+            name='visit_schedule',
+            verbose_name='Visit Schedule',
+            offstudy_model='blah.subjectoffstudy',
+            death_report_model='edc_visit_schedule.deathreport')
+        visit_schedule.add_schedule(Schedule(
+            name='schedule',
+            onschedule_model='edc_visit_schedule.onschedule',
+            offschedule_model='edc_visit_schedule.offschedule',
+            appointment_model='edc_appointment.appointment',
+            consent_model='edc_visit_schedule.subjectconsent'))
+        site_visit_schedules.register(visit_schedule)
+        cache_dir = os.path.join(tempfile.mkdtemp(), 'checks')
+        with override_settings(EDC_VISIT_SCHEDULE_CHECK_CACHE_DIR=cache_dir):
+            errors = visit_schedule_check(
+                app_configs=django_apps.get_app_configs())
+            self.assertEqual(len(os.listdir(cache_dir)), 1)
+            with patch.object(site_visit_schedules, 'check') as check:
+                self.assertEqual(
+                    visit_schedule_check(app_configs=django_apps.get_app_configs()),
+                    errors)
+                check.assert_not_called()
+            visit_schedule.death_report_model = 'blah.deathreport'
+            self.assertNotEqual(
+                visit_schedule_check(app_configs=django_apps.get_app_configs()), errors)
+            self.assertEqual(len(os.listdir(cache_dir)), 2)
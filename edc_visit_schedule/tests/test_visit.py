@@ -2,7 +2,8 @@ from datetime import datetime
 from dateutil.relativedelta import relativedelta
 from django.test import TestCase, tag
 
-from ..visit import WindowPeriod
+from ..visit import Crf, FormsCollection, FrozenError, Panel, Requisition
+from ..visit import PeriodicVisits, PeriodicVisitsError, Window, WindowPeriod
 from ..visit import Visit, VisitCodeError, VisitDateError
 
 
@@ -60,6 +61,8 @@ class TestVisit(TestCase):
         visit.timepoint_datetime = datetime(2001, 12, 1)
         self.assertEqual(visit.dates.lower, datetime(2001, 12, 1))
         self.assertEqual(visit.dates.upper, datetime(2001, 12, 7))
+        visit.dates.upper = datetime(2001, 12, 8)
+        self.assertEqual(visit.dates.upper, datetime(2001, 12, 8))
 
     def test_window_period_days(self):
         wp = WindowPeriod(
@@ -79,6 +82,30 @@ class TestVisit(TestCase):
         self.assertEqual(wp.get_window(dt).lower, datetime(2001, 12, 1))
         self.assertEqual(wp.get_window(dt).upper, datetime(2002, 1, 19))
 
+    def test_window_period_months(self):
+        wp = WindowPeriod(
+            rlower=relativedelta(months=1),
+            rupper=relativedelta(months=1, days=3))
+        dt = datetime(2001, 3, 31)
+        self.assertEqual(wp.get_window(dt).lower, datetime(2001, 2, 28))
+        self.assertEqual(wp.get_window(dt).upper, datetime(2001, 5, 3))
+
+    def test_window_period_date(self):
+        wp = WindowPeriod(
+            rlower=relativedelta(days=1),
+            rupper=relativedelta(weeks=1))
+        dt = datetime(2001, 12, 8)
+        self.assertEqual(wp.get_window(dt.date()).lower, datetime(2001, 12, 7).date())
+        self.assertEqual(wp.get_window(dt.date()).upper, datetime(2001, 12, 15).date())
+
+    def test_window_period_window_type(self):
+        wp = WindowPeriod(
+            rlower=relativedelta(days=0),
+            rupper=relativedelta(days=6))
+        dt = datetime(2001, 12, 1)
+        self.assertIsInstance(wp.get_window(dt), Window)
+        self.assertIs(type(wp.get_window(dt)), type(wp.get_window(dt)))
+
     def test_good_codes(self):
         try:
             Visit(code='1000',
@@ -115,3 +142,184 @@ class TestVisit(TestCase):
             rbase=relativedelta(days=0),
             rlower=relativedelta(days=0),
             rupper=relativedelta(days=6))
+
+
+class TestFrozen(TestCase):
+
+    def test_visit_is_immutable(self):
+        visit = Visit(code='1000',
+                      rbase=relativedelta(days=0),
+                      rlower=relativedelta(days=0),
+                      rupper=relativedelta(days=6))
+        self.assertRaises(FrozenError, setattr, visit, 'code', '2000')
+        self.assertRaises(FrozenError, delattr, visit, 'title')
+        visit.timepoint_datetime = datetime(2001, 12, 1)
+        self.assertFalse(hasattr(visit, '__dict__'))
+
+    def test_forms_are_immutable(self):
+        crf = Crf(show_order=1, model='x.one')
+        self.assertRaises(FrozenError, setattr, crf, 'required', False)
+        self.assertFalse(hasattr(crf, '__dict__'))
+        panel = Panel(name='one', requisition_model='x.requisition')
+        self.assertRaises(FrozenError, setattr, panel, 'name', 'two')
+        requisition = Requisition(show_order=1, panel=panel)
+        self.assertRaises(FrozenError, setattr, requisition, 'panel', panel)
+        self.assertFalse(hasattr(requisition, '__dict__'))
+
+    def test_subclass_without_slots(self):
+
+        class MyCrf(Crf):
+            pass
+
+        crf = MyCrf(show_order=1, model='x.one')
+        crf.extra = 1
+        self.assertRaises(FrozenError, setattr, crf, 'model', 'x.two')
+
+
+class TestVisitForms(TestCase):
+
+    def setUp(self):
+        self.crfs = FormsCollection(
+            Crf(show_order=1, model='x.one'),
+            Crf(show_order=2, model='x.two', required=False),
+            Crf(show_order=3, model='x.three'))
+        self.requisitions = FormsCollection(*[
+            Requisition(show_order=i, required=True, panel=Panel(
+                name=f'panel{i}', requisition_model='x.requisition'))
+            for i in range(10, 13)])
+        self.visit = Visit(code='1000',
+                           rbase=relativedelta(days=0),
+                           rlower=relativedelta(days=0),
+                           rupper=relativedelta(days=6),
+                           crfs=self.crfs,
+                           requisitions=self.requisitions,
+                           crfs_prn=self.crfs)
+
+    def test_forms(self):
+        self.assertEqual(self.visit.forms, self.crfs.forms + self.requisitions.forms)
+        self.assertEqual(self.visit.prn_forms, self.crfs.forms)
+        self.assertEqual(self.visit.unscheduled_forms, ())
+        self.assertEqual(self.visit.all_crfs, self.crfs.forms + self.crfs.forms)
+        self.assertEqual(self.visit.all_requisitions, self.requisitions.forms)
+        self.assertIs(self.visit.forms, self.visit.forms)
+
+    def test_get_form(self):
+        self.assertEqual(self.visit.get_form('x.three').show_order, 3)
+        self.assertEqual(self.visit.get_form('x.requisition').show_order, 10)
+        self.assertIsNone(self.visit.get_form('x.four'))
+        self.assertEqual(self.visit.get_crf('x.two').show_order, 2)
+        self.assertIsNone(self.visit.get_crf('x.requisition'))
+        self.assertEqual(
+            self.visit.get_requisition('x.requisition', panel_name='panel11').show_order, 11)
+        self.assertIsNone(self.visit.get_requisition('x.requisition', panel_name='panel1'))
+
+    def test_next_previous_form(self):
+        self.assertEqual(self.visit.next_form('x.one').model, 'x.two')
+        self.assertEqual(self.visit.next_form('x.three').show_order, 10)
+        # last required requisition followed by a form
+        self.assertEqual(self.visit.next_form('x.requisition').show_order, 12)
+        self.assertIsNone(self.visit.next_form('x.two'))
+        self.assertIsNone(self.visit.next_form('x.four'))
+        self.assertIsNone(self.visit.previous_form('x.one'))
+        self.assertEqual(self.visit.previous_form('x.three').model, 'x.two')
+        self.assertEqual(self.visit.previous_form('x.requisition').model, 'x.three')
+
+    def test_fingerprint(self):
+        visit = Visit(code='1000',
+                      rbase=relativedelta(days=0),
+                      rlower=relativedelta(days=0),
+                      rupper=relativedelta(days=6),
+                      crfs=FormsCollection(*self.crfs.forms),
+                      requisitions=self.requisitions,
+                      crfs_prn=self.crfs)
+        self.assertEqual(visit.fingerprint, self.visit.fingerprint)
+        visit = Visit(code='1000',
+                      rbase=relativedelta(days=0),
+                      rlower=relativedelta(days=0),
+                      rupper=relativedelta(days=7),
+                      crfs=self.crfs,
+                      requisitions=self.requisitions,
+                      crfs_prn=self.crfs)
+        self.assertNotEqual(visit.fingerprint, self.visit.fingerprint)
+        requisitions = FormsCollection(*[
+            Requisition(show_order=i, required=True, panel=Panel(
+                name=f'panel{i}', verbose_name='Panel', requisition_model='x.requisition'))
+            for i in range(10, 13)])
+        visit = Visit(code='1000',
+                      rbase=relativedelta(days=0),
+                      rlower=relativedelta(days=0),
+                      rupper=relativedelta(days=6),
+                      crfs=self.crfs,
+                      requisitions=requisitions,
+                      crfs_prn=self.crfs)
+        self.assertNotEqual(visit.fingerprint, self.visit.fingerprint)
+
+    def test_visit_forms_shared(self):
+        visit = Visit(code='2000',
+                      rbase=relativedelta(days=7),
+                      rlower=relativedelta(days=0),
+                      rupper=relativedelta(days=6),
+                      crfs=self.crfs,
+                      requisitions=self.requisitions,
+                      crfs_prn=self.crfs)
+        self.assertIs(visit._visit_forms, self.visit._visit_forms)
+        visit = Visit(code='3000',
+                      rbase=relativedelta(days=14),
+                      rlower=relativedelta(days=0),
+                      rupper=relativedelta(days=6),
+                      crfs=self.crfs)
+        self.assertIsNot(visit._visit_forms, self.visit._visit_forms)
+        self.assertIsNone(visit.get_requisition('x.requisition', panel_name='panel11'))
+
+
+class TestPeriodicVisits(TestCase):
+
+    def get_periodic_visits(self, **kwargs):
+        options = dict(
+            code_pattern='2{n:03d}', title_pattern='Week {n}', count=52,
+            timepoint=10, timepoint_interval=1, start=relativedelta(weeks=1),
+            interval=relativedelta(weeks=1), rlower=relativedelta(days=1),
+            rupper=relativedelta(days=3))
+        options.update(**kwargs)
+        return PeriodicVisits(**options)
+
+    def test_codes(self):
+        periodic_visits = self.get_periodic_visits()
+        self.assertEqual(len(periodic_visits), 52)
+        self.assertEqual(list(periodic_visits)[:2], ['2001', '2002'])
+        self.assertIn('2052', periodic_visits)
+        self.assertNotIn('2053', periodic_visits)
+        self.assertNotIn('20001', periodic_visits)
+
+    def test_visits_created_when_accessed(self):
+        periodic_visits = self.get_periodic_visits()
+        self.assertEqual(periodic_visits._visits, {})
+        visit = periodic_visits['2003']
+        self.assertEqual(visit.code, '2003')
+        self.assertEqual(visit.title, 'Week 3')
+        self.assertEqual(visit.timepoint, 12)
+        self.assertEqual(visit.rbase, relativedelta(weeks=3))
+        self.assertEqual(visit.rlower, relativedelta(days=1))
+        self.assertIs(periodic_visits['2003'], visit)
+        self.assertEqual(list(periodic_visits._visits), [2])
+
+    def test_index_after_before(self):
+        periodic_visits = self.get_periodic_visits(timepoint_interval=7)
+        self.assertEqual(periodic_visits.index_after(0), 0)
+        self.assertEqual(periodic_visits.index_after(10), 1)
+        self.assertEqual(periodic_visits.index_after(11), 1)
+        self.assertIsNone(periodic_visits.index_after(periodic_visits.last_timepoint))
+        self.assertIsNone(periodic_visits.index_before(10))
+        self.assertEqual(periodic_visits.index_before(17), 0)
+        self.assertEqual(periodic_visits.index_before(18), 1)
+        self.assertEqual(periodic_visits.index_before(1000), 51)
+
+    def test_invalid(self):
+        self.assertRaises(
+            PeriodicVisitsError, self.get_periodic_visits, count=0)
+        self.assertRaises(
+            PeriodicVisitsError, self.get_periodic_visits, timepoint_interval=0)
+        self.assertRaises(
+            PeriodicVisitsError, self.get_periodic_visits, code_pattern='2{x}')
+        self.assertRaises(
+            PeriodicVisitsError, self.get_periodic_visits, code_pattern='w{n}')
@@ -1,5 +1,7 @@
 from .crf import Crf
 from .forms_collection import FormsCollection, FormsCollectionError
+from .frozen import FrozenError
+from .periodic_visits import PeriodicVisits, PeriodicVisitsError
 from .requisition import Requisition, Panel
-from .visit import Visit, VisitCodeError, VisitDateError
-from .window_period import WindowPeriod
+from .visit import Visit, VisitCodeError, VisitDateError, VisitDates
+from .window_period import Window, WindowPeriod
@@ -1,11 +1,16 @@
 from django.apps import apps as django_apps
 
+from ..model_cls_cache import get_model_cls
+from .frozen import Frozen
+
 
 class CrfLookupError(Exception):
     pass
 
 
-class Crf:
+class Crf(Frozen):
+
+    __slots__ = ('additional', 'model', 'required', 'show_order', '__weakref__')
 
     def __init__(self, show_order=None, model=None, required=None,
                  additional=None, **kwargs):
@@ -22,6 +27,15 @@ class Crf:
         required = 'Required' if self.required else ''
         return f'{self.model} {required}'
 
+    @property
+    def definition(self):
+        """Returns a tuple of the values that define this CRF.
+
+        Used to share identical CRFs between visits, see FormsCollection.
+        """
+        return (self.__class__, self.show_order, self.model,
+                self.required, self.additional)
+
     def validate(self):
         """Raises an exception if a CRF model lookup fails.
         """
@@ -32,7 +46,7 @@ class Crf:
 
     @property
     def model_cls(self):
-        return django_apps.get_model(self.model)
+        return get_model_cls(self.model)
 
     @property
     def verbose_name(self):
@@ -1,8 +1,33 @@
 
+from weakref import WeakValueDictionary
+
+from .crf import Crf
+from .requisition import Requisition
+
+
 class FormsCollectionError(Exception):
     pass
 
 
+_interned_forms = WeakValueDictionary()
+
+
+def intern_form(form=None):
+    """Returns an existing form with the same definition as `form`
+    or `form` itself, so that identical Crf and Requisition instances
+    declared for many visits are shared.
+
+    Instances of subclasses are not shared as they may have
+    attributes that are not part of `definition`.
+    """
+    if type(form) not in (Crf, Requisition):
+        return form
+    try:
+        return _interned_forms.setdefault(form.definition, form)
+    except (AttributeError, TypeError):
+        return form
+
+
 class FormsCollection:
 
     def __init__(self, *forms, name=None, **kwargs):
@@ -23,8 +48,8 @@ class FormsCollection:
                 f'{self.__class__.__name__} "show order" must be a '
                 f'unique sequence. Got {seq}.')
 
-        # convert to tuple
-        self._forms = tuple(forms)
+        # convert to tuple of shared instances
+        self._forms = tuple(intern_form(form) for form in forms)
 
     def __repr__(self):
         return f'{self.__class__.__name__}(name={self.name})'
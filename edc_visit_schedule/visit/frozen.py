@@ -0,0 +1,28 @@
+from types import MemberDescriptorType
+
+
+class FrozenError(AttributeError):
+    pass
+
+
+class Frozen:
+
+    """A base class for slotted classes that prevents changing a
+    slot attribute once set.
+
+    Properties with setters and attributes of subclasses without
+    `__slots__` are not affected.
+    """
+
+    __slots__ = ()
+
+    def __setattr__(self, name, value):
+        if (isinstance(getattr(type(self), name, None), MemberDescriptorType)
+                and hasattr(self, name)):
+            raise FrozenError(
+                f'{self.__class__.__name__} is immutable. Got \'{name}\'.')
+        super().__setattr__(name, value)
+
+    def __delattr__(self, name):
+        raise FrozenError(
+            f'{self.__class__.__name__} is immutable. Got \'{name}\'.')
@@ -0,0 +1,246 @@
+import re
+
+from collections.abc import Mapping
+from datetime import timedelta
+from string import Formatter
+
+from ..fingerprint import get_fingerprint
+from .visit import Visit
+
+
+class PeriodicVisitsError(Exception):
+    pass
+
+
+def get_offset_parts(offset=None):
+    """Returns a tuple of (months, microseconds) of a relativedelta
+    or timedelta.
+    """
+    if isinstance(offset, timedelta):
+        return 0, offset // timedelta(microseconds=1)
+    return (offset.years * 12 + offset.months,
+            timedelta(days=offset.days, hours=offset.hours, minutes=offset.minutes,
+                      seconds=offset.seconds, microseconds=offset.microseconds)
+            // timedelta(microseconds=1))
+
+
+class PeriodicVisits(Mapping):
+
+    """A mapping of visit code to visit for `count` visits at a
+    regular interval where each visit is created when first accessed.
+
+    Codes and titles are formatted from `code_pattern` and
+    `title_pattern` with `n`, the sequence number of the visit
+    starting at 1, e.g. code_pattern='2{n:03d}' gives '2001', '2002', ...
+
+    Visit n has timepoint `timepoint + (n - 1) * timepoint_interval` and
+    rbase `start + (n - 1) * interval`. All visits share the forms
+    and window (rlower, rupper) given as `visit_options`.
+    """
+
+    visit_cls = Visit
+
+    def __init__(self, code_pattern=None, count=None, timepoint=None,
+                 timepoint_interval=None, start=None, interval=None,
+                 title_pattern=None, **visit_options):
+        self._visits = {}
+        self.code_pattern = code_pattern
+        self.title_pattern = title_pattern or f'Visit {code_pattern}'
+        self.count = count
+        self.timepoint = timepoint
+        self.timepoint_interval = timepoint_interval
+        self.start = start
+        self.interval = interval
+        self.visit_options = visit_options
+        if not count or count < 1:
+            raise PeriodicVisitsError(f'Invalid count. Got {count}. See {repr(self)}.')
+        if not timepoint_interval or timepoint_interval <= 0:
+            raise PeriodicVisitsError(
+                f'Invalid timepoint interval. Got {timepoint_interval}. '
+                f'See {repr(self)}.')
+        self._code_regex = self._get_regex(code_pattern)
+        self._title_regex = self._get_regex(self.title_pattern)
+        for code in [self.get_code(0), self.get_code(count - 1)]:
+            if not re.match(self.visit_cls.code_regex, code):
+                raise PeriodicVisitsError(
+                    f'Invalid visit code. Got \'{code}\'. See {repr(self)}.')
+
+    def __repr__(self):
+        return (f'{self.__class__.__name__}({self.code_pattern}, '
+                f'{self.timepoint}, {self.count})')
+
+    def __str__(self):
+        return self.title_pattern
+
+    def __len__(self):
+        return self.count
+
+    def __iter__(self):
+        for index in range(0, self.count):
+            yield self.get_code(index)
+
+    def __contains__(self, code):
+        return self.get_index(code) is not None
+
+    def __getitem__(self, code):
+        index = self.get_index(code)
+        if index is None:
+            raise KeyError(code)
+        return self.get_visit(index)
+
+    def _get_regex(self, pattern=None):
+        """Returns a regex for the single field `n` in `pattern`.
+        """
+        try:
+            fields = [(text, field) for text, field, _, _ in Formatter().parse(pattern)]
+        except (TypeError, ValueError) as e:
+            raise PeriodicVisitsError(f'{e} Got \'{pattern}\'. See {repr(self)}.')
+        if [field for _, field in fields if field is not None] != ['n']:
+            raise PeriodicVisitsError(
+                f'Expected a pattern with the single field \'n\'. '
+                f'Got \'{pattern}\'. See {repr(self)}.')
+        regex = ''.join(re.escape(text) + ('' if field is None else r'(\d+)')
+                        for text, field in fields)
+        return re.compile(f'^{regex}$')
+
+    def _get_index(self, value=None, regex=None, get_value=None):
+        try:
+            match = regex.match(value)
+        except TypeError:
+            return None
+        if not match:
+            return None
+        index = int(match.group(1)) - 1
+        if 0 <= index < self.count and get_value(index) == value:
+            return index
+        return None
+
+    def get_index(self, code=None):
+        """Returns the 0-based index of the visit code or None.
+        """
+        return self._get_index(code, self._code_regex, self.get_code)
+
+    def get_code(self, index=None):
+        return self.code_pattern.format(n=index + 1)
+
+    def get_title(self, index=None):
+        return self.title_pattern.format(n=index + 1)
+
+    def get_timepoint(self, index=None):
+        return self.timepoint + index * self.timepoint_interval
+
+    def get_rbase(self, index=None):
+        return self.start + self.interval * index
+
+    def get_visit(self, index=None):
+        """Returns the visit at the 0-based index, creating
+        it if it does not exist.
+        """
+        try:
+            visit = self._visits[index]
+        except KeyError:
+            if not 0 <= index < self.count:
+                raise IndexError(f'Index out of range. Got {index}. See {repr(self)}.')
+            visit = self.visit_cls(
+                code=self.get_code(index),
+                title=self.get_title(index),
+                timepoint=self.get_timepoint(index),
+                rbase=self.get_rbase(index),
+                **self.visit_options)
+            visit = self._visits.setdefault(index, visit)
+        return visit
+
+    @property
+    def fingerprint(self):
+        """Returns a hash of the patterns, count, timepoints and
+        intervals and the definition of the first visit.
+        """
+        return get_fingerprint(
+            self.__class__, self.code_pattern, self.title_pattern, self.count,
+            self.timepoint, self.timepoint_interval, self.start, self.interval,
+            self.get_visit(0).fingerprint)
+
+    @property
+    def rlower(self):
+        return self.visit_options.get('rlower')
+
+    @property
+    def rupper(self):
+        return self.visit_options.get('rupper')
+
+    @property
+    def first_timepoint(self):
+        return self.timepoint
+
+    @property
+    def last_timepoint(self):
+        return self.get_timepoint(self.count - 1)
+
+    def timepoint_codes(self, reverse=None):
+        """Yields (timepoint, code) for each visit ordered on timepoint.
+        """
+        indexes = range(0, self.count)
+        for index in reversed(indexes) if reverse else indexes:
+            yield self.get_timepoint(index), self.get_code(index)
+
+    def index_after(self, timepoint=None):
+        """Returns the index of the first visit with a timepoint
+        greater than `timepoint` or None.
+        """
+        if timepoint < self.timepoint:
+            return 0
+        index = int((timepoint - self.timepoint) // self.timepoint_interval) + 1
+        return index if index < self.count else None
+
+    def index_before(self, timepoint=None):
+        """Returns the index of the last visit with a timepoint
+        less than `timepoint` or None.
+        """
+        if timepoint <= self.timepoint:
+            return None
+        index = -int((self.timepoint - timepoint) // self.timepoint_interval) - 1
+        return min(index, self.count - 1)
+
+    def get_rbase_index(self, rbase=None):
+        """Returns the 0-based index of the visit with this rbase
+        or None.
+
+        The index is `(rbase - start) / interval`, if a whole number
+        less than `count`.
+        """
+        try:
+            rbase_parts, start_parts, interval_parts = [
+                get_offset_parts(offset) for offset in [rbase, self.start, self.interval]]
+        except (AttributeError, TypeError):
+            return None
+        index, remainder = 0, 0
+        for value, start, interval in zip(rbase_parts, start_parts, interval_parts):
+            if interval:
+                index, remainder = divmod(value - start, interval)
+                break
+        if remainder or not 0 <= index < self.count or self.get_rbase(index) != rbase:
+            return None
+        return index
+
+    def get_duplicate_attr(self, visit=None):
+        """Returns the name of the first of code, title, timepoint or
+        rbase where the visit's value is used by these visits, or None.
+        """
+        if visit.code in self:
+            return 'code'
+        if self._get_index(visit.title, self._title_regex, self.get_title) is not None:
+            return 'title'
+        if self.timepoint <= visit.timepoint <= self.last_timepoint:
+            if not (visit.timepoint - self.timepoint) % self.timepoint_interval:
+                return 'timepoint'
+        if self.get_rbase_index(visit.rbase) is not None:
+            return 'rbase'
+        return None
+
+    def overlaps(self, other=None):
+        """Returns True if the timepoints of the two periodic
+        visits overlap or the code patterns are the same.
+        """
+        return (self.code_pattern == other.code_pattern
+                or (self.timepoint <= other.last_timepoint
+                    and other.timepoint <= self.last_timepoint))
@@ -1,4 +1,5 @@
 from .crf import Crf
+from .frozen import Frozen
 
 
 class RequisitionError(Exception):
@@ -9,7 +10,9 @@ class ScheduledRequisitionError(Exception):
     pass
 
 
-class Panel:
+class Panel(Frozen):
+
+    __slots__ = ('name', 'verbose_name', 'requisition_model', '__weakref__')
 
     def __init__(self, name=None, verbose_name=None, requisition_model=None):
         self.name = name
@@ -22,9 +25,15 @@ class Panel:
     def __repr__(self):
         return f'{self.__class__.__name__}(name=\'{self.name}\')'
 
+    @property
+    def definition(self):
+        return (self.__class__, self.name, self.verbose_name, self.requisition_model)
+
 
 class Requisition(Crf):
 
+    __slots__ = ('panel', )
+
     def __init__(self, panel=None, required=None, **kwargs):
         required = False if required is None else required
         self.panel = panel
@@ -47,6 +56,10 @@ class Requisition(Crf):
     def verbose_name(self):
         return self.panel.verbose_name
 
+    @property
+    def definition(self):
+        return super().definition + (getattr(self.panel, 'definition', self.panel), )
+
     def validate(self):
         """Raises an exception if a Requisition model lookup fails
         or if a panel is referred to that is not known to any
@@ -1,8 +1,13 @@
 import re
+import threading
 
+from collections import namedtuple
 from django.apps import apps as django_apps
 
 from .forms_collection import FormsCollection
+from ..fingerprint import get_fingerprint
+from .frozen import Frozen
+from .visit_forms import get_visit_forms
 from .window_period import WindowPeriod
 
 
@@ -18,29 +23,77 @@ class VisitError(Exception):
     pass
 
 
-class VisitDate:
+VisitDates = namedtuple('VisitDates', ['visit', 'base', 'lower', 'upper'])
+
+
+class VisitDate(Frozen):
+
+    """Holds the timepoint datetime (base) and window of a visit.
+
+    Values are stored per thread since visits are shared by
+    all threads through the site registry. A value set in one
+    thread is not seen by other threads.
+    """
+
+    __slots__ = ('_local', '_window')
 
     window_period_cls = WindowPeriod
 
     def __init__(self, **kwargs):
-        self._base = None
+        self._local = threading.local()
         self._window = self.window_period_cls(**kwargs)
-        self.lower = None
-        self.upper = None
 
     @property
     def base(self):
-        return self._base
+        return getattr(self._local, 'base', None)
 
     @base.setter
     def base(self, dt=None):
-        self._base = dt
         window = self._window.get_window(dt=dt)
-        self.lower = window.lower
-        self.upper = window.upper
+        self._local.base = dt
+        self._local.lower = window.lower
+        self._local.upper = window.upper
+
+    @property
+    def lower(self):
+        return getattr(self._local, 'lower', None)
+
+    @lower.setter
+    def lower(self, dt=None):
+        self._local.lower = dt
+
+    @property
+    def upper(self):
+        return getattr(self._local, 'upper', None)
+
+    @upper.setter
+    def upper(self, dt=None):
+        self._local.upper = dt
+
+    def get_window(self, dt=None):
+        """Returns the window for a timepoint datetime without
+        changing this instance.
+        """
+        return self._window.get_window(dt=dt)
+
+    def __getstate__(self):
+        """Pickles the window period only, values stored per
+        thread are not kept.
+        """
+        return self._window
+
+    def __setstate__(self, state):
+        self._local = threading.local()
+        self._window = state
 
 
-class Visit:
+class Visit(Frozen):
+
+    __slots__ = (
+        'code', 'name', 'title', 'timepoint', 'rbase', 'rlower', 'rupper',
+        'dates', 'crfs', 'crfs_unscheduled', 'crfs_prn', 'requisitions',
+        'requisitions_unscheduled', 'requisitions_prn', 'instructions',
+        'grouping', 'facility_name', 'allow_unscheduled', '_visit_forms', '__weakref__')
 
     code_regex = r'^([A-Z0-9])+$'
     forms_collection_cls = FormsCollection
@@ -54,24 +107,16 @@ class Visit:
                  instructions=None, grouping=None,
                  allow_unscheduled=None, facility_name=None):
 
-        self.crfs = ()
-        if crfs:
-            self.crfs = crfs.forms
-        self.crfs_unscheduled = ()
-        if crfs_unscheduled:
-            self.crfs_unscheduled = crfs_unscheduled.forms
-        self.crfs_prn = ()
-        if crfs_prn:
-            self.crfs_prn = crfs_prn.forms
-        self.requisitions = ()
-        if requisitions:
-            self.requisitions = requisitions.forms
-        self.requisitions_unscheduled = ()
-        if requisitions_unscheduled:
-            self.requisitions_unscheduled = requisitions_unscheduled.forms
-        self.requisitions_prn = ()
-        if requisitions_prn:
-            self.requisitions_prn = requisitions_prn.forms
+        self.crfs = crfs.forms if crfs else ()
+        self.crfs_unscheduled = crfs_unscheduled.forms if crfs_unscheduled else ()
+        self.crfs_prn = crfs_prn.forms if crfs_prn else ()
+        self.requisitions = requisitions.forms if requisitions else ()
+        self.requisitions_unscheduled = (
+            requisitions_unscheduled.forms if requisitions_unscheduled else ())
+        self.requisitions_prn = requisitions_prn.forms if requisitions_prn else ()
+        self._visit_forms = get_visit_forms(
+            self.crfs, self.requisitions, self.crfs_unscheduled,
+            self.requisitions_unscheduled, self.crfs_prn, self.requisitions_prn)
         self.instructions = instructions
         self.timepoint = timepoint
         self.rbase = rbase
@@ -94,61 +139,69 @@ class Visit:
     def __str__(self):
         return self.title
 
+    @property
+    def fingerprint(self):
+        """Returns a hash of the definition of this visit, e.g. code,
+        timepoint, window and forms.
+        """
+        return get_fingerprint(
+            self.__class__, self.code, self.title, self.timepoint, self.rbase,
+            self.rlower, self.rupper, self.instructions, self.grouping,
+            self.facility_name, self.allow_unscheduled,
+            *[tuple(form.definition for form in forms) for forms in [
+                self.crfs, self.requisitions, self.crfs_unscheduled,
+                self.requisitions_unscheduled, self.crfs_prn, self.requisitions_prn]])
+
     @property
     def forms(self):
-        """Returns a list of scheduled forms.
+        """Returns a tuple of scheduled forms.
         """
-        return self.crfs + self.requisitions
+        return self._visit_forms.forms
 
     @property
     def unscheduled_forms(self):
-        """Returns a list of unscheduled forms.
+        """Returns a tuple of unscheduled forms.
         """
-        return self.crfs_unscheduled + self.requisitions_unscheduled
+        return self._visit_forms.unscheduled_forms
 
     @property
     def prn_forms(self):
-        """Returns a list of PRN forms.
+        """Returns a tuple of PRN forms.
         """
-        return self.crfs_prn + self.requisitions_prn
+        return self._visit_forms.prn_forms
 
     @property
     def all_crfs(self):
-        return self.crfs + self.crfs_unscheduled + self.crfs_prn
+        return self._visit_forms.all_crfs
 
     @property
     def all_requisitions(self):
-        return self.requisitions + self.requisitions_unscheduled + self.requisitions_prn
+        return self._visit_forms.all_requisitions
 
     def next_form(self, model=None, panel=None):
         """Returns the next required "form" or None.
         """
-        next_form = None
-        for index, form in enumerate(self.forms):
-            if form.model == model and form.required:
-                try:
-                    next_form = self.forms[index + 1]
-                except IndexError:
-                    pass
-        return next_form
+        position = self._visit_forms.next_positions.get(model)
+        if position is None:
+            return None
+        return self.forms[position + 1]
+
+    def previous_form(self, model=None, panel=None):
+        """Returns the "form" before the required form or None.
+        """
+        position = self._visit_forms.previous_positions.get(model)
+        if position is None:
+            return None
+        return self.forms[position - 1]
 
     def get_form(self, model=None):
-        for form in self.forms:
-            if form.model == model:
-                return form
-        return None
+        return self._visit_forms.forms_by_model.get(model)
 
     def get_crf(self, model=None):
-        for form in self.crfs:
-            if form.model == model:
-                return form
-        return None
+        return self._visit_forms.crfs_by_model.get(model)
 
     def get_requisition(self, model=None, panel_name=None):
-        for form in self.requisitions:
-            if form.model == model and form.panel.name == panel_name:
-                return form
-        return None
+        return self._visit_forms.requisitions_by_model_panel.get((model, panel_name))
 
     @property
     def facility(self):
@@ -167,18 +220,34 @@ class Visit:
     def timepoint_datetime(self, dt=None):
         self.dates.base = dt
 
-    def check(self):
+    def get_visit_dates(self, timepoint_datetime=None):
+        """Returns an immutable VisitDates named tuple for the
+        given timepoint datetime without changing this visit.
+        """
+        window = self.dates.get_window(dt=timepoint_datetime)
+        return VisitDates(self, timepoint_datetime, window.lower, window.upper)
+
+    def check(self, lookup_errors=None):
+        """Returns a list of warnings, one per form model that
+        does not exist.
+
+        `lookup_errors`, a dictionary of {model: error message or None},
+        may be shared between visits to look up each model once.
+        """
+        lookup_errors = {} if lookup_errors is None else lookup_errors
         warnings = []
-        try:
-            for crf in self.crfs:
-                django_apps.get_model(crf.model)
-            for crf in self.requisitions:
-                django_apps.get_model(crf.model)
-            for crf in self.crfs_unscheduled:
-                django_apps.get_model(crf.model)
-            for crf in self.requisitions_unscheduled:
-                django_apps.get_model(crf.model)
-        except LookupError as e:
-            warnings.append(
-                f'{e} Got Visit {self.code} crf.model={crf.model}.')
+        for model in dict.fromkeys(
+                form.model for form in self.forms + self.unscheduled_forms + self.prn_forms):
+            try:
+                error = lookup_errors[model]
+            except KeyError:
+                try:
+                    django_apps.get_model(model)
+                except LookupError as e:
+                    error = str(e)
+                else:
+                    error = None
+                lookup_errors[model] = error
+            if error:
+                warnings.append(f'{error} Got Visit {self.code} crf.model={model}.')
         return warnings
@@ -0,0 +1,65 @@
+from weakref import WeakValueDictionary
+
+from .frozen import Frozen
+
+
+class VisitForms(Frozen):
+
+    """The forms of a visit as tuples and lookups built once.
+
+    Visits declared with the same forms share an instance,
+    see `get_visit_forms`.
+    """
+
+    __slots__ = (
+        'forms', 'unscheduled_forms', 'prn_forms', 'all_crfs', 'all_requisitions',
+        'forms_by_model', 'crfs_by_model', 'requisitions_by_model_panel',
+        'next_positions', 'previous_positions', '__weakref__')
+
+    def __init__(self, crfs=None, requisitions=None, crfs_unscheduled=None,
+                 requisitions_unscheduled=None, crfs_prn=None, requisitions_prn=None):
+        self.forms = crfs + requisitions
+        self.unscheduled_forms = crfs_unscheduled + requisitions_unscheduled
+        self.prn_forms = crfs_prn + requisitions_prn
+        self.all_crfs = crfs + crfs_unscheduled + crfs_prn
+        self.all_requisitions = requisitions + requisitions_unscheduled + requisitions_prn
+        forms_by_model = {}
+        for form in self.forms:
+            forms_by_model.setdefault(form.model, form)
+        self.forms_by_model = forms_by_model
+        crfs_by_model = {}
+        for form in crfs:
+            crfs_by_model.setdefault(form.model, form)
+        self.crfs_by_model = crfs_by_model
+        requisitions_by_model_panel = {}
+        for form in requisitions:
+            requisitions_by_model_panel.setdefault((form.model, form.panel.name), form)
+        self.requisitions_by_model_panel = requisitions_by_model_panel
+        # positions of the last required form of a model followed by
+        # a form and of the first required form of a model preceded by one.
+        next_positions = {}
+        previous_positions = {}
+        for position, form in enumerate(self.forms):
+            if form.required:
+                if position + 1 < len(self.forms):
+                    next_positions[form.model] = position
+                if position > 0:
+                    previous_positions.setdefault(form.model, position)
+        self.next_positions = next_positions
+        self.previous_positions = previous_positions
+
+
+_visit_forms = WeakValueDictionary()
+
+
+def get_visit_forms(*forms):
+    """Returns a VisitForms instance for the form tuples (crfs,
+    requisitions, crfs_unscheduled, requisitions_unscheduled, crfs_prn,
+    requisitions_prn), shared with visits declared with the same forms.
+    """
+    try:
+        return _visit_forms[forms]
+    except KeyError:
+        return _visit_forms.setdefault(forms, VisitForms(*forms))
+    except TypeError:
+        return VisitForms(*forms)
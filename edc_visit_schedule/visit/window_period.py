@@ -1,14 +1,43 @@
 from collections import namedtuple
+from datetime import timedelta
+from dateutil.relativedelta import relativedelta
 
+from .frozen import Frozen
 
-class WindowPeriod:
+Window = namedtuple('Window', ['lower', 'upper'])
+
+_offsets = {}
+
+
+def get_offset(rdelta=None):
+    """Returns a timedelta if `rdelta` is a relativedelta of
+    whole days (or weeks), otherwise returns `rdelta`.
+
+    Adding a timedelta is much faster than adding a relativedelta
+    and gives the same result for day offsets.
+    """
+    if isinstance(rdelta, relativedelta) and rdelta == relativedelta(days=rdelta.days):
+        return timedelta(days=rdelta.days)
+    return rdelta
+
+
+class WindowPeriod(Frozen):
+
+    __slots__ = ('rlower', 'rupper', '_lower_offset', '_upper_offset')
 
     def __init__(self, rlower=None, rupper=None, **kwargs):
         self.rlower = rlower
         self.rupper = rupper
+        try:
+            offsets = _offsets[(rlower, rupper)]
+        except KeyError:
+            offsets = _offsets.setdefault(
+                (rlower, rupper), (get_offset(rlower), get_offset(rupper)))
+        except TypeError:
+            offsets = (get_offset(rlower), get_offset(rupper))
+        self._lower_offset, self._upper_offset = offsets
 
     def get_window(self, dt=None):
         """Returns a named tuple of the lower and upper values.
         """
-        Window = namedtuple('window', ['lower', 'upper'])
-        return Window(dt - self.rlower, dt + self.rupper)
+        return Window(dt - self._lower_offset, dt + self._upper_offset)
@@ -1,7 +1,7 @@
 import re
 
-from django.apps import apps as django_apps
-
+from ..fingerprint import get_fingerprint
+from ..model_cls_cache import get_model_cls
 from .schedules_collection import SchedulesCollection
 
 
@@ -52,17 +52,27 @@ class VisitSchedule:
     def __str__(self):
         return self.name
 
+    @property
+    def fingerprint(self):
+        """Returns a hash of the definition of this visit schedule,
+        its models and schedules.
+        """
+        return get_fingerprint(
+            self.__class__, self.name, self.verbose_name, self.offstudy_model,
+            self.death_report_model, self.locator_model, str(self.previous_visit_schedule),
+            *[schedule.fingerprint for schedule in self.schedules.values()])
+
     @property
     def offstudy_model_cls(self):
-        return django_apps.get_model(self.offstudy_model)
+        return get_model_cls(self.offstudy_model)
 
     @property
     def locator_model_cls(self):
-        return django_apps.get_model(self.locator_model)
+        return get_model_cls(self.locator_model)
 
     @property
     def death_report_model_cls(self):
-        return django_apps.get_model(self.death_report_model)
+        return get_model_cls(self.death_report_model)
 
     def add_schedule(self, schedule=None):
         """Adds a schedule, if not already added.
@@ -76,12 +86,12 @@ class VisitSchedule:
 
     def check(self):
         warnings = []
-        try:
-            self.offstudy_model_cls
-            self.death_report_model_cls
-        except LookupError as e:
-            warnings.append(
-                f'{e} See visit schedule \'{self.name}\'.')
+        for attr in ['offstudy_model_cls', 'death_report_model_cls']:
+            try:
+                getattr(self, attr)
+            except LookupError as e:
+                warnings.append(
+                    f'{e} See visit schedule \'{self.name}\'.')
         return warnings
 
     @property
@@ -99,7 +109,7 @@ class VisitSchedule:
                     {schedule.onschedule_model: schedule.consent_model})
                 models.update(
                     {schedule.offschedule_model: schedule.consent_model})
-                for visit in schedule.visits.values():
+                for visit in schedule.visits.visit_definitions():
                     for crf in visit.forms:
                         models.update({crf.model: schedule.consent_model})
                     for crf in visit.unscheduled_forms:
@@ -21,6 +21,7 @@ setup(
     description='.',
     long_description=README,
     zip_safe=False,
+    extras_require={'numpy': ['numpy']},
     keywords='django visit schedule clinical research',
     classifiers=[
         'Environment :: Web Environment',